@@ -0,0 +1,509 @@
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from metrics import ARTIFACT_STORE_BYTES, CACHE_HITS
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_STORE_DIR = os.getenv(
+    "ARTIFACT_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "artifacts"))
+# generated: the project files; upload: the BRD as uploaded; parsed: the parsed BRD JSON
+ROLES = ("generated", "upload", "parsed")
+# Blobs are gzipped at save time when that saves at least MIN_COMPRESSION_RATIO of their size
+ARTIFACT_COMPRESSION_ENABLED = os.getenv("ARTIFACT_COMPRESSION_ENABLED", "1") == "1"
+ARTIFACT_COMPRESSION_LEVEL = int(os.getenv("ARTIFACT_COMPRESSION_LEVEL", "6"))
+MIN_COMPRESSION_RATIO = 0.1
+MIN_COMPRESSIBLE_BYTES = 256
+# Already compressed formats, not worth a gzip attempt
+INCOMPRESSIBLE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".zip", ".jar", ".gz", ".pdf", ".docx")
+# Run columns callers may set; everything else goes into the metadata JSON
+RUN_COLUMNS = ("source", "batch_id", "filename", "brd_sha256", "project_name", "model", "status", "duration_seconds")
+# Columns list_runs filters on by equality; each leads an index followed by created_at
+RUN_FILTERS = ("brd_sha256", "project_name", "source", "status", "batch_id")
+RUN_PAGE_MAX = 200
+
+# Applied in order on open; PRAGMA user_version records how many have run
+MIGRATIONS = (
+    """
+    CREATE TABLE runs (
+        run_id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        source TEXT NOT NULL,
+        batch_id TEXT,
+        filename TEXT,
+        brd_sha256 TEXT,
+        project_name TEXT,
+        model TEXT,
+        status TEXT NOT NULL,
+        duration_seconds REAL,
+        file_count INTEGER NOT NULL DEFAULT 0,
+        total_bytes INTEGER NOT NULL DEFAULT 0,
+        metadata TEXT NOT NULL DEFAULT '{}'
+    );
+    CREATE INDEX runs_source_created ON runs (source, status, created_at);
+    CREATE TABLE blobs (
+        sha256 TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE TABLE files (
+        run_id TEXT NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+        role TEXT NOT NULL,
+        path TEXT NOT NULL,
+        sha256 TEXT NOT NULL REFERENCES blobs (sha256),
+        size INTEGER NOT NULL,
+        PRIMARY KEY (run_id, role, path)
+    );
+    CREATE INDEX files_sha256 ON files (sha256);
+    """,
+    # Last read of a run, for least-recently-used eviction
+    """
+    ALTER TABLE runs ADD COLUMN accessed_at REAL;
+    UPDATE runs SET accessed_at = created_at;
+    CREATE INDEX runs_accessed ON runs (accessed_at);
+    """,
+    # How each blob is stored on disk: identity or gzip, and its size there
+    """
+    ALTER TABLE blobs ADD COLUMN encoding TEXT NOT NULL DEFAULT 'identity';
+    ALTER TABLE blobs ADD COLUMN stored_size INTEGER;
+    UPDATE blobs SET stored_size = size;
+    """,
+    # Run history lookups, newest first within each filter
+    """
+    CREATE INDEX runs_created ON runs (created_at, run_id);
+    CREATE INDEX runs_brd_created ON runs (brd_sha256, created_at, run_id);
+    CREATE INDEX runs_project_created ON runs (project_name, created_at, run_id);
+    CREATE INDEX runs_source_history ON runs (source, created_at, run_id);
+    CREATE INDEX runs_status_created ON runs (status, created_at, run_id);
+    CREATE INDEX runs_batch_created ON runs (batch_id, created_at, run_id);
+    """,
+)
+# Reads refresh a run's accessed_at at most this often
+ACCESS_RESOLUTION_SECONDS = 60
+
+
+class RunNotFound(LookupError):
+    """No run with the requested id (never recorded, or evicted)."""
+
+
+class StoredFile(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+    encoding: str = "identity"
+
+
+def _encode(path: str, data: bytes) -> Tuple[bytes, str]:
+    """Blob bytes as stored on disk and their encoding."""
+    if (not ARTIFACT_COMPRESSION_ENABLED or len(data) < MIN_COMPRESSIBLE_BYTES
+            or path.lower().endswith(INCOMPRESSIBLE_EXTENSIONS)):
+        return data, "identity"
+    compressed = _encode_as(data, "gzip")
+    if len(compressed) > len(data) * (1 - MIN_COMPRESSION_RATIO):
+        return data, "identity"
+    return compressed, "gzip"
+
+
+def _encode_as(data: bytes, encoding: str) -> bytes:
+    # mtime=0 keeps the output a function of the content alone
+    return gzip.compress(data, compresslevel=ARTIFACT_COMPRESSION_LEVEL, mtime=0) if encoding == "gzip" else data
+
+
+def _decode(data: bytes, encoding: str) -> bytes:
+    return gzip.decompress(data) if encoding == "gzip" else data
+
+
+class ArtifactStore:
+    """Run artifacts in a content-addressed blob directory indexed by SQLite.
+
+    Each run's files (generated project, uploaded BRD, parsed JSON) are rows in
+    `files` pointing at blobs named by their SHA-256, so content shared between
+    runs (workflows, gradlew, unchanged entity files) is stored once. Blobs are
+    written before the rows that reference them, so the index never points at a
+    missing blob. Every thread gets its own connection; WAL lets readers run
+    alongside a writer.
+
+    Compressible blobs are gzipped once when saved (blobs from before that
+    stay as they are); `read_stored` hands out the bytes as stored, so they can
+    be served to gzip-capable clients without recompressing, and the download
+    zip of a run is built once and cached next to the index.
+
+    Unreferenced blobs are only deleted inside a write transaction, and
+    `record_run` re-checks its blobs inside its own, so eviction never removes
+    a blob a new run is about to reference.
+    """
+
+    def __init__(self, root_dir: str = ARTIFACT_STORE_DIR):
+        self.root_dir = root_dir
+        self.blob_dir = os.path.join(root_dir, "blobs")
+        self.zip_dir = os.path.join(root_dir, "zips")
+        self.db_path = os.path.join(root_dir, "index.sqlite3")
+        self._local = threading.local()
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.zip_dir, exist_ok=True)
+        self._migrate()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate(self) -> None:
+        with self._transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+                for statement in script.split(";"):
+                    if statement.strip():
+                        conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {number}")
+
+    def _blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blob_dir, sha256[:2], sha256)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _known_blobs(self, digests: List[str]) -> Dict[str, str]:
+        """Encoding of each of `digests` already in the index."""
+        conn = self._connection()
+        known = {}
+        for digest in digests:
+            row = conn.execute("SELECT encoding FROM blobs WHERE sha256 = ?", (digest,)).fetchone()
+            if row is not None:
+                known[digest] = row["encoding"]
+        return known
+
+    def record_run(self, run_id: str, files: Dict[str, Dict[str, Union[str, bytes]]],
+                   metadata: Optional[Dict] = None, **columns) -> Dict[str, int]:
+        """Store a run's files, keyed by role then path, and its row in `runs`.
+
+        Returns how many files and bytes were written versus found already stored,
+        and the bytes the new blobs take on disk.
+        """
+        unknown = set(columns) - set(RUN_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown run columns: {', '.join(sorted(unknown))}")
+        rows = []
+        contents: Dict[str, Tuple[str, bytes]] = {}
+        for role, role_files in files.items():
+            if role not in ROLES:
+                raise ValueError(f"Unknown artifact role '{role}'")
+            for path, content in role_files.items():
+                data = content.encode("utf-8") if isinstance(content, str) else content
+                sha256 = hashlib.sha256(data).hexdigest()
+                contents.setdefault(sha256, (path, data))
+                rows.append((run_id, role, path, sha256, len(data)))
+
+        # Compress and write the blobs missing from the index outside the write lock; the index
+        # is read again under the lock, since eviction may have removed a blob seen here.
+        # Deduping against the index (not the disk) overwrites stray files of interrupted runs
+        prepared: Dict[str, Tuple[bytes, str]] = {}
+        known = self._known_blobs(list(contents))
+        for sha256, (path, data) in contents.items():
+            if sha256 not in known:
+                prepared[sha256] = _encode(path, data)
+                self._write_atomic(self._blob_path(sha256), prepared[sha256][0])
+
+        now = time.time()
+        generated = [row for row in rows if row[1] == "generated"]
+        run = dict(columns, run_id=run_id, created_at=now, accessed_at=now, file_count=len(generated),
+                   total_bytes=sum(row[4] for row in generated), metadata=json.dumps(metadata or {}, default=str))
+        run.setdefault("source", "upload")
+        run.setdefault("status", "completed")
+        blob_rows = []
+        with self._transaction() as conn:
+            present = self._known_blobs(list(contents))
+            for sha256, (path, data) in contents.items():
+                blob_path = self._blob_path(sha256)
+                if sha256 in present:
+                    # Evicting a blob deletes its row and file together under the write lock, so
+                    # a missing file here was lost some other way
+                    if not os.path.exists(blob_path):
+                        self._write_atomic(blob_path, _encode_as(data, present[sha256]))
+                    continue
+                if sha256 not in prepared:
+                    # Evicted since it was looked up above
+                    prepared[sha256] = _encode(path, data)
+                if not os.path.exists(blob_path):
+                    self._write_atomic(blob_path, prepared[sha256][0])
+                encoded, encoding = prepared[sha256]
+                blob_rows.append((sha256, len(data), now, encoding, len(encoded)))
+            conn.executemany("INSERT INTO blobs (sha256, size, created_at, encoding, stored_size) "
+                             "VALUES (?, ?, ?, ?, ?)", blob_rows)
+            conn.execute(f"INSERT INTO runs ({', '.join(run)}) VALUES ({', '.join('?' * len(run))})",
+                         list(run.values()))
+            conn.executemany("INSERT INTO files (run_id, role, path, sha256, size) VALUES (?, ?, ?, ?, ?)", rows)
+
+        new_blobs = {row[0] for row in blob_rows}
+        stats = {"files": len(rows), "written_bytes": sum(row[1] for row in blob_rows),
+                 "stored_bytes": sum(row[4] for row in blob_rows), "deduplicated_files": 0, "deduplicated_bytes": 0}
+        seen = set()
+        for row in rows:
+            if row[3] not in new_blobs or row[3] in seen:
+                stats["deduplicated_files"] += 1
+                stats["deduplicated_bytes"] += row[4]
+            seen.add(row[3])
+
+        ARTIFACT_STORE_BYTES.labels(kind="written").inc(stats["written_bytes"])
+        ARTIFACT_STORE_BYTES.labels(kind="stored").inc(stats["stored_bytes"])
+        ARTIFACT_STORE_BYTES.labels(kind="deduplicated").inc(stats["deduplicated_bytes"])
+        CACHE_HITS.labels(cache="artifact_blob").inc(stats["deduplicated_files"])
+        logger.info("Run artifacts stored", extra={"stored_run_id": run_id, **stats})
+        return stats
+
+    def latest_run_id(self, source: str = "upload") -> Optional[str]:
+        """Newest completed run from `source` that produced generated files."""
+        row = self._connection().execute(
+            "SELECT run_id FROM runs WHERE source = ? AND status = 'completed' AND file_count > 0 "
+            "ORDER BY created_at DESC LIMIT 1", (source,)).fetchone()
+        return row["run_id"] if row else None
+
+    @staticmethod
+    def _run_dict(row: sqlite3.Row) -> Dict:
+        run = dict(row)
+        run["metadata"] = json.loads(run["metadata"])
+        return run
+
+    def get_run(self, run_id: str) -> Optional[Dict]:
+        row = self._connection().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._run_dict(row) if row else None
+
+    def list_runs(self, limit: int = 50, cursor: Optional[str] = None, created_after: Optional[float] = None,
+                  created_before: Optional[float] = None, **filters) -> Tuple[List[Dict], Optional[str]]:
+        """One page of runs matching `filters` (RUN_FILTERS columns) and the creation window, newest first.
+
+        Pages are keyed on (created_at, run_id) instead of an offset, so a deep
+        page costs the same as the first and new runs don't shift later pages.
+        Returns the runs and the cursor of the next page (None on the last).
+        Raises ValueError for an unknown filter or a malformed cursor.
+        """
+        unknown = set(filters) - set(RUN_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown run filters: {', '.join(sorted(unknown))}")
+        limit = max(1, min(limit, RUN_PAGE_MAX))
+        clauses, params = [], []
+        for column, value in filters.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if created_after is not None:
+            clauses.append("created_at >= ?")
+            params.append(created_after)
+        if created_before is not None:
+            clauses.append("created_at < ?")
+            params.append(created_before)
+        if cursor:
+            try:
+                last_created, last_run_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            except (ValueError, TypeError):
+                raise ValueError("Malformed cursor")
+            clauses.append("(created_at < ? OR (created_at = ? AND run_id < ?))")
+            params += [last_created, last_created, last_run_id]
+
+        query = "SELECT * FROM runs"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        rows = self._connection().execute(query + " ORDER BY created_at DESC, run_id DESC LIMIT ?",
+                                          params + [limit + 1]).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = base64.urlsafe_b64encode(
+                json.dumps([last["created_at"], last["run_id"]]).encode("utf-8")).decode("ascii")
+        return [self._run_dict(row) for row in rows[:limit]], next_cursor
+
+    def list_files(self, run_id: str, role: str = "generated", path_like: Optional[str] = None) -> List[StoredFile]:
+        """A run's files of one role in path order, optionally narrowed with a SQL LIKE pattern.
+
+        Counts as a use of the run for least-recently-used eviction.
+        """
+        self.touch(run_id)
+        query = ("SELECT files.path, files.sha256, files.size, blobs.encoding FROM files "
+                 "JOIN blobs ON blobs.sha256 = files.sha256 WHERE files.run_id = ? AND files.role = ?")
+        params = [run_id, role]
+        if path_like:
+            query += " AND files.path LIKE ?"
+            params.append(path_like)
+        return [StoredFile(*row) for row in self._connection().execute(query + " ORDER BY files.path", params)]
+
+    def get_file(self, run_id: str, path: str, role: str = "generated") -> Optional[StoredFile]:
+        row = self._connection().execute(
+            "SELECT files.path, files.sha256, files.size, blobs.encoding FROM files "
+            "JOIN blobs ON blobs.sha256 = files.sha256 WHERE files.run_id = ? AND files.role = ? AND files.path = ?",
+            (run_id, role, path)).fetchone()
+        return StoredFile(*row) if row else None
+
+    def read_stored(self, stored: StoredFile) -> bytes:
+        """A file's bytes as stored on disk, i.e. in `stored.encoding`."""
+        with open(self._blob_path(stored.sha256), "rb") as f:
+            return f.read()
+
+    def read_content(self, stored: StoredFile) -> bytes:
+        """A file's original bytes."""
+        return _decode(self.read_stored(stored), stored.encoding)
+
+    def read_file(self, run_id: str, path: str, role: str = "generated") -> Optional[bytes]:
+        stored = self.get_file(run_id, path, role)
+        return self.read_content(stored) if stored else None
+
+    def cached_zip(self, run_id: str, files: List[StoredFile]) -> str:
+        """Path of the run's download zip of `files`, built on first use.
+
+        Callers must pass the same selection of files for a run every time;
+        the zip is only rebuilt after it is deleted.
+        """
+        path = os.path.join(self.zip_dir, f"{run_id}.zip")
+        if os.path.exists(path):
+            CACHE_HITS.labels(cache="artifact_zip").inc()
+            return path
+        fd, tmp_path = tempfile.mkstemp(dir=self.zip_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as zipf:
+                for stored in files:
+                    compress_type = zipfile.ZIP_STORED if stored.path.lower().endswith(
+                        INCOMPRESSIBLE_EXTENSIONS) else zipfile.ZIP_DEFLATED
+                    zipf.writestr(stored.path, self.read_content(stored), compress_type=compress_type)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def import_tree(self, run_id: str, base: str, **columns) -> Optional[Dict[str, int]]:
+        """Record the files under `base` (hidden top-level entries skipped) as a run's generated files."""
+        files = {}
+        for root, dirs, names in os.walk(base):
+            if root == base:
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                names = [n for n in names if not n.startswith(".") and not n.endswith(".zip")]
+            for name in names:
+                full = os.path.join(root, name)
+                with open(full, "rb") as f:
+                    files[os.path.relpath(full, base).replace("\\", "/")] = f.read()
+        if not files:
+            return None
+        return self.record_run(run_id, {"generated": files}, **columns)
+
+    def touch(self, run_id: str) -> None:
+        now = time.time()
+        self._connection().execute("UPDATE runs SET accessed_at = ? WHERE run_id = ? AND accessed_at < ?",
+                                   (now, run_id, now - ACCESS_RESOLUTION_SECONDS))
+
+    def storage_bytes(self) -> int:
+        """Disk space taken by the stored blobs and cached zips."""
+        blobs = self._connection().execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+        return blobs + sum(entry.stat().st_size for entry in os.scandir(self.zip_dir) if entry.is_file())
+
+    def list_runs_by_access(self) -> List[Dict]:
+        """run_id, source, status, created_at and accessed_at of every run, least recently used first."""
+        rows = self._connection().execute(
+            "SELECT run_id, source, status, created_at, accessed_at FROM runs ORDER BY accessed_at")
+        return [dict(row) for row in rows]
+
+    def delete_runs(self, run_ids: List[str]) -> int:
+        """Delete runs with their file rows and every blob left unreferenced; returns the bytes freed."""
+        with self._transaction() as conn:
+            conn.executemany("DELETE FROM runs WHERE run_id = ?", [(run_id,) for run_id in run_ids])
+            orphans = conn.execute(
+                "SELECT sha256, stored_size FROM blobs WHERE NOT EXISTS "
+                "(SELECT 1 FROM files WHERE files.sha256 = blobs.sha256)").fetchall()
+            conn.executemany("DELETE FROM blobs WHERE sha256 = ?", [(row["sha256"],) for row in orphans])
+            # Files go last, with the write lock still held; a failed remove leaves a stray blob
+            # for remove_stray_blobs rather than rolling back rows whose files are already gone
+            freed = 0
+            for row in orphans:
+                try:
+                    os.remove(self._blob_path(row["sha256"]))
+                    freed += row["stored_size"]
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning("Could not remove blob", extra={"sha256": row["sha256"], "error": str(e)})
+        for run_id in run_ids:
+            freed += self._remove_zip(os.path.join(self.zip_dir, f"{run_id}.zip"))
+        return freed
+
+    @staticmethod
+    def _remove_zip(path: str) -> int:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            return size
+        except OSError:
+            return 0
+
+    def remove_stray_blobs(self, older_than: float) -> int:
+        """Delete blob files with no row in `blobs` (and leftover temp files) last modified
+        before `older_than`, e.g. from a run that failed between writing blobs and its rows,
+        and cached zips of runs that no longer exist."""
+        freed = 0
+        conn = self._connection()
+        for entry in os.scandir(self.zip_dir):
+            name = entry.name
+            if entry.is_file() and entry.stat().st_mtime < older_than and (name.endswith(".tmp") or not conn.execute(
+                    "SELECT 1 FROM runs WHERE run_id = ?", (name[:-len(".zip")],)).fetchone()):
+                freed += self._remove_zip(entry.path)
+
+        candidates = []
+        for root, _, names in os.walk(self.blob_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime < older_than:
+                    candidates.append((name, path, stat.st_size))
+        if not candidates:
+            return freed
+
+        with self._transaction() as conn:
+            for name, path, size in candidates:
+                if not name.endswith(".tmp") and conn.execute(
+                        "SELECT 1 FROM blobs WHERE sha256 = ?", (name,)).fetchone():
+                    continue
+                try:
+                    os.remove(path)
+                    freed += size
+                except OSError:
+                    pass
+        return freed
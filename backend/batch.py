@@ -0,0 +1,263 @@
+import contextvars
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from werkzeug.utils import secure_filename
+
+from metrics import BATCH_DOCUMENTS, run_token_usage_var
+from model_router import run_model_routes_var
+from profiling import profile_session_var
+from run_logging import debug_run_var, run_context
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".txt", ".docx", ".pdf")
+# Documents processed at once across all batches; keep it in line with the Gemini quota
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "100"))
+# Uncompressed size allowed for all documents of one batch, archives included
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+# Finished batches kept in memory; older ones are answered from their manifest on disk
+BATCH_HISTORY = 100
+
+MANIFEST_NAME = "manifest.json"
+
+
+class BatchError(ValueError):
+    """The submitted files can't form a batch (nothing usable, too many or too large)."""
+
+
+def expand_uploads(uploads: List[Tuple[str, bytes]]) -> List[Tuple[str, bytes]]:
+    """Flatten uploaded files and .zip archives into (filename, content) documents.
+
+    Archive members with unsupported extensions, folders and hidden/metadata
+    entries are skipped; plain uploads with an unsupported extension are an error.
+    """
+    documents: List[Tuple[str, bytes]] = []
+    total_bytes = 0
+
+    def add(name: str, data: bytes) -> None:
+        nonlocal total_bytes
+        total_bytes += len(data)
+        if len(documents) >= BATCH_MAX_DOCUMENTS:
+            raise BatchError(f"A batch holds at most {BATCH_MAX_DOCUMENTS} documents")
+        if total_bytes > BATCH_MAX_BYTES:
+            raise BatchError(f"A batch holds at most {BATCH_MAX_BYTES} bytes of documents")
+        documents.append((name, data))
+
+    for filename, data in uploads:
+        ext = os.path.splitext(filename)[1].lower()
+        if ext == ".zip":
+            try:
+                archive = zipfile.ZipFile(io.BytesIO(data))
+            except zipfile.BadZipFile:
+                raise BatchError(f"'{filename}' is not a valid zip archive")
+            with archive:
+                for member in archive.infolist():
+                    base = os.path.basename(member.filename)
+                    if member.is_dir() or not base or base.startswith(".") or "__MACOSX" in member.filename:
+                        continue
+                    if not base.lower().endswith(SUPPORTED_EXTENSIONS):
+                        continue
+                    # Check the declared size before inflating anything
+                    if total_bytes + member.file_size > BATCH_MAX_BYTES:
+                        raise BatchError(f"A batch holds at most {BATCH_MAX_BYTES} bytes of documents")
+                    add(base, archive.read(member))
+        elif ext in SUPPORTED_EXTENSIONS:
+            add(os.path.basename(filename), data)
+        else:
+            raise BatchError(f"Unsupported file type '{filename}'. Please upload .txt, .docx, .pdf or .zip")
+
+    if not documents:
+        raise BatchError("No .txt, .docx or .pdf documents in the upload")
+    return documents
+
+
+class _Batch:
+    def __init__(self, batch_id: str, root: str, documents: List[Dict]):
+        self.batch_id = batch_id
+        self.root = root
+        self.created_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.documents = documents
+
+    def snapshot(self) -> Dict:
+        counts = Counter(doc["status"] for doc in self.documents)
+        if counts["queued"] == len(self.documents):
+            status = "queued"
+        elif counts["queued"] or counts["running"]:
+            status = "running"
+        elif counts["failed"] == len(self.documents):
+            status = "failed"
+        else:
+            status = "completed_with_errors" if counts["failed"] else "completed"
+        return {
+            "batch_id": self.batch_id,
+            "status": status,
+            "created_at": self.created_at,
+            "counts": {state: counts[state] for state in ("queued", "running", "completed", "failed")},
+            "documents": [dict(doc) for doc in self.documents],
+        }
+
+
+class BatchRunner:
+    """Processes batches of BRDs on one worker pool shared by every batch.
+
+    Each document gets its own folder under `root_dir/<batch_id>/` with its input,
+    parsed JSON and generated code, and is processed as a separate run (own run id,
+    token usage and model routes) by `process(input_path, output_dir, parsed_dir, batch_id=...)`.
+    The status reports those paths relative to the batch folder, so it doesn't
+    reveal where the server keeps its data. Documents with identical content are
+    processed once. Status lives in memory
+    and in a manifest.json per batch, which also answers for batches from before
+    a restart.
+    """
+
+    def __init__(self, root_dir: str, process: Callable[..., Dict],
+                 max_concurrency: int = BATCH_MAX_CONCURRENCY):
+        self.root_dir = root_dir
+        self.process = process
+        self.max_concurrency = max_concurrency
+        self._batches: "OrderedDict[str, _Batch]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _submit(self, fn: Callable, *args) -> None:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="batch")
+        # Carries the submitting request's latency tier and debug flag into the workers
+        self._executor.submit(contextvars.copy_context().run, fn, *args)
+
+    def submit(self, documents: List[Tuple[str, bytes]]) -> Dict:
+        """Store the documents, queue them and return the batch status."""
+        batch_id = uuid.uuid4().hex[:12]
+        root = os.path.join(self.root_dir, batch_id)
+        groups: Dict[str, List[int]] = {}
+        entries = []
+        for index, (filename, data) in enumerate(documents):
+            name = secure_filename(filename) or f"document{os.path.splitext(filename)[1]}"
+            folder = f"{index:03d}-{os.path.splitext(name)[0]}"
+            os.makedirs(os.path.join(root, folder))
+            with open(os.path.join(root, folder, name), "wb") as f:
+                f.write(data)
+            digest = hashlib.sha256(data).hexdigest()
+            entry = {
+                "index": index,
+                "filename": filename,
+                "status": "queued",
+                "sha256": digest,
+                # Relative to the batch folder; the status is served to clients as is
+                "input_path": f"{folder}/{name}",
+                "output_dir": f"{folder}/code",
+                "parsed_dir": f"{folder}/parsed",
+            }
+            if digest in groups:
+                entry["duplicate_of"] = groups[digest][0]
+            groups.setdefault(digest, []).append(index)
+            entries.append(entry)
+
+        batch = _Batch(batch_id, root, entries)
+        with self._lock:
+            self._batches[batch_id] = batch
+            self._forget_finished()
+            self._write_manifest(batch)
+            snapshot = batch.snapshot()
+        logger.info("Batch queued", extra={"batch_id": batch_id, "documents": len(entries), "unique": len(groups)})
+        for indexes in groups.values():
+            self._submit(self._run_document, batch, indexes)
+        return snapshot
+
+    def status(self, batch_id: str) -> Optional[Dict]:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+            if batch is not None:
+                return batch.snapshot()
+        try:
+            with open(os.path.join(self.root_dir, secure_filename(batch_id), MANIFEST_NAME), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def document_run_id(self, batch_id: str, index: int) -> Optional[str]:
+        """Run id of a finished document (its original's when it was a duplicate)."""
+        status = self.status(batch_id)
+        if status is None or not 0 <= index < len(status["documents"]):
+            return None
+        doc = status["documents"][index]
+        return doc.get("run_id") if doc["status"] == "completed" else None
+
+    def _run_document(self, batch: _Batch, indexes: List[int]) -> None:
+        """Process the first document of a group of identical ones and record the result on all of them."""
+        self._update(batch, indexes, status="running")
+        doc = batch.documents[indexes[0]]
+        start = time.perf_counter()
+        update: Dict = {}
+        # The worker context is copied from the submitting request, whose profile has already ended
+        profile_session_var.set(None)
+        with run_context(debug_run_var.get()) as run_id:
+            usage_token = run_token_usage_var.set({})
+            routes_token = run_model_routes_var.set({})
+            try:
+                result = self.process(*(os.path.join(batch.root, doc[key]) for key in ("input_path", "output_dir", "parsed_dir")),
+                                      batch_id=batch.batch_id)
+                update = {
+                    "status": "completed",
+                    "project_names": sorted({path.split("/", 1)[0] for path in result["generated_files"]}),
+                    "generated_files": len(result["generated_files"]),
+                    "token_usage": run_token_usage_var.get(),
+                    "model_routes": run_model_routes_var.get(),
+                    "normalization": result.get("normalization"),
+                }
+            except Exception as e:
+                logger.exception("Batch document failed", extra={"batch_id": batch.batch_id, "index": doc["index"]})
+                update = {"status": "failed", "error": str(e)}
+            finally:
+                run_token_usage_var.reset(usage_token)
+                run_model_routes_var.reset(routes_token)
+            update.update(run_id=run_id, seconds=round(time.perf_counter() - start, 3))
+
+        self._update(batch, indexes[:1], **update)
+        # Duplicates point at the original's output instead of repeating the run
+        self._update(batch, indexes[1:], **dict(update, output_dir=doc["output_dir"], parsed_dir=doc["parsed_dir"]))
+        BATCH_DOCUMENTS.labels(status=update["status"]).inc(len(indexes))
+        logger.info("Batch document finished", extra={"batch_id": batch.batch_id, "index": doc["index"],
+                                                       "status": update["status"], "seconds": update["seconds"]})
+
+    def _update(self, batch: _Batch, indexes: List[int], **fields) -> None:
+        if not indexes:
+            return
+        with self._lock:
+            for index in indexes:
+                batch.documents[index].update(fields)
+            self._write_manifest(batch)
+
+    def _write_manifest(self, batch: _Batch) -> None:
+        """Atomically rewrite the batch's manifest; called with the lock held."""
+        fd, tmp_path = tempfile.mkstemp(dir=batch.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(batch.snapshot(), f, indent=2)
+            os.replace(tmp_path, os.path.join(batch.root, MANIFEST_NAME))
+        except OSError as e:
+            logger.warning("Could not write batch manifest", extra={"batch_id": batch.batch_id, "error": str(e)})
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _forget_finished(self) -> None:
+        """Drop the oldest finished batches from memory; called with the lock held."""
+        finished = [batch_id for batch_id, batch in self._batches.items()
+                    if batch.snapshot()["status"] not in ("queued", "running")]
+        for batch_id in finished[:max(0, len(self._batches) - BATCH_HISTORY)]:
+            del self._batches[batch_id]
@@ -0,0 +1,142 @@
+"""DOCX extraction benchmark: python-docx DOM vs the streaming document.xml reader.
+
+Builds synthetic BRDs with 100, 1000 and 3000 sections (a heading, a few paragraphs
+and a requirements table each) and extracts them three ways:
+
+  docx-paragraphs  the old path, python-docx `doc.paragraphs` (drops every table)
+  docx-tables      python-docx walking paragraphs and tables, i.e. the DOM fix
+  streaming        docx_text.extract_docx_text (lxml iterparse, blocks freed as emitted)
+
+Each extraction runs in a fresh process so its peak RSS growth can be measured.
+The streaming output is checked to contain exactly the python-docx paragraphs,
+in order, plus one line per table row.
+
+Usage (from backend/):
+    python benchmarks/bench_docx.py
+    python benchmarks/bench_docx.py --sections 1000 20000 --repeat 1
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from docx import Document  # noqa: E402
+
+from docx_text import CELL_SEPARATOR, extract_docx_text  # noqa: E402
+
+METHODS = ("docx-paragraphs", "docx-tables", "streaming")
+TABLE_ROWS = 8
+
+
+def build_docx(path: str, sections: int) -> None:
+    doc = Document()
+    for i in range(sections):
+        doc.add_heading(f"{i + 1}. Module {i}", level=2)
+        doc.add_paragraph(f"The module {i} manages the records of the business unit and their lifecycle.")
+        doc.add_paragraph(f"Entity: Record{i}")
+        doc.add_paragraph("Stakeholders review every change before it is released.")
+        table = doc.add_table(rows=1, cols=4)
+        for cell, title in zip(table.rows[0].cells, ("ID", "Requirement", "Priority", "Acceptance criteria")):
+            cell.text = title
+        for j in range(TABLE_ROWS):
+            cells = table.add_row().cells
+            cells[0].text = f"FR-{i:05d}-{j}"
+            cells[1].text = f"The system shall validate field {j} of Record{i} before saving"
+            cells[2].text = ("High", "Medium", "Low")[j % 3]
+            cells[3].text = f"Saving Record{i} with an invalid field {j} is rejected with a message"
+    doc.save(path)
+
+
+def extract(method: str, path: str) -> str:
+    if method == "streaming":
+        return extract_docx_text(path)
+    doc = Document(path)
+    if method == "docx-paragraphs":
+        return "\n".join(para.text for para in doc.paragraphs)
+    lines = [para.text for para in doc.paragraphs]
+    for table in doc.tables:
+        lines += [CELL_SEPARATOR.join(cell.text for cell in row.cells) for row in table.rows]
+    return "\n".join(lines)
+
+
+def peak_rss_kb() -> int:
+    """Peak RSS of this process. VmHWM starts over at exec; ru_maxrss keeps the parent's peak on Linux."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _measure(method: str, path: str, repeat: int, queue) -> None:
+    """Runs in a fresh process: best time over `repeat` runs and the peak RSS growth of the first."""
+    before = peak_rss_kb()
+    best = float("inf")
+    text = ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract(method, path)
+        best = min(best, time.perf_counter() - start)
+    peak_kb = peak_rss_kb() - before
+    queue.put((best, peak_kb, len(text)))
+
+
+def measure(method: str, path: str, repeat: int):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(method, path, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def check(path: str) -> bool:
+    """Streaming output = python-docx paragraphs in order, interleaved with one line per table row."""
+    doc = Document(path)
+    paragraphs = [para.text for para in doc.paragraphs]
+    rows = sum(len(table.rows) for table in doc.tables)
+    lines = extract_docx_text(path).split("\n")
+    table_lines = [line for line in lines if CELL_SEPARATOR in line]
+    return [line for line in lines if CELL_SEPARATOR not in line] == paragraphs and len(table_lines) == rows
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sections", type=int, nargs="+", default=[100, 1000, 3000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-docx-")
+    ok = True
+    print(f"{'sections':>9} {'size KB':>8} {'method':>16} {'seconds':>9} {'peak MB':>8} {'chars':>10}")
+    try:
+        for sections in args.sections:
+            path = os.path.join(workdir, f"brd-{sections}.docx")
+            build_docx(path, sections)
+            if not check(path):
+                ok = False
+                print(f"[FAIL] streaming output differs from python-docx for {sections} sections")
+            for method in METHODS:
+                seconds, peak_kb, chars = measure(method, path, args.repeat)
+                print(f"{sections:>9} {os.path.getsize(path) // 1024:>8} {method:>16} {seconds:>9.3f} "
+                      f"{peak_kb / 1024:>8.1f} {chars:>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    if ok:
+        print("\n[ok]   streaming output matches python-docx paragraphs and table rows")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
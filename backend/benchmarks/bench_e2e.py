@@ -0,0 +1,230 @@
+"""Offline end-to-end benchmark of the /upload path.
+
+Runs every BRD in brd-examples/ through /upload (extraction, parse, codegen
+pipeline, save) followed by the /generated-code zip, with Gemini replaced by
+FakeGemini and Kroki by a local FakeKroki server (see benchmarks/fakes.py).
+Reports per-stage and end-to-end timings, peak traced memory and throughput,
+and writes them to benchmarks/results/e2e-<commit>.json for comparison.
+
+Stage timings come from the app's own Prometheus histograms, so they measure
+exactly what /metrics reports in production.
+
+Usage (from backend/):
+    python benchmarks/bench_e2e.py
+    python benchmarks/bench_e2e.py --repeat 5 --llm-latency 0.5 --kroki-latency 0.05
+    python benchmarks/bench_e2e.py --compare benchmarks/results/e2e-<commit>.json
+    python benchmarks/bench_e2e.py --record   # capture real Gemini responses (needs GEMINI_API_KEY)
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import FakeGemini, RecordingGemini, git_commit, offline_app  # noqa: E402
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "brd-examples")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SUPPORTED_EXTENSIONS = (".txt", ".docx", ".pdf")
+
+
+def metric_sums() -> Dict[str, float]:
+    """Current _sum of every app latency histogram, keyed like 'stage:parse' or 'kroki'."""
+    from prometheus_client import REGISTRY
+
+    sums: Dict[str, float] = defaultdict(float)
+    for family in REGISTRY.collect():
+        for sample in family.samples:
+            if not sample.name.endswith("_sum"):
+                continue
+            labels = sample.labels
+            if sample.name == "brdynamo_stage_duration_seconds_sum":
+                sums[f"stage:{labels['stage']}"] += sample.value
+            elif sample.name == "brdynamo_extraction_duration_seconds_sum":
+                sums["extraction"] += sample.value
+            elif sample.name == "brdynamo_llm_call_duration_seconds_sum":
+                sums[f"llm:{labels['call']}"] += sample.value
+            elif sample.name == "brdynamo_kroki_render_duration_seconds_sum":
+                # Renders run sequentially inside the diagrams stage; report their total
+                sums["kroki"] += sample.value
+    return sums
+
+
+def upload_once(client, path: str) -> Dict:
+    """One /upload plus /generated-code; returns wall times and the stage breakdown."""
+    before = metric_sums()
+    with open(path, "rb") as f:
+        start = time.perf_counter()
+        response = client.post("/upload", data={"file": (f, os.path.basename(path))})
+        upload_seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"/upload failed for {path}: {response.get_json()}")
+
+    start = time.perf_counter()
+    download = client.get("/generated-code")
+    download.get_data()
+    zip_seconds = time.perf_counter() - start
+
+    after = metric_sums()
+    stages = {key: after[key] - before.get(key, 0.0) for key in after if after[key] - before.get(key, 0.0) > 0}
+    return {
+        "end_to_end_s": upload_seconds,
+        "zip_request_s": zip_seconds,
+        "stages": stages,
+        "files_generated": len(response.get_json()["generated_files"]),
+    }
+
+
+def peak_memory(client, path: str) -> int:
+    """Peak traced allocation during one upload (a separate pass; tracing skews timings)."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        with open(path, "rb") as f:
+            client.post("/upload", data={"file": (f, os.path.basename(path))})
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    stage_keys = sorted({key for run in runs for key in run["stages"]})
+    return {
+        "end_to_end_s": statistics.median(run["end_to_end_s"] for run in runs),
+        "end_to_end_min_s": min(run["end_to_end_s"] for run in runs),
+        "zip_request_s": statistics.median(run["zip_request_s"] for run in runs),
+        "stages": {key: statistics.median(run["stages"].get(key, 0.0) for run in runs) for key in stage_keys},
+        "files_generated": runs[-1]["files_generated"],
+    }
+
+
+def print_report(results: Dict) -> None:
+    print(f"\n{'document':<40} {'KB':>7} {'e2e ms':>9} {'zip ms':>8} {'peak MB':>8} {'files':>6}")
+    for name, doc in results["documents"].items():
+        print(f"{name:<40} {doc['bytes'] / 1024:>7.1f} {doc['end_to_end_s'] * 1e3:>9.1f} "
+              f"{doc['zip_request_s'] * 1e3:>8.1f} {doc['peak_memory_bytes'] / 2**20:>8.2f} {doc['files_generated']:>6}")
+
+    print(f"\n{'stage (median ms, summed over documents)':<44} {'ms':>9}")
+    for stage, seconds in sorted(results["summary"]["stages"].items(), key=lambda item: -item[1]):
+        print(f"{stage:<44} {seconds * 1e3:>9.1f}")
+
+    summary = results["summary"]
+    print(f"\n{summary['uploads']} uploads in {summary['wall_s']:.2f}s: {summary['uploads_per_s']:.2f} uploads/s, "
+          f"{summary['input_bytes_per_s'] / 1024:.1f} KB/s of BRD input, peak {summary['peak_memory_bytes'] / 2**20:.2f} MB")
+
+
+def print_comparison(results: Dict, baseline: Dict) -> None:
+    def delta(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    print(f"\nCompared with {baseline['commit']}:")
+    for name, doc in results["documents"].items():
+        old = baseline["documents"].get(name)
+        if old:
+            print(f"  {name:<40} e2e {delta(doc['end_to_end_s'], old['end_to_end_s']):>8}   "
+                  f"peak memory {delta(doc['peak_memory_bytes'], old['peak_memory_bytes']):>8}")
+    for stage, seconds in sorted(results["summary"]["stages"].items()):
+        if stage in baseline["summary"]["stages"]:
+            print(f"  {stage:<40} {delta(seconds, baseline['summary']['stages'][stage]):>8}")
+    print(f"  {'throughput (uploads/s)':<40} "
+          f"{delta(results['summary']['uploads_per_s'], baseline['summary']['uploads_per_s']):>8}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="timed uploads per document")
+    parser.add_argument("--examples", default=EXAMPLES_DIR, help="folder of BRD files to upload")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every fake Gemini call")
+    parser.add_argument("--kroki-latency", type=float, default=0.0, help="seconds added to every fake Kroki render")
+    parser.add_argument("--max-output-chars", type=int,
+                        help="cut fake codegen responses at this length to exercise truncation continuations")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/e2e-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--record", action="store_true",
+                        help="call the real Gemini API once per document and save the responses as recordings")
+    args = parser.parse_args()
+
+    documents = sorted(
+        os.path.join(args.examples, name) for name in os.listdir(args.examples)
+        if name.endswith(SUPPORTED_EXTENSIONS)
+    )
+
+    if args.record:
+        import google.generativeai as genai
+        gemini = RecordingGemini(genai.GenerativeModel)
+    else:
+        gemini = FakeGemini(latency=args.llm_latency, max_output_chars=args.max_output_chars)
+
+    with offline_app(gemini, kroki_latency=args.kroki_latency) as app_main:
+        client = app_main.app.test_client()
+
+        if args.record:
+            for path in documents:
+                upload_once(client, path)
+                print(f"recorded {os.path.basename(path)}")
+            return 0
+
+        # Warm-up: template compilation, imports and first-use caches
+        upload_once(client, documents[0])
+
+        per_document: Dict[str, Dict] = {}
+        wall_start = time.perf_counter()
+        runs: Dict[str, List[Dict]] = {path: [] for path in documents}
+        for _ in range(args.repeat):
+            for path in documents:
+                runs[path].append(upload_once(client, path))
+        wall_seconds = time.perf_counter() - wall_start
+
+        for path in documents:
+            per_document[os.path.basename(path)] = {
+                "bytes": os.path.getsize(path),
+                **summarize(runs[path]),
+                "peak_memory_bytes": peak_memory(client, path),
+            }
+
+    stage_totals: Dict[str, float] = defaultdict(float)
+    for doc in per_document.values():
+        for stage, seconds in doc["stages"].items():
+            stage_totals[stage] += seconds
+    uploads = args.repeat * len(documents)
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "settings": {"repeat": args.repeat, "llm_latency": args.llm_latency, "kroki_latency": args.kroki_latency,
+                     "max_output_chars": args.max_output_chars},
+        "documents": per_document,
+        "summary": {
+            "uploads": uploads,
+            "wall_s": wall_seconds,
+            "uploads_per_s": uploads / wall_seconds,
+            "input_bytes_per_s": args.repeat * sum(doc["bytes"] for doc in per_document.values()) / wall_seconds,
+            "peak_memory_bytes": max(doc["peak_memory_bytes"] for doc in per_document.values()),
+            "stages": dict(stage_totals),
+        },
+    }
+
+    print_report(results)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(results, json.load(f))
+
+    output = args.output or os.path.join(RESULTS_DIR, f"e2e-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"\nResults written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""Scaling benchmark for the deterministic (non-LLM) generators.
+
+Builds synthetic BRDs with 10, 100 and 1000 entities, times the Spring boilerplate,
+JIRA, database and PlantUML generators, checks that the output is byte-identical to the recorded
+golden digests and that generation time grows linearly with the data model.
+
+Usage (from backend/):
+    python benchmarks/bench_generators.py
+    python benchmarks/bench_generators.py --sizes 100 1000 10000 --repeat 1
+    python benchmarks/bench_generators.py --record-golden   # after an intended output change
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from brd_model import BrdModel  # noqa: E402
+from codegenerator_agent import CodeGeneratorAgent  # noqa: E402
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generator_golden.json")
+FIXTURE_PATH = os.path.join(BACKEND_DIR, "parsed_json", "minimal_test_brd_parsed.json")
+FIXED_TIMESTAMP = "2025-01-01 00:00:00"
+ATTRIBUTE_TYPES = ["uuid", "string", "integer", "decimal", "timestamp", "boolean", "text"]
+# Allowed growth of time-per-entity between the smallest and largest size
+LINEARITY_TOLERANCE = 3.0
+
+
+def synthetic_brd(entity_count: int) -> dict:
+    """Build a parsed BRD with entity_count entities, requirements, rules and endpoints."""
+    entities = []
+    for i in range(entity_count):
+        attributes = [{"name": "id", "type": "uuid", "constraints": ["primary"]}]
+        for j, attr_type in enumerate(ATTRIBUTE_TYPES[1:]):
+            attributes.append({
+                "name": f"field{j}",
+                "type": attr_type,
+                "constraints": ["not null"] if j % 2 else [],
+                "nullable": bool(j % 3),
+            })
+        entities.append({"name": f"Entity{i}", "attributes": attributes})
+
+    return {
+        "project_overview": {"name": f"Scaling Benchmark Inventory {entity_count}", "description": "Synthetic BRD"},
+        "functional_requirements": [
+            {"id": f"FR-{i:04d}", "title": f"Requirement {i}", "description": f"manage entity {i} records",
+             "priority": ["High", "Medium", "Low"][i % 3]}
+            for i in range(entity_count)
+        ],
+        "business_rules": [
+            {"title": f"Rule {i}", "description": f"Entity{i} values must be validated"}
+            for i in range(entity_count)
+        ],
+        "api_specifications": {
+            "endpoints": [
+                {"path": f"/api/entity{i}s", "method": ["GET", "POST", "PUT", "DELETE"][i % 4],
+                 "description": f"Operate on Entity{i}"}
+                for i in range(entity_count)
+            ]
+        },
+        "data_model": {"entities": entities},
+    }
+
+
+def run_generators(agent: CodeGeneratorAgent, parsed_brd: dict) -> dict:
+    """Run every deterministic generator except Kroki rendering and return path -> content."""
+    files = {}
+    brd = BrdModel.from_parsed(parsed_brd)
+    with contextlib.redirect_stdout(io.StringIO()):
+        files.update(agent._generate_spring_boilerplate(brd))
+        files.update(agent._generate_database_scripts(brd))
+        files.update(agent._generate_jira_stories(brd))
+        with mock.patch.object(agent, "_render_with_kroki", return_value=None):
+            files.update(agent._generate_architecture_diagrams(brd))
+    return files
+
+
+def digest(files: dict) -> dict:
+    """sha256 per file; generated Java sources get one digest per folder so the golden file stays small."""
+    hashes = {}
+    for path, content in sorted(files.items()):
+        if path.endswith(".java"):
+            hashes.setdefault(os.path.dirname(path) + "/*.java", hashlib.sha256()).update(
+                f"{path}\0{content}\0".encode("utf-8"))
+        else:
+            hashes[path] = hashlib.sha256(content.encode("utf-8"))
+    return {key: h.hexdigest() for key, h in hashes.items()}
+
+
+def time_generators(agent: CodeGeneratorAgent, parsed_brd: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_generators(agent, parsed_brd)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--record-golden", action="store_true", help="overwrite the golden digests")
+    args = parser.parse_args()
+    # Kroki is mocked out, so the diagram generator would log a failure per render
+    logging.disable(logging.CRITICAL)
+
+    agent = CodeGeneratorAgent(tempfile.mkdtemp(prefix="bench-generators-"))
+    with open(FIXTURE_PATH, "r", encoding="utf-8") as f:
+        cases = {"fixture": json.load(f)}
+    cases.update({str(size): synthetic_brd(size) for size in args.sizes})
+
+    with mock.patch.object(CodeGeneratorAgent, "_get_current_timestamp", return_value=FIXED_TIMESTAMP):
+        digests = {name: digest(run_generators(agent, brd)) for name, brd in cases.items()}
+
+        if args.record_golden:
+            with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+                json.dump(digests, f, indent=2, sort_keys=True)
+                f.write("\n")
+            print(f"Recorded golden digests for {', '.join(digests)} to {GOLDEN_PATH}")
+            return 0
+
+        with open(GOLDEN_PATH, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+
+        ok = True
+        for name, files in digests.items():
+            if name not in golden:
+                print(f"[skip] no golden digests recorded for '{name}'")
+                continue
+            mismatched = [path for path in set(files) | set(golden[name]) if files.get(path) != golden[name].get(path)]
+            if mismatched:
+                ok = False
+                print(f"[FAIL] output differs for '{name}': {', '.join(sorted(mismatched))}")
+            else:
+                print(f"[ok]   output identical for '{name}' ({len(files)} files)")
+
+        print(f"\n{'entities':>10} {'seconds':>10} {'us/entity':>10}")
+        per_entity = []
+        for size in args.sizes:
+            elapsed = time_generators(agent, cases[str(size)], args.repeat)
+            per_entity.append(elapsed / size)
+            print(f"{size:>10} {elapsed:>10.4f} {elapsed / size * 1e6:>10.1f}")
+
+    growth = per_entity[-1] / per_entity[0] if per_entity and per_entity[0] else 0.0
+    linear = growth <= LINEARITY_TOLERANCE
+    print(f"\nTime-per-entity growth {args.sizes[0]} -> {args.sizes[-1]}: {growth:.2f}x "
+          f"({'linear' if linear else 'SUPERLINEAR'}, tolerance {LINEARITY_TOLERANCE}x)")
+    return 0 if ok and linear else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
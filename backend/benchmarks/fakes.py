@@ -0,0 +1,406 @@
+"""Offline stand-ins for Gemini and Kroki used by the benchmark harnesses.
+
+FakeGemini replaces genai.GenerativeModel. For each BRD it serves the recorded
+responses in benchmarks/recordings/<project>.parse.json / <project>.codegen.txt
+when they exist (capture them with `bench_e2e.py --record`), and otherwise builds
+a deterministic synthetic response whose size follows the BRD: entities and
+requirements are lifted from the document text, and the codegen output has the
+usual set of Java files per entity.
+
+FakeKroki is a local HTTP server answering the Kroki POST and GET endpoints with
+placeholder SVG/PNG bodies sized like real renders. offline_app() wires both into
+the Flask app with every data folder moved to a temporary directory.
+"""
+import atexit
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Dict, Iterator, List, Optional
+from unittest import mock
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from brd_model import generate_project_names  # noqa: E402
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+
+_PROJECT_NAME_RE = re.compile(r"^\s*Project Name:\s*(.+)$", re.MULTILINE)
+_ATTRIBUTE_RE = re.compile(r"^\s*-\s*([A-Za-z_]\w*):\s*([A-Za-z_]+)(?:\([^)]*\))?\s*(?:\((.*)\))?\s*$")
+_ENTITY_LINE_RE = re.compile(r"^\s*-\s*Entity:\s*(\w+)")
+_HEADING_RE = re.compile(r"^([A-Z][\w ]*):\s*$")
+_BULLET_RE = re.compile(r"^\s*-\s+(.+)$")
+_PROJECT_IN_PROMPT_RE = re.compile(r"project named '([^']+)'")
+_PACKAGE_IN_PROMPT_RE = re.compile(r"com\.brdynamo\.(\w+)")
+_SECTION_RE = re.compile(r"^=== filename:\s*(.+?)\s*===\s*\n.*?(?=^=== filename:|\Z)", re.DOTALL | re.MULTILINE)
+_DONE_FILE_RE = re.compile(r"^- (.+)$", re.MULTILINE)
+
+
+class FakeResponse:
+    """The subset of GenerateContentResponse the app reads."""
+
+    def __init__(self, text: str, prompt: str = "", finish_reason: str = "STOP"):
+        self.text = text
+        self.usage_metadata = FakeUsage(approx_tokens(prompt), approx_tokens(text))
+        self.candidates = [FakeCandidate(finish_reason)]
+
+
+class FakeCandidate:
+    def __init__(self, finish_reason: str):
+        # Stands in for the Candidate.FinishReason enum; the app reads its name
+        self.finish_reason = SimpleNamespace(name=finish_reason)
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count: int, candidates_token_count: int):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+def approx_tokens(text: str) -> int:
+    """Rough Gemini token count (about four characters per token)."""
+    return (len(text) + 3) // 4
+
+
+def synthetic_parse(brd_text: str) -> Dict:
+    """Parsed-BRD JSON built from the document text with simple line heuristics."""
+    name_match = _PROJECT_NAME_RE.search(brd_text)
+    entities: List[Dict] = []
+    requirements: List[Dict] = []
+    current: Optional[Dict] = None
+
+    for line in brd_text.splitlines():
+        entity_match = _ENTITY_LINE_RE.match(line)
+        heading_match = _HEADING_RE.match(line)
+        attribute_match = _ATTRIBUTE_RE.match(line)
+        if entity_match or heading_match:
+            name = (entity_match or heading_match).group(1).strip().replace(" ", "")
+            current = {"name": name[:-1] if name.endswith("s") and not entity_match else name, "attributes": []}
+            continue
+        if attribute_match and current is not None:
+            if not current["attributes"]:
+                entities.append(current)
+            field, field_type, constraints = attribute_match.groups()
+            current["attributes"].append({
+                "name": field,
+                "type": field_type,
+                "constraints": [c.strip() for c in (constraints or "").split(",") if c.strip()],
+            })
+            continue
+        bullet_match = _BULLET_RE.match(line)
+        if bullet_match and not attribute_match:
+            current = None
+            requirements.append({
+                "id": f"FR-{len(requirements) + 1:03d}",
+                "title": bullet_match.group(1)[:80],
+                "description": bullet_match.group(1),
+                "priority": "Medium",
+            })
+
+    return {
+        "project_overview": {"name": name_match.group(1).strip() if name_match else "Benchmark Project"},
+        "functional_requirements": requirements,
+        "non_functional_requirements": [],
+        "data_model": {"entities": entities},
+    }
+
+
+def synthetic_codegen(project_name: str, package_name: str, entities: List[Dict]) -> str:
+    """Codegen response in the `=== filename: ... ===` format: what the prompt asks the model for
+    (wrapper scripts plus service, exception and tests per entity; the rest comes from templates)."""
+    root = f"{project_name}/src/main/java/com/brdynamo/{package_name}"
+    test_root = f"{project_name}/src/test/java/com/brdynamo/{package_name}"
+    sections = [
+        (f"{project_name}/gradlew", "#!/bin/sh\n" + "# wrapper\n" * 40),
+        (f"{project_name}/src/test/resources/application-test.properties", "spring.jpa.show-sql=true\n" * 5),
+    ]
+    for entity in entities:
+        name = str(entity.get("name") or "Item")
+        attributes = [str(a.get("name") if isinstance(a, dict) else a) for a in entity.get("attributes") or []]
+        checks = "\n".join(
+            f"        if (entity.get{attr.title()}() == null) throw new {name}ValidationException(\"{attr}\");"
+            for attr in attributes
+        )
+        asserts = "\n".join(f"        assertNotNull(entity.get{attr.title()}());" for attr in attributes)
+        sections += [
+            (f"{root}/service/{name}Service.java",
+             f"public class {name}Service {{\n    public {name} save({name} entity) {{\n{checks}\n"
+             f"        return repository.save(entity);\n    }}\n}}"),
+            (f"{root}/exception/{name}ValidationException.java",
+             f"public class {name}ValidationException extends RuntimeException {{}}"),
+            (f"{test_root}/service/{name}ServiceTest.java", f"class {name}ServiceTest {{\n{asserts}\n}}"),
+            (f"{test_root}/controller/{name}ControllerTest.java", f"class {name}ControllerTest {{\n{asserts}\n}}"),
+        ]
+    return "".join(f"=== filename: {path} ===\n{content}\n" for path, content in sections)
+
+
+def _application_entities(prompt: str) -> List[Dict]:
+    """Entities from the JSON block after APPLICATION DATA in the codegen prompt."""
+    marker = prompt.find("APPLICATION DATA:")
+    if marker < 0:
+        return []
+    start = prompt.find("{", marker)
+    try:
+        data, _ = json.JSONDecoder().raw_decode(prompt, start)
+    except ValueError:
+        return []
+    return [e for e in data.get("entities", []) if isinstance(e, dict)] if isinstance(data, dict) else []
+
+
+def _remaining_sections(text: str, prompt: str) -> str:
+    """For a continuation prompt, the sections of `text` not listed as already complete."""
+    marker = prompt.find("CONTINUATION:")
+    if marker < 0:
+        return text
+    done = set(_DONE_FILE_RE.findall(prompt, marker))
+    return "".join(m.group(0) for m in _SECTION_RE.finditer(text) if m.group(1) not in done)
+
+
+def recording_key(brd_text: str) -> str:
+    """Recordings are named after the project slug the app derives from the BRD's project name."""
+    name_match = _PROJECT_NAME_RE.search(brd_text)
+    return generate_project_names(name_match.group(1).strip() if name_match else "")[1] or "unnamed"
+
+
+class FakeGemini:
+    """Factory standing in for genai.GenerativeModel.
+
+    Stateless and thread-safe: the parse calls (JSON mode) are answered from the BRD
+    text embedded in the prompt, the codegen call from the project name and entities
+    in its prompt. `latency` adds a fixed delay per call. `max_output_chars` cuts codegen
+    responses at that length with a MAX_TOKENS finish reason, and continuation prompts
+    are answered with the files not yet generated.
+    """
+
+    def __init__(self, recordings_dir: str = RECORDINGS_DIR, latency: float = 0.0,
+                 max_output_chars: Optional[int] = None):
+        self.recordings_dir = recordings_dir
+        self.latency = latency
+        self.max_output_chars = max_output_chars
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, model_name: str = "", generation_config=None, **kwargs) -> "FakeModel":
+        return FakeModel(self, generation_config)
+
+    def _recording(self, name: str) -> Optional[str]:
+        path = os.path.join(self.recordings_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def respond(self, prompt: str, structured: bool) -> FakeResponse:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if structured:
+            brd_text = prompt.split("BRD TEXT:", 1)[-1]
+            text = self._recording(f"{recording_key(brd_text)}.parse.json")
+            return FakeResponse(text if text is not None else json.dumps(synthetic_parse(brd_text)), prompt)
+
+        project_match = _PROJECT_IN_PROMPT_RE.search(prompt)
+        package_match = _PACKAGE_IN_PROMPT_RE.search(prompt)
+        project_name = project_match.group(1) if project_match else "benchmark"
+        text = self._recording(f"{project_name}.codegen.txt")
+        if text is None:
+            package_name = package_match.group(1) if package_match else project_name.replace("-", "")
+            text = synthetic_codegen(project_name, package_name, _application_entities(prompt))
+        text = _remaining_sections(text, prompt)
+        if self.max_output_chars is not None and len(text) > self.max_output_chars:
+            return FakeResponse(text[:self.max_output_chars], prompt, finish_reason="MAX_TOKENS")
+        return FakeResponse(text, prompt)
+
+
+class FakeModel:
+    def __init__(self, backend: FakeGemini, generation_config=None):
+        self.backend = backend
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, generation_config=None, **kwargs) -> FakeResponse:
+        config = generation_config or self.generation_config
+        # The parse calls run in JSON mode; the codegen call is plain text
+        structured = getattr(config, "response_mime_type", None) == "application/json"
+        return self.backend.respond(str(prompt), structured)
+
+    def count_tokens(self, contents, **kwargs) -> "FakeTokenCount":
+        return FakeTokenCount(approx_tokens(str(contents)))
+
+
+class FakeTokenCount:
+    def __init__(self, total_tokens: int):
+        self.total_tokens = total_tokens
+
+
+class RecordingGemini:
+    """Wraps the real GenerativeModel factory and saves the first parse and codegen
+    response per project under `recordings_dir`, in the layout FakeGemini reads."""
+
+    def __init__(self, real_factory, recordings_dir: str = RECORDINGS_DIR):
+        self.real_factory = real_factory
+        self.recordings_dir = recordings_dir
+        self._saved = set()
+        self._lock = threading.Lock()
+        os.makedirs(recordings_dir, exist_ok=True)
+
+    def __call__(self, model_name: str, generation_config=None, **kwargs) -> "_RecordingModel":
+        return _RecordingModel(self, self.real_factory(model_name, generation_config=generation_config, **kwargs),
+                               generation_config)
+
+    def save(self, prompt: str, structured: bool, text: str) -> None:
+        if structured:
+            name = f"{recording_key(prompt.split('BRD TEXT:', 1)[-1])}.parse.json"
+        else:
+            project_match = _PROJECT_IN_PROMPT_RE.search(prompt)
+            name = f"{project_match.group(1) if project_match else 'benchmark'}.codegen.txt"
+        with self._lock:
+            # Later parse calls for the same project are missing-section re-prompts
+            if name in self._saved:
+                return
+            self._saved.add(name)
+        with open(os.path.join(self.recordings_dir, name), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+class _RecordingModel:
+    def __init__(self, recorder: RecordingGemini, model, generation_config=None):
+        self.recorder = recorder
+        self.model = model
+        self.generation_config = generation_config
+
+    def generate_content(self, prompt, generation_config=None, **kwargs):
+        response = self.model.generate_content(prompt, generation_config=generation_config, **kwargs)
+        config = generation_config or self.generation_config
+        self.recorder.save(str(prompt), getattr(config, "response_mime_type", None) == "application/json", response.text)
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class _KrokiHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+
+    def _render(self, diagram_source: bytes) -> None:
+        if self.latency:
+            time.sleep(self.latency)
+        output_format = self.path.strip("/").split("/")[1] if self.path.count("/") >= 2 else "svg"
+        if output_format == "svg":
+            body = (b'<svg xmlns="http://www.w3.org/2000/svg"><!-- ' + diagram_source.replace(b"--", b"- ")
+                    + b" --></svg>")
+            content_type = "image/svg+xml"
+        else:
+            # PNG signature followed by filler roughly the size of a small render
+            body = b"\x89PNG\r\n\x1a\n" + b"\0" * max(1024, len(diagram_source) * 4)
+            content_type = "image/png"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        self._render(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def do_GET(self) -> None:
+        self._render(self.path.encode("ascii"))
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+class FakeKroki:
+    """Local Kroki replacement on 127.0.0.1; use as a context manager and read `.url`."""
+
+    def __init__(self, latency: float = 0.0):
+        handler = type("KrokiHandler", (_KrokiHandler,), {"latency": latency})
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self) -> "FakeKroki":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _isolate_import() -> None:
+    """Point what `import main` creates at import time at a throwaway folder.
+
+    main opens its artifact store (importing generated_code/ into it), creates the
+    data folders and may start the retention sweeper as soon as it is imported,
+    before offline_app can patch anything, so the environment is set first.
+    """
+    if "main" in sys.modules:
+        return
+    root = tempfile.mkdtemp(prefix="brdynamo-bench-import-")
+    atexit.register(shutil.rmtree, root, ignore_errors=True)
+    os.environ.update({
+        "BRD_DATA_DIR": root,
+        "ARTIFACT_STORE_DIR": os.path.join(root, "artifacts"),
+        "ENTITY_CACHE_DIR": os.path.join(root, "entity_cache"),
+        "RETENTION_MAX_AGE_DAYS": "0",
+        "RETENTION_MAX_RUNS": "0",
+        "RETENTION_MAX_BYTES": "0",
+    })
+
+
+@contextmanager
+def offline_app(gemini=None, kroki_latency: float = 0.0) -> Iterator:
+    """Yield the imported `main` module with Gemini replaced by `gemini` (a FakeGemini
+    by default), Kroki by a FakeKroki server and all data folders in a temp dir."""
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    _isolate_import()
+    import google.generativeai as genai
+    import main as app_main
+    from artifact_store import ArtifactStore
+    from batch import BatchRunner
+    from codegenerator_agent import CodeGeneratorAgent
+    from entity_cache import EntityFileCache
+
+    workdir = tempfile.mkdtemp(prefix="brdynamo-bench-")
+    generated_dir = os.path.join(workdir, "generated_code")
+    with FakeKroki(latency=kroki_latency) as kroki, \
+            mock.patch.object(genai, "GenerativeModel", gemini or FakeGemini()), \
+            mock.patch.object(app_main, "UPLOAD_FOLDER", os.path.join(workdir, "uploads")), \
+            mock.patch.object(app_main, "PARSED_FOLDER", os.path.join(workdir, "parsed_json")), \
+            mock.patch.object(app_main, "GENERATED_CODE_FOLDER", generated_dir), \
+            mock.patch.object(app_main, "PROFILES_FOLDER", os.path.join(workdir, "profiles")), \
+            mock.patch.object(app_main, "artifact_store", ArtifactStore(os.path.join(workdir, "artifacts"))), \
+            mock.patch.object(app_main, "batch_runner",
+                              BatchRunner(os.path.join(workdir, "batches"), app_main.process_brd)), \
+            mock.patch.object(app_main, "code_generator", CodeGeneratorAgent(generated_dir)):
+        os.makedirs(app_main.UPLOAD_FOLDER)
+        app_main.code_generator.kroki_url = kroki.url
+        app_main.code_generator.entity_cache = EntityFileCache(os.path.join(workdir, "entity_cache"))
+        try:
+            yield app_main
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def git_commit() -> str:
+    """Short commit hash, suffixed with -dirty when the tree has local changes."""
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD", "--", "."], cwd=BACKEND_DIR) != 0
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
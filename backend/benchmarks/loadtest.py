@@ -0,0 +1,234 @@
+"""Concurrent load test for the Flask API.
+
+Serves the app on a local threaded werkzeug server with Gemini and Kroki stubbed
+out (see benchmarks/fakes.py), then drives a weighted mix of /upload,
+/generated-files, /diagrams, /jira-stories and /generated-code at each requested
+concurrency level. Reports p50/p95/p99 latency, error rate and throughput per
+level and per endpoint, and flags the saturation point: the first level where
+throughput stops growing (under SATURATION_GAIN) or errors pass ERROR_RATE_LIMIT.
+
+Usage (from backend/):
+    python benchmarks/loadtest.py
+    python benchmarks/loadtest.py --concurrency 1 4 16 64 --duration 20
+    python benchmarks/loadtest.py --mix upload=1,generated-files=4,diagrams=2 --llm-latency 2
+    python benchmarks/loadtest.py --url http://localhost:8000   # an already running instance
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fakes import FakeGemini, git_commit, offline_app  # noqa: E402
+
+EXAMPLES_DIR = os.path.join(os.path.dirname(BACKEND_DIR), "brd-examples")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+ENDPOINTS = {
+    "upload": ("POST", "/upload"),
+    "generated-files": ("GET", "/generated-files"),
+    "diagrams": ("GET", "/diagrams"),
+    "jira-stories": ("GET", "/jira-stories"),
+    "generated-code": ("GET", "/generated-code"),
+}
+DEFAULT_MIX = "upload=1,generated-files=2,diagrams=2,jira-stories=2,generated-code=1"
+# A level is saturated when it adds less than this much throughput over the previous one
+SATURATION_GAIN = 0.10
+ERROR_RATE_LIMIT = 0.01
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint '{name}' in --mix (choose from {', '.join(ENDPOINTS)})")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadGenerator:
+    """Closed-loop load: `concurrency` workers each send the next request as soon as the last returns."""
+
+    def __init__(self, base_url: str, mix: Dict[str, float], documents: List[str], timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.documents = [(os.path.basename(path), open(path, "rb").read()) for path in documents]
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def request(self, name: str, rng: random.Random) -> Tuple[float, bool]:
+        method, path = ENDPOINTS[name]
+        kwargs = {"timeout": self.timeout}
+        if name == "upload":
+            filename, content = rng.choice(self.documents)
+            kwargs["files"] = {"file": (filename, content)}
+        start = time.perf_counter()
+        try:
+            response = self._session().request(method, self.base_url + path, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    def run_level(self, concurrency: int, duration: float, seed: int) -> Dict:
+        samples: Dict[str, List[Tuple[float, bool]]] = defaultdict(list)
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker(index: int) -> None:
+            rng = random.Random(seed * 1000 + index)
+            while time.perf_counter() < deadline:
+                name = rng.choices(self.names, self.weights)[0]
+                result = self.request(name, rng)
+                with lock:
+                    samples[name].append(result)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+        elapsed = time.perf_counter() - start
+        return summarize_level(concurrency, elapsed, samples)
+
+
+def latency_stats(results: List[Tuple[float, bool]], elapsed: float) -> Dict:
+    latencies = sorted(seconds for seconds, _ in results)
+    errors = sum(1 for _, ok in results if not ok)
+    return {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": errors / len(results) if results else 0.0,
+        "rps": len(results) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1e3,
+        "p95_ms": percentile(latencies, 95) * 1e3,
+        "p99_ms": percentile(latencies, 99) * 1e3,
+    }
+
+
+def summarize_level(concurrency: int, elapsed: float, samples: Dict[str, List[Tuple[float, bool]]]) -> Dict:
+    everything = [result for results in samples.values() for result in results]
+    return {
+        "concurrency": concurrency,
+        "seconds": elapsed,
+        **latency_stats(everything, elapsed),
+        "endpoints": {name: latency_stats(results, elapsed) for name, results in sorted(samples.items())},
+    }
+
+
+def saturation_point(levels: List[Dict]) -> Optional[int]:
+    """First concurrency level whose throughput gain stalls or whose error rate is too high."""
+    for previous, level in zip([None] + levels, levels):
+        if level["error_rate"] > ERROR_RATE_LIMIT:
+            return level["concurrency"]
+        if previous and level["rps"] < previous["rps"] * (1 + SATURATION_GAIN):
+            return level["concurrency"]
+    return None
+
+
+def print_level(level: Dict, per_endpoint: bool) -> None:
+    print(f"{level['concurrency']:>6} {level['requests']:>8} {level['rps']:>8.1f} {level['error_rate'] * 100:>7.2f}% "
+          f"{level['p50_ms']:>9.1f} {level['p95_ms']:>9.1f} {level['p99_ms']:>9.1f}")
+    if per_endpoint:
+        for name, stats in level["endpoints"].items():
+            print(f"{'':>6} {stats['requests']:>8} {stats['rps']:>8.1f} {stats['error_rate'] * 100:>7.2f}% "
+                  f"{stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}  {name}")
+
+
+def run(args: argparse.Namespace, base_url: str) -> Dict:
+    documents = sorted(
+        os.path.join(EXAMPLES_DIR, name) for name in os.listdir(EXAMPLES_DIR)
+        if name.endswith((".txt", ".docx", ".pdf"))
+    )
+    generator = LoadGenerator(base_url, parse_mix(args.mix), documents, args.timeout)
+
+    # Make sure the read endpoints have something to serve before measuring
+    generator.request("upload", random.Random(0))
+
+    print(f"\n{'conc':>6} {'requests':>8} {'rps':>8} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    levels = []
+    for concurrency in args.concurrency:
+        level = generator.run_level(concurrency, args.duration, args.seed)
+        levels.append(level)
+        print_level(level, args.per_endpoint)
+
+    saturated_at = saturation_point(levels)
+    if saturated_at:
+        print(f"\nSaturation at concurrency {saturated_at} "
+              f"(throughput gain < {SATURATION_GAIN:.0%} or error rate > {ERROR_RATE_LIMIT:.0%})")
+    else:
+        print("\nNo saturation within the tested concurrency levels")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.url or "in-process",
+        "settings": {"mix": args.mix, "duration": args.duration, "llm_latency": args.llm_latency,
+                     "kroki_latency": args.kroki_latency},
+        "levels": levels,
+        "saturation_concurrency": saturated_at,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"endpoint=weight list (default: {DEFAULT_MIX})")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds added to every fake Gemini call")
+    parser.add_argument("--kroki-latency", type=float, default=0.0, help="seconds added to every fake Kroki render")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--per-endpoint", action="store_true", help="print a latency row per endpoint")
+    parser.add_argument("--url", help="load an already running instance instead of an in-process stubbed one")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/load-<commit>.json)")
+    args = parser.parse_args()
+
+    if args.url:
+        results = run(args, args.url)
+    else:
+        from werkzeug.serving import make_server
+
+        with offline_app(FakeGemini(latency=args.llm_latency), kroki_latency=args.kroki_latency) as app_main:
+            server = make_server("127.0.0.1", 0, app_main.app, threaded=True)
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            try:
+                results = run(args, f"http://127.0.0.1:{server.server_port}")
+            finally:
+                server.shutdown()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"load-{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
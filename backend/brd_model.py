@@ -0,0 +1,341 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Common words to filter out for shorter project names
+PROJECT_NAME_STOP_WORDS = {'system', 'platform', 'application', 'app', 'management', 'service', 'api', 'web', 'portal', 'solution', 'for', 'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'from', 'by', 'with', 'brd', 'test'}
+DEFAULT_PROJECT_NAME = "spring-app"
+
+
+def generate_project_names(project_name: str) -> Tuple[str, str, str]:
+    """Generate clean, meaningful project names from BRD project name.
+
+    Returns (clean_name, demo_project_name, package_name).
+    """
+    # Extract key words and create abbreviated names
+    words = re.findall(r'[A-Za-z]+', project_name.lower())
+    meaningful_words = [word for word in words if word not in PROJECT_NAME_STOP_WORDS and len(word) > 2]
+
+    # Create short name using first few meaningful words or abbreviation
+    if len(meaningful_words) >= 2:
+        # Use first 2-3 meaningful words
+        short_name = '-'.join(meaningful_words[:3])
+    elif len(meaningful_words) == 1:
+        short_name = meaningful_words[0]
+    else:
+        # Fallback: use first letters of all words
+        short_name = ''.join(word[0] for word in words if word)[:6]
+
+    # Limit length and ensure it's meaningful
+    if len(short_name) > 20:
+        short_name = short_name[:20].rstrip('-')
+
+    clean_name = re.sub(r'[^a-zA-Z0-9\-]', '', short_name)
+    demo_project_name = clean_name  # Remove "demo-" and "-starter" prefixes/suffixes
+    package_name = clean_name.replace('-', '')
+
+    return clean_name, demo_project_name, package_name
+
+
+def _text(value: Any, default: str = "") -> str:
+    """Coerce a parsed JSON value to a string, treating null/missing as default."""
+    if value is None:
+        return default
+    return value if isinstance(value, str) else str(value)
+
+
+def _as_list(value: Any) -> List:
+    """Coerce a parsed JSON value to a list (null -> [], scalar -> [scalar])."""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, (tuple, set)):
+        return list(value)
+    return [value]
+
+
+def _as_dict(value: Any) -> Dict:
+    return value if isinstance(value, dict) else {}
+
+
+def oracle_type(attr_type: str) -> str:
+    """Convert common BRD attribute types to Oracle column types."""
+    attr_type = attr_type.lower()
+    if attr_type == "uuid":
+        return "RAW(16)"
+    elif attr_type in ["string", "text"]:
+        return "VARCHAR2(255)"
+    elif attr_type == "integer":
+        return "NUMBER(10)"
+    elif attr_type == "decimal":
+        return "NUMBER(19,2)"
+    elif attr_type == "timestamp":
+        return "TIMESTAMP"
+    return "VARCHAR2(255)"
+
+
+def mongodb_sample_value(attr_name: str, attr_type: str) -> str:
+    """Sample field value for the MongoDB document structure."""
+    attr_type = attr_type.lower()
+    if attr_type == "uuid":
+        return "ObjectId()"
+    elif attr_type == "string":
+        return f'"{attr_name}_example"'
+    elif attr_type == "integer":
+        return "123"
+    elif attr_type == "decimal":
+        return "99.99"
+    elif attr_type == "timestamp":
+        return "new Date()"
+    return f'"{attr_name}_value"'
+
+
+# BRD attribute type (without any "(length)" suffix) -> Java type of the generated entity field
+JAVA_TYPES = {
+    "uuid": "UUID",
+    "string": "String", "text": "String", "varchar": "String", "char": "String", "email": "String",
+    "integer": "Integer", "int": "Integer",
+    "long": "Long", "bigint": "Long",
+    "decimal": "BigDecimal", "number": "BigDecimal", "numeric": "BigDecimal", "money": "BigDecimal",
+    "currency": "BigDecimal",
+    "float": "Double", "double": "Double",
+    "boolean": "Boolean", "bool": "Boolean",
+    "timestamp": "LocalDateTime", "datetime": "LocalDateTime",
+    "date": "LocalDate",
+    "time": "LocalTime",
+}
+JAVA_TYPE_IMPORTS = {
+    "UUID": "java.util.UUID",
+    "BigDecimal": "java.math.BigDecimal",
+    "LocalDateTime": "java.time.LocalDateTime",
+    "LocalDate": "java.time.LocalDate",
+    "LocalTime": "java.time.LocalTime",
+}
+JAVA_KEYWORDS = {
+    "abstract", "assert", "boolean", "break", "byte", "case", "catch", "char", "class", "const", "continue",
+    "default", "do", "double", "else", "enum", "extends", "final", "finally", "float", "for", "goto", "if",
+    "implements", "import", "instanceof", "int", "interface", "long", "native", "new", "package", "private",
+    "protected", "public", "return", "short", "static", "strictfp", "super", "switch", "synchronized", "this",
+    "throw", "throws", "transient", "try", "void", "volatile", "while",
+}
+
+
+def java_type(attr_type: str) -> str:
+    """Convert common BRD attribute types to Java field types (String when unknown)."""
+    base = re.match(r"[a-z]*", attr_type.strip().lower()).group(0)
+    return JAVA_TYPES.get(base, "String")
+
+
+def _words(name: str) -> List[str]:
+    return [word for word in re.split(r"[^A-Za-z0-9]+", name) if word]
+
+
+def java_class_name(name: str) -> str:
+    """PascalCase class name: "order item" -> OrderItem; already camel-cased names are kept."""
+    words = _words(name)
+    class_name = "".join(word[:1].upper() + word[1:] for word in words) or "Entity"
+    return class_name if not class_name[0].isdigit() else "E" + class_name
+
+
+def java_field_name(name: str) -> str:
+    """camelCase field name: "created_at" -> createdAt, "Unit Price" -> unitPrice."""
+    words = _words(name) or ["field"]
+    # Lowercase a leading acronym as a whole: ID -> id, URLPath -> urlPath
+    acronym = re.match(r"[A-Z]+(?=[A-Z][a-z]|[0-9]|$)", words[0])
+    cut = acronym.end() if acronym else 1
+    field = words[0][:cut].lower() + words[0][cut:]
+    field += "".join(word[:1].upper() + word[1:] for word in words[1:])
+    if field[0].isdigit():
+        field = "f" + field
+    return field + "Value" if field in JAVA_KEYWORDS else field
+
+
+def snake_case(name: str) -> str:
+    """Column/table style name: "OrderItem" -> order_item, "unit price" -> unit_price."""
+    spaced = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", " ", name)
+    return "_".join(word.lower() for word in _words(spaced)) or "field"
+
+
+class EntityAttribute:
+    """One entity attribute with its per-target type mappings precomputed."""
+
+    __slots__ = ("name", "type", "constraints", "nullable", "is_primary", "is_not_null", "is_unique",
+                 "oracle_type", "mongodb_sample", "java_type", "java_name", "column_name")
+
+    def __init__(self, name: str, type: str = "", constraints: Tuple[str, ...] = (), nullable: bool = True):
+        self.name = name
+        self.type = type
+        self.constraints = constraints
+        self.nullable = nullable
+        self.is_primary = any("primary" in c for c in constraints)
+        self.is_not_null = any("not null" in c for c in constraints)
+        self.is_unique = any("unique" in c for c in constraints)
+        self.oracle_type = oracle_type(type)
+        self.mongodb_sample = mongodb_sample_value(name, type)
+        self.java_type = java_type(type)
+        self.java_name = java_field_name(name)
+        self.column_name = snake_case(name)
+
+    @property
+    def is_required(self) -> bool:
+        return self.is_not_null or not self.nullable
+
+    @property
+    def java_accessor(self) -> str:
+        """Name part of the Lombok getter/setter: unitPrice -> UnitPrice."""
+        return self.java_name[:1].upper() + self.java_name[1:]
+
+    @classmethod
+    def from_parsed(cls, raw: Any) -> Optional["EntityAttribute"]:
+        """Build from an attribute dict (or bare attribute name); returns None if unnamed."""
+        if isinstance(raw, str):
+            return cls(raw.strip()) if raw.strip() else None
+        raw = _as_dict(raw)
+        name = _text(raw.get("name")).strip()
+        if not name:
+            return None
+        constraints = tuple(_text(c).strip().lower() for c in _as_list(raw.get("constraints")))
+        return cls(name, _text(raw.get("type")), constraints, bool(raw.get("nullable", True)))
+
+
+class Entity:
+    """A data model entity; `raw` keeps the original dict for the codegen prompt.
+
+    The Java names and the id attribute are precomputed for the Spring templates:
+    `id_attribute` is the primary-key attribute (or one named "id"), None when the
+    generated class has to add its own UUID id.
+    """
+
+    __slots__ = ("name", "name_lower", "attributes", "attributes_by_name", "field_list", "raw",
+                 "class_name", "table_name", "resource_path", "id_attribute", "id_java_type", "java_imports")
+
+    def __init__(self, name: str, attributes: Tuple[EntityAttribute, ...], raw: Any = None):
+        self.name = name
+        self.name_lower = name.lower()
+        self.attributes = attributes
+        self.attributes_by_name = {attr.name: attr for attr in attributes}
+        self.field_list = ", ".join(attr.name for attr in attributes) if attributes else "Standard fields"
+        self.raw = raw
+        self.class_name = java_class_name(name)
+        self.table_name = snake_case(self.class_name) + "s"
+        self.resource_path = self.table_name.replace("_", "-")
+        self.id_attribute = next((attr for attr in attributes if attr.is_primary), None) or next(
+            (attr for attr in attributes if attr.java_name == "id"), None)
+        self.id_java_type = self.id_attribute.java_type if self.id_attribute else "UUID"
+        types = {attr.java_type for attr in attributes} | {self.id_java_type}
+        self.java_imports = sorted(JAVA_TYPE_IMPORTS[t] for t in types if t in JAVA_TYPE_IMPORTS)
+
+    @classmethod
+    def from_parsed(cls, raw: Any) -> "Entity":
+        if isinstance(raw, str):
+            return cls(raw.strip() or "Entity", (), raw)
+        data = _as_dict(raw)
+        attributes = tuple(
+            attr for attr in (EntityAttribute.from_parsed(a) for a in _as_list(data.get("attributes"))) if attr
+        )
+        return cls(_text(data.get("name")).strip() or "Entity", attributes, raw)
+
+
+class Requirement:
+    """A functional requirement; title is None when the BRD doesn't give one."""
+
+    __slots__ = ("id", "title", "description", "priority", "raw")
+
+    def __init__(self, id: str, title: Optional[str], description: str, priority: str, raw: Any = None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.priority = priority
+        self.raw = raw
+
+    @classmethod
+    def from_parsed(cls, raw: Any) -> "Requirement":
+        if isinstance(raw, str):
+            return cls("", raw, raw, "Medium", raw)
+        data = _as_dict(raw)
+        title = data.get("title")
+        return cls(_text(data.get("id")), _text(title) if title is not None else None,
+                   _text(data.get("description")), _text(data.get("priority"), "Medium"), raw)
+
+
+class BusinessRule:
+    """A business rule; plain-string rules are used as both title and description."""
+
+    __slots__ = ("title", "description")
+
+    def __init__(self, title: Optional[str], description: str):
+        self.title = title
+        self.description = description
+
+    @classmethod
+    def from_parsed(cls, raw: Any) -> "BusinessRule":
+        if isinstance(raw, str):
+            return cls(raw, raw)
+        data = _as_dict(raw)
+        title = data.get("title")
+        return cls(_text(title) if title is not None else None, _text(data.get("description")))
+
+
+class ApiEndpoint:
+    __slots__ = ("path", "method", "description")
+
+    def __init__(self, path: str, method: str, description: str):
+        self.path = path
+        self.method = method
+        self.description = description
+
+    @classmethod
+    def from_parsed(cls, raw: Any) -> "ApiEndpoint":
+        data = _as_dict(raw)
+        method = _text(data.get("method"), "GET")
+        return cls(_text(data.get("path"), "/api/endpoint"), method,
+                   _text(data.get("description"), f"{method} endpoint"))
+
+
+class BrdModel:
+    """Normalized view of a parsed BRD, built once per run and shared by every generator.
+
+    Project names are derived once, attributes carry their Oracle/MongoDB mappings,
+    and entities/requirements are indexed by (lowercased) name and id.
+    """
+
+    __slots__ = ("name", "description", "clean_name", "demo_project_name", "package_name",
+                 "entities", "entities_by_name", "requirements", "requirements_by_id",
+                 "non_functional_requirements", "business_rules", "api_endpoints")
+
+    def __init__(self, name: str, description: str, entities: Tuple[Entity, ...],
+                 requirements: Tuple[Requirement, ...], non_functional_requirements: List,
+                 business_rules: Tuple[BusinessRule, ...], api_endpoints: Tuple[ApiEndpoint, ...]):
+        self.name = name
+        self.description = description
+        self.clean_name, self.demo_project_name, self.package_name = generate_project_names(name or DEFAULT_PROJECT_NAME)
+        self.entities = entities
+        self.entities_by_name = {entity.name_lower: entity for entity in entities}
+        self.requirements = requirements
+        self.requirements_by_id = {req.id: req for req in requirements if req.id}
+        self.non_functional_requirements = non_functional_requirements
+        self.business_rules = business_rules
+        self.api_endpoints = api_endpoints
+
+    @classmethod
+    def from_parsed(cls, parsed_brd: Dict) -> "BrdModel":
+        """Normalize the parsed BRD JSON, tolerating nulls, scalars and string entries."""
+        parsed_brd = _as_dict(parsed_brd)
+        overview = _as_dict(parsed_brd.get("project_overview"))
+        data_model = _as_dict(parsed_brd.get("data_model"))
+        api_specifications = _as_dict(parsed_brd.get("api_specifications"))
+
+        return cls(
+            name=_text(overview.get("name")).strip(),
+            description=_text(overview.get("description")),
+            entities=tuple(Entity.from_parsed(e) for e in _as_list(data_model.get("entities"))),
+            requirements=tuple(Requirement.from_parsed(r) for r in _as_list(parsed_brd.get("functional_requirements"))),
+            non_functional_requirements=_as_list(parsed_brd.get("non_functional_requirements")),
+            business_rules=tuple(BusinessRule.from_parsed(r) for r in _as_list(parsed_brd.get("business_rules"))),
+            api_endpoints=tuple(ApiEndpoint.from_parsed(e) for e in _as_list(api_specifications.get("endpoints"))),
+        )
+
+    @property
+    def display_name(self) -> str:
+        """Project name for human-readable documents."""
+        return self.name or "Project"
@@ -0,0 +1,378 @@
+import json
+import logging
+import re
+from typing import Annotated, Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, BeforeValidator, ConfigDict, ValidationError
+
+logger = logging.getLogger(__name__)
+
+
+class BrdParseError(ValueError):
+    """Raised when the model output cannot be turned into a BRD document."""
+
+
+# ------------------------------
+# Type coercion for common model mistakes
+# ------------------------------
+
+# Priority of requirements that don't give one
+DEFAULT_PRIORITY = "Medium"
+# Longer single-line project overviews given as a string are taken as the objective
+MAX_NAME_CHARS = 80
+
+
+def _coerce_str(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "\n".join(_coerce_str(v) for v in value)
+    if isinstance(value, dict):
+        return "; ".join(f"{key}: {_coerce_str(item)}" for key, item in value.items())
+    return str(value)
+
+
+def _coerce_optional_str(value: Any) -> Optional[str]:
+    """Like _coerce_str, but a missing or empty value is None so callers can apply their own default."""
+    value = _coerce_str(value)
+    return value or None
+
+
+def _coerce_priority(value: Any) -> str:
+    return _coerce_str(value) or DEFAULT_PRIORITY
+
+
+def _coerce_list(value: Any) -> List:
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        # {"FR-001": {...}, ...} style maps become a list of their values
+        return list(value.values()) if all(isinstance(v, dict) for v in value.values()) else [value]
+    return [value]
+
+
+def _coerce_attributes(value: Any) -> List:
+    """Accept {"field": "type", ...} maps as well as attribute lists."""
+    if isinstance(value, dict) and all(isinstance(v, str) for v in value.values()):
+        return [{"name": name, "type": attr_type} for name, attr_type in value.items()]
+    return _coerce_list(value)
+
+
+def _named(value: Any) -> Any:
+    """Allow a bare string where an object with a name is expected."""
+    return {"name": value} if isinstance(value, str) else value
+
+
+def _overview(value: Any) -> Any:
+    """A bare string overview is the project name when it is short, otherwise its objective."""
+    if isinstance(value, str):
+        return {"name": value} if len(value) <= MAX_NAME_CHARS and "\n" not in value else {"objective": value}
+    return value
+
+
+def _stakeholders(value: Any) -> Any:
+    """A bare list of stakeholders is taken as the business team."""
+    return {"business_team": value} if isinstance(value, list) else value
+
+
+def _data_model(value: Any) -> Any:
+    """A bare list of entities is the data model's entity list."""
+    return {"entities": value} if isinstance(value, list) else value
+
+
+def _described(value: Any) -> Any:
+    """Allow a bare string where an object with a description is expected."""
+    return {"description": value} if isinstance(value, str) else value
+
+
+LooseStr = Annotated[str, BeforeValidator(_coerce_str)]
+OptionalStr = Annotated[Optional[str], BeforeValidator(_coerce_optional_str)]
+Priority = Annotated[str, BeforeValidator(_coerce_priority)]
+StrList = Annotated[List[LooseStr], BeforeValidator(_coerce_list)]
+
+
+class _Section(BaseModel):
+    # Unknown keys are kept so nothing the model extracted is lost
+    model_config = ConfigDict(extra="allow")
+
+
+class ProjectOverview(_Section):
+    name: LooseStr = ""
+    objective: LooseStr = ""
+    business_context: LooseStr = ""
+    modules: StrList = []
+    timeline: LooseStr = ""
+    budget_estimate: LooseStr = ""
+
+
+class Stakeholders(_Section):
+    business_team: StrList = []
+    technical_team: StrList = []
+    approvers: StrList = []
+    end_users: StrList = []
+
+
+class FunctionalRequirement(_Section):
+    id: LooseStr = ""
+    # None lets the generators number untitled requirements ("Requirement N")
+    title: OptionalStr = None
+    description: LooseStr = ""
+    priority: Priority = DEFAULT_PRIORITY
+    dependencies: StrList = []
+    input: LooseStr = ""
+    output: LooseStr = ""
+    workflow_steps: StrList = []
+
+
+class BusinessRuleSchema(_Section):
+    title: OptionalStr = None
+    description: LooseStr = ""
+
+
+class EntityAttributeSchema(_Section):
+    name: LooseStr = ""
+    type: LooseStr = ""
+    constraints: StrList = []
+
+
+class EntitySchema(_Section):
+    name: LooseStr = ""
+    attributes: Annotated[List[Annotated[EntityAttributeSchema, BeforeValidator(_named)]], BeforeValidator(_coerce_attributes)] = []
+
+
+class DataModel(_Section):
+    entities: Annotated[List[Annotated[EntitySchema, BeforeValidator(_named)]], BeforeValidator(_coerce_list)] = []
+
+
+class ApiDetail(_Section):
+    endpoint: LooseStr = ""
+    method: LooseStr = ""
+    description: LooseStr = ""
+    request_parameters: LooseStr = ""
+    response_format: LooseStr = ""
+    response_example: LooseStr = ""
+
+
+class BrdDocument(_Section):
+    """Structure Gemini is asked to return when parsing a BRD."""
+
+    project_overview: Annotated[ProjectOverview, BeforeValidator(_overview)] = ProjectOverview()
+    stakeholders: Annotated[Stakeholders, BeforeValidator(_stakeholders)] = Stakeholders()
+    functional_requirements: Annotated[List[FunctionalRequirement], BeforeValidator(_coerce_list)] = []
+    non_functional_requirements: StrList = []
+    business_rules: Annotated[List[Annotated[BusinessRuleSchema, BeforeValidator(_described)]],
+                              BeforeValidator(_coerce_list)] = []
+    data_model: Annotated[DataModel, BeforeValidator(_data_model)] = DataModel()
+    api_details: Annotated[List[ApiDetail], BeforeValidator(_coerce_list)] = []
+    ui_specifications: StrList = []
+    security_and_compliance: StrList = []
+    risks_and_mitigations: StrList = []
+    assumptions_and_constraints: StrList = []
+    open_questions: StrList = []
+    glossary: StrList = []
+
+
+# Sections code generation can't do without; everything else defaults to empty
+REQUIRED_FIELDS = ("project_overview", "functional_requirements", "data_model")
+
+
+def gemini_response_schema(fields: Optional[Sequence[str]] = None) -> Dict:
+    """Gemini JSON-mode response schema derived from BrdDocument.
+
+    Converts the pydantic JSON schema to the OpenAPI subset Gemini accepts
+    (inlined refs, no titles/defaults). `fields` restricts it to those sections.
+    """
+    json_schema = BrdDocument.model_json_schema()
+    defs = json_schema.pop("$defs", {})
+
+    def convert(node: Dict) -> Dict:
+        if "$ref" in node:
+            return convert(defs[node["$ref"].split("/")[-1]])
+        if node.get("type") == "object" or "properties" in node:
+            return {
+                "type": "object",
+                "properties": {name: convert(value) for name, value in node.get("properties", {}).items()},
+            }
+        if node.get("type") == "array":
+            return {"type": "array", "items": convert(node.get("items", {}))}
+        if node.get("type") in ("integer", "number", "boolean"):
+            return {"type": node["type"]}
+        return {"type": "string"}
+
+    schema = convert(json_schema)
+    if fields is not None:
+        schema["properties"] = {name: schema["properties"][name] for name in fields}
+    schema["required"] = [name for name in REQUIRED_FIELDS if name in schema["properties"]]
+    return schema
+
+
+BRD_RESPONSE_SCHEMA = gemini_response_schema()
+
+
+# ------------------------------
+# Local JSON repair
+# ------------------------------
+
+_FENCE_RE = re.compile(r"^```[a-zA-Z]*\s*|\s*```\s*$")
+_CLOSERS = {"{": "}", "[": "]"}
+_LITERALS = ("true", "false", "null")
+
+
+def repair_json(raw_text: str) -> Any:
+    """Parse model output as JSON, repairing common defects locally.
+
+    Handles code fences, prose before/after the object, trailing commas and
+    truncated output (open strings and brackets are closed, a literal cut off
+    mid-word is completed and a dangling partial member is dropped). Raises
+    BrdParseError if nothing is recoverable.
+    """
+    text = _FENCE_RE.sub("", raw_text.strip())
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise BrdParseError("Model output contains no JSON object")
+
+    out: List[str] = []
+    stack: List[str] = []
+    # Positions after an opening bracket and before a comma, outside strings, with the bracket
+    # stack at that point: where a broken tail can be cut back to, the latest first
+    cuts = []
+    in_string = escape = False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+
+        if ch == '"':
+            in_string = True
+            out.append(ch)
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+            out.append(ch)
+            cuts.append((len(out), list(stack)))
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(ch)
+            if not stack:
+                break
+        elif ch == ",":
+            cuts.append((len(out), list(stack)))
+            out.append(ch)
+        else:
+            out.append(ch)
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    elif stack:
+        _complete_literal(out)
+
+    while True:
+        candidate = out[:]
+        _drop_trailing_comma(candidate)
+        candidate_text = "".join(candidate) + "".join(reversed(stack))
+        try:
+            return json.loads(candidate_text)
+        except json.JSONDecodeError as e:
+            if not cuts:
+                raise BrdParseError(f"Could not repair model output: {e}") from e
+            # Drop the incomplete member after the last comma or opening bracket and try again
+            position, stack = cuts.pop()
+            out = out[:position]
+
+
+def _complete_literal(chars: List[str]) -> None:
+    """Finish a true/false/null cut off mid-word and drop the dangling end of a cut-off number."""
+    while chars and chars[-1].isspace():
+        chars.pop()
+    tail = "".join(chars[-6:])
+    word = re.search(r"[A-Za-z]+$", tail)
+    if word and not re.search(r"\d[eE]$", tail):
+        literal = next((lit for lit in _LITERALS if lit.startswith(word.group(0))), None)
+        if literal is not None:
+            chars.extend(literal[len(word.group(0)):])
+        return
+    # Sign, decimal point or exponent with nothing after it
+    while chars and chars[-1] in "+-.eE":
+        chars.pop()
+
+
+def _drop_trailing_comma(chars: List[str]) -> None:
+    while chars and chars[-1].isspace():
+        chars.pop()
+    if chars and chars[-1] == ",":
+        chars.pop()
+
+
+# ------------------------------
+# Validation
+# ------------------------------
+
+def missing_required_fields(data: Any) -> List[str]:
+    """Required sections that are absent or empty in the raw parsed data."""
+    if not isinstance(data, dict):
+        return list(REQUIRED_FIELDS)
+    missing = []
+    for field in REQUIRED_FIELDS:
+        value = data.get(field)
+        if field == "data_model":
+            value = _data_model(value)
+            value = value.get("entities") if isinstance(value, dict) else None
+        if not value:
+            missing.append(field)
+    return missing
+
+
+def invalid_sections(data: Dict) -> List[str]:
+    """Top-level sections of the raw parsed data that can't be coerced onto the schema."""
+    try:
+        BrdDocument.model_validate(data)
+    except ValidationError as e:
+        return sorted({str(error["loc"][0]) for error in e.errors() if error["loc"]})
+    return []
+
+
+def validate_brd(data: Any) -> Dict:
+    """Coerce raw parsed data onto the BRD schema and return it as a plain dict.
+
+    Sections that still can't be coerced are reset to their defaults.
+    """
+    if not isinstance(data, dict):
+        raise BrdParseError(f"Expected a JSON object, got {type(data).__name__}")
+    invalid = invalid_sections(data)
+    if invalid:
+        logger.warning("Dropping BRD sections that don't match the schema", extra={"fields": invalid})
+        data = {key: value for key, value in data.items() if key not in invalid}
+    try:
+        return BrdDocument.model_validate(data).model_dump()
+    except ValidationError as e:
+        raise BrdParseError(f"Parsed BRD does not match the expected schema: {e}") from e
+
+
+def missing_fields_prompt(brd_text: str, fields: List[str]) -> str:
+    """Prompt asking only for the given sections of the BRD."""
+    return f"""
+    You are an expert systems analyst AI. Extract ONLY the following sections from the
+    Business Requirement Document below: {", ".join(fields)}.
+
+    BRD TEXT:
+    {brd_text}
+    """
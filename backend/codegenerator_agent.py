@@ -1,153 +1,445 @@
 import os
-import json
 import re
+import json
 import base64
 import requests
 import zlib
-from typing import Dict, List
+import uuid
+import shutil
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
 import google.generativeai as genai
+from jinja2 import Environment, FileSystemLoader, StrictUndefined
+from brd_model import BrdModel, Entity, Requirement, DEFAULT_PROJECT_NAME, JAVA_TYPE_IMPORTS, java_class_name
+from entity_cache import EntityFileCache, entity_signature, is_entity_file, supporting_files
+from pipeline import Pipeline
+from profiling import profile_thread
+from run_logging import log_payload
+from metrics import (CACHE_HITS, FAILURES, KROKI_RENDER_SECONDS, LLM_CALL_SECONDS, RETRIES, observe_pipeline_stage,
+                     record_token_usage)
+from hedging import hedger
+from model_router import router
+from prompt_budget import APPLICATION_DATA_TOKEN_BUDGET, count_tokens, estimate_tokens, fit_to_budget
+from prompt_cache import PromptCache
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")
+# Point at a self-hosted (or fake) Kroki to avoid depending on kroki.io
+KROKI_URL = os.getenv("KROKI_URL", "https://kroki.io").rstrip("/")
+# Versions written into the generated pom.xml / build.gradle
+SPRING_VERSIONS = {
+    "spring_boot": "3.2.5",
+    "dependency_management": "1.1.4",
+    "java": "17",
+    "testcontainers": "1.19.7",
+    "javafaker": "1.0.2",
+    "gradle": "8.7",
+}
+
+
+# Fixed instructions shared by every codegen run. Nothing run-specific goes in here so the
+# prefix can be served from Gemini's context cache; names and data follow in the suffix.
+_CODEGEN_INSTRUCTIONS = (
+    "You are an expert Java/Spring developer and test engineer. Write the business logic and the tests of a "
+    + "Spring Boot project whose boilerplate is already generated from templates. "
+    + "The project name (<project>), the package name (<package>) and the application data are given after these instructions.\n"
+    + "Use the exact separator format: === filename: <project>/<path> ===\n\n"
+    + "CRITICAL: Generate ALL requested files in a single response. ALL files must be nested under the '<project>/' directory.\n\n"
+    # Paths are listed relative to the project with the package roots spelled out once
+    + "Paths below are relative to '<project>/'. MAIN = src/main/java/com/brdynamo/<package>, "
+    + "TEST = src/test/java/com/brdynamo/<package>.\n\n"
+    + "ALREADY GENERATED (do NOT output these files):\n"
+    + "- pom.xml, build.gradle, settings.gradle, gradle/wrapper/gradle-wrapper.properties (Spring Boot 3, Java 17, "
+    + "web, data-jpa, validation, H2, PostgreSQL, Lombok, JUnit 5, Mockito, TestContainers, JavaFaker)\n"
+    + "- src/main/resources/application.properties (H2 in-memory datasource)\n"
+    + "- MAIN/*Application.java (main class)\n"
+    + "- MAIN/entity/<Entity>.java: Lombok @Data JPA entity per data model entity, with a no-args and an all-args "
+    + "constructor. Entity names are PascalCase. Attributes become camelCase fields typed uuid->UUID, string/text->String, "
+    + "integer->Integer, long->Long, decimal/number->BigDecimal, float/double->Double, boolean->Boolean, "
+    + "timestamp/datetime->LocalDateTime, date->LocalDate. The primary key is the attribute marked primary "
+    + "(or named id), otherwise a generated UUID field `id`.\n"
+    + "- MAIN/repository/<Entity>Repository.java: JpaRepository<<Entity>, <id type>>\n"
+    + "- MAIN/controller/<Entity>Controller.java: CRUD at /api/<entities in kebab-case plural> (e.g. OrderItem -> "
+    + "/api/order-items) backed directly by the repository: GET list, GET /{id}, POST (201), PUT /{id}, "
+    + "DELETE /{id} (204), 404 via ResponseStatusException when the id does not exist.\n\n"
+    + "GENERATE ONLY THE FOLLOWING FILES:\n\n"
+    + "1. BUSINESS LOGIC:\n"
+    + "- MAIN/service/<Entity>Service.java (business logic for the functional requirements and business rules, "
+    + "using the repositories)\n"
+    + "- MAIN/exception/*.java (custom exceptions used by the services)\n"
+    + "- gradlew (Unix wrapper script), gradlew.bat (Windows wrapper script)\n\n"
+    + "2. COMPREHENSIVE TEST FILES:\n"
+    + "- TEST/*ApplicationTests.java (Integration tests)\n"
+    + "- TEST/controller/*ControllerTest.java (Controller unit tests)\n"
+    + "- TEST/service/*ServiceTest.java (Service unit tests)\n"
+    + "- TEST/repository/*RepositoryTest.java (Repository tests)\n"
+    + "- src/test/resources/application-test.properties (Test configuration)\n\n"
+    + "3. TEST DATA AND FIXTURES:\n"
+    + "- TEST/testdata/*TestDataBuilder.java (JavaFaker test data builders)\n"
+    + "- TEST/util/TestDataGenerator.java (Test data utilities)\n"
+    + "- src/test/resources/fixtures/*.json (JSON test fixtures for each entity)\n\n"
+    + "REQUIREMENTS:\n"
+    + "- Enforce the business rules in the services and throw the custom exceptions on violations\n"
+    + "- Generate realistic test data using JavaFaker library\n"
+    + "- Create both unit tests (with @MockBean) and integration tests (@SpringBootTest)\n"
+    + "- Include TestContainers for database integration testing\n"
+    + "- Add proper JSON fixtures for API testing\n"
+    + "- Package structure: com.brdynamo.<package>\n\n"
+)
+# Follow-up requests allowed when the codegen response is cut off at the output token limit
+CODEGEN_MAX_CONTINUATIONS = int(os.getenv("CODEGEN_MAX_CONTINUATIONS", "3"))
+_FILE_HEADER_RE = re.compile(r"^=== filename:\s*(.+?)\s*===[ \t]*$", re.MULTILINE)
+_BRACED_EXTENSIONS = (".java", ".kt", ".js", ".ts", ".gradle")
+
+
+def _finish_reason(resp) -> Optional[str]:
+    """Finish reason name of the first candidate (MAX_TOKENS, STOP, ...), None if the response has none."""
+    candidates = getattr(resp, "candidates", None)
+    if not candidates:
+        return None
+    reason = getattr(candidates[0], "finish_reason", None)
+    return getattr(reason, "name", None) if reason is not None else None
+
+
+def _section_looks_incomplete(path: str, content: str) -> bool:
+    """Heuristic for a file cut off mid-way: unclosed braces, unparseable JSON or an unterminated XML document."""
+    stripped = content.strip()
+    if not stripped:
+        return True
+    ext = os.path.splitext(path)[1].lower()
+    if ext in _BRACED_EXTENSIONS:
+        return stripped.count("{") > stripped.count("}")
+    if ext == ".json":
+        try:
+            json.loads(stripped)
+        except ValueError:
+            return True
+    if ext == ".xml":
+        return not stripped.endswith(">")
+    return False
+
+
+def _is_truncated(resp, text: str) -> bool:
+    """True if the response stopped at the output limit or, unless it stopped cleanly, its last file looks cut off.
+
+    SAFETY, RECITATION, OTHER and a missing finish reason can all end a response
+    mid-file, so only STOP is taken at its word.
+    """
+    reason = _finish_reason(resp)
+    if reason == "MAX_TOKENS":
+        return True
+    if reason == "STOP":
+        return False
+    headers = list(_FILE_HEADER_RE.finditer(text))
+    if not headers:
+        return False
+    return _section_looks_incomplete(headers[-1].group(1), text[headers[-1].end():])
+
+
+def _split_at_last_complete_file(text: str) -> Tuple[str, Optional[str]]:
+    """Split truncated output into (complete files, path of the file that was cut off).
+
+    The path is None when the cut fell inside a separator line, i.e. every file
+    before it is complete.
+    """
+    last_line_start = text.rfind("\n", 0, len(text.rstrip("\n"))) + 1
+    last_line = text[last_line_start:]
+    if last_line.lstrip().startswith("===") and not _FILE_HEADER_RE.match(last_line.strip()):
+        return text[:last_line_start], None
+    headers = list(_FILE_HEADER_RE.finditer(text))
+    if not headers:
+        return "", None
+    return text[:headers[-1].start()], headers[-1].group(1)
+
+
+def _continuation_note(complete_text: str, restart_path: Optional[str]) -> str:
+    """Appended to the prompt suffix when asking the model to pick up after a truncated response."""
+    done = [match.group(1) for match in _FILE_HEADER_RE.finditer(complete_text)]
+    restart = f", starting again from the beginning of '{restart_path}'" if restart_path else ""
+    return (
+        "\n\nCONTINUATION: your previous response was cut off at the output limit. "
+        + "These files are already complete, do not output them again:\n"
+        + "".join(f"- {path}\n" for path in done)
+        + f"Continue with the remaining files{restart}, using the same separator format."
+    )
+
+
+_TYPE_KEYWORD_RE = re.compile(r"\b(?:class|interface|enum|record)\b")
+
+
+def _public_declarations(content: str) -> List[str]:
+    """Public class, constructor and method declarations of a Java source, without their bodies."""
+    return [line.strip().rstrip("{").rstrip() for line in content.splitlines()
+            if line.lstrip().startswith("public ") and not line.rstrip().endswith(";")
+            and ("(" in line or _TYPE_KEYWORD_RE.search(line))]
+
+
+def _existing_files_note(files: Dict[str, str], project: str, package_name: str) -> str:
+    """Cached files for the prompt, with the public declarations of the main (non-test) classes."""
+    main_root = f"{project}/src/main/java/com/brdynamo/{package_name}"
+    test_root = f"{project}/src/test/java/com/brdynamo/{package_name}"
+    lines = []
+    for path in sorted(files):
+        shown = path.replace(main_root, "MAIN", 1).replace(test_root, "TEST", 1)
+        lines.append(f"- {shown}")
+        if path.startswith(main_root) and path.endswith(".java"):
+            lines += [f"    {declaration}" for declaration in _public_declarations(files[path])]
+    return "\n".join(lines)
+
+
+def _bullet_lines(names: List, suffix: str = "") -> str:
+    """Render names as indented PlantUML note bullets."""
+    return "\n".join(f"  - {name}{suffix}" for name in names)
+
+
+# Templates are compiled once at import; auto_reload is off so rendering never stats the files
+_TEMPLATE_ENV = Environment(
+    loader=FileSystemLoader(TEMPLATE_DIR),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    undefined=StrictUndefined,
+    auto_reload=False,
+)
+_TEMPLATE_ENV.filters["bullets"] = _bullet_lines
+_TEMPLATES = {name: _TEMPLATE_ENV.get_template(name) for name in _TEMPLATE_ENV.list_templates(extensions=["j2"])}
+
+# Entity of the worked example in the codegen prompt prefix
+_EXAMPLE_ENTITY = Entity.from_parsed({"name": "OrderItem", "attributes": [
+    {"name": "id", "type": "uuid", "constraints": ["primary key"]},
+    {"name": "productName", "type": "string", "constraints": ["not null"]},
+    {"name": "quantity", "type": "integer", "constraints": ["not null"]},
+    {"name": "unitPrice", "type": "decimal", "constraints": ["not null"]},
+    {"name": "createdAt", "type": "timestamp"},
+]})
+
+
+def _codegen_example() -> str:
+    """Worked example for the prompt prefix: the boilerplate rendered for one entity and the files the
+    model writes for it. It shows the exact classes the generated code builds on, and it takes the
+    prefix over the context cache's minimum size, below which the prefix is resent on every call."""
+    context = {"package_name": "<package>", "entity": _EXAMPLE_ENTITY,
+               "id_import": JAVA_TYPE_IMPORTS.get(_EXAMPLE_ENTITY.id_java_type)}
+    main_root, name = "src/main/java/com/brdynamo/<package>", _EXAMPLE_ENTITY.class_name
+    boilerplate = {
+        f"{main_root}/entity/{name}.java": _TEMPLATES["spring/Entity.java.j2"].render(context),
+        f"{main_root}/repository/{name}Repository.java": _TEMPLATES["spring/Repository.java.j2"].render(context),
+        f"{main_root}/controller/{name}Controller.java": _TEMPLATES["spring/Controller.java.j2"].render(context),
+    }
+    return _TEMPLATES["prompts/codegen-example.txt.j2"].render(entity=_EXAMPLE_ENTITY, boilerplate=boilerplate)
+
+
+CODEGEN_PROMPT_PREFIX = _CODEGEN_INSTRUCTIONS + _codegen_example().rstrip("\n") + "\n\n"
+# Part of every entity cache key, so editing the instructions invalidates cached entity files
+CODEGEN_PROMPT_VERSION = hashlib.sha256(CODEGEN_PROMPT_PREFIX.encode("utf-8")).hexdigest()[:12]
 
 
 class CodeGeneratorAgent:
+    # Hidden folders used while saving; the read endpoints skip dot-folders
+    STAGING_PREFIX = ".staging-"
+    VERSIONS_DIR = ".versions"
+    # Symlink to the published version; the saved projects are under output_dir/current/
+    CURRENT_LINK = "current"
+    # Holds the published version's name where symlinks can't be created (Windows without the privilege)
+    CURRENT_POINTER = ".current"
+    # Published versions kept besides the current one, for readers still walking an older one
+    VERSIONS_KEPT = int(os.getenv("GENERATED_VERSIONS_KEPT", "2"))
+    SAVE_WORKERS = 8
+
     def __init__(self, output_dir: str):
         """Initialize the code generator with output directory."""
         self.output_dir = output_dir
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
-        # NOTE: simplified: no retries/wrappers — direct model calls
+        self.kroki_url = KROKI_URL
+        self.router = router
+        self.prompt_cache = PromptCache()
+        self.entity_cache = EntityFileCache()
+        self._save_lock = threading.Lock()
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._remove_leftover_staging()
     
     def _get_current_timestamp(self) -> str:
         """Get current timestamp for documentation."""
         from datetime import datetime
         return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
-    def _generate_project_name(self, project_name: str) -> tuple:
-        """Generate clean, meaningful project names from BRD project name."""
-        # Extract key words and create abbreviated names
-        words = re.findall(r'[A-Za-z]+', project_name.lower())
-        
-        # Common words to filter out for shorter names
-        stop_words = {'system', 'platform', 'application', 'app', 'management', 'service', 'api', 'web', 'portal', 'solution', 'for', 'the', 'and', 'or', 'of', 'in', 'on', 'at', 'to', 'from', 'by', 'with', 'brd', 'test'}
-        meaningful_words = [word for word in words if word not in stop_words and len(word) > 2]
-        
-        # Create short name using first few meaningful words or abbreviation
-        if len(meaningful_words) >= 2:
-            # Use first 2-3 meaningful words
-            short_name = '-'.join(meaningful_words[:3])
-        elif len(meaningful_words) == 1:
-            short_name = meaningful_words[0]
-        else:
-            # Fallback: use first letters of all words
-            short_name = ''.join(word[0] for word in words if word)[:6]
-        
-        # Limit length and ensure it's meaningful
-        if len(short_name) > 20:
-            short_name = short_name[:20].rstrip('-')
-        
-        clean_name = re.sub(r'[^a-zA-Z0-9\-]', '', short_name)
-        demo_project_name = clean_name  # Remove "demo-" and "-starter" prefixes/suffixes
-        package_name = clean_name.replace('-', '')
-        
-        return clean_name, demo_project_name, package_name
-
     def generate_code_from_brd(self, parsed_brd: Dict) -> Dict:
-        """Generate all code and documentation in a single comprehensive API call."""
+        """Generate all code and documentation in a single comprehensive API call.
+
+        The run is a dependency graph: the deterministic generators (workflows,
+        database scripts, JIRA stories, diagrams) don't need the model output, so
+        they run concurrently with the Gemini call instead of after it.
+        """
+        # Normalize the parsed BRD once; every stage reads from the same model
+        brd = BrdModel.from_parsed(parsed_brd)
+
+        pipeline = Pipeline(observer=observe_pipeline_stage, stage_context=profile_thread)
         # Use single comprehensive prompt to avoid rate limiting
-        comprehensive_prompt = self._create_comprehensive_prompt(parsed_brd)
-        
-        print("=== SENDING PROMPT TO AI ===")
-        print(f"Prompt length: {len(comprehensive_prompt)} characters")
-        
-        # Single API call for everything
-        resp = self.model.generate_content(comprehensive_prompt)
-        
-        print("=== AI RESPONSE RECEIVED ===")
-        print(f"Response length: {len(resp.text)} characters")
-        print("=== FIRST 1000 CHARS OF RESPONSE ===")
-        print(resp.text[:1000])
-        print("=== LAST 1000 CHARS OF RESPONSE ===")
-        print(resp.text[-1000:])
-        
+        pipeline.add_stage("entity_cache", lambda _: self._lookup_cached_entities(brd))
+        pipeline.add_stage("prompt", lambda inputs: self._create_comprehensive_prompt(brd, inputs["entity_cache"]), depends_on=["entity_cache"])
+        pipeline.add_stage("llm_codegen", lambda inputs: self._generate_with_model(inputs["prompt"]), depends_on=["prompt"])
+        pipeline.add_stage("split", lambda inputs: self._split_model_output_to_files(inputs["llm_codegen"]), depends_on=["llm_codegen"])
+        # Non-API generated content (GitHub workflows, database scripts, JIRA stories, diagrams)
+        pipeline.add_stage("github_workflows", lambda _: self._generate_github_workflows(brd))
+        pipeline.add_stage("spring_boilerplate", lambda _: self._generate_spring_boilerplate(brd))
+        pipeline.add_stage("database_scripts", lambda _: self._generate_database_scripts(brd))
+        pipeline.add_stage("jira_stories", lambda _: self._generate_jira_stories(brd))
+        pipeline.add_stage("architecture_diagrams", lambda _: self._generate_architecture_diagrams(brd))
+
+        results = pipeline.run()
+        logger.info("Pipeline finished", extra={"stage_seconds": {stage: round(seconds, 3) for stage, seconds in pipeline.timings.items()}})
+
         # Parse the comprehensive response
-        all_files = self._split_model_output_to_files(resp.text)
-        
-        print(f"=== PARSED FILES COUNT: {len(all_files)} ===")
-        for file_path in sorted(all_files.keys()):
-            print(f"  - {file_path}")
+        all_files = results["split"]
         
         # Count test files specifically
         test_files = [f for f in all_files.keys() if '/test/' in f or 'Test' in f]
-        print(f"=== TEST FILES FOUND: {len(test_files)} ===")
-        for test_file in test_files:
-            print(f"  - TEST: {test_file}")
+        logger.info("Parsed model output", extra={"file_count": len(all_files), "test_file_count": len(test_files)})
+        logger.debug("Parsed file paths", extra={"files": sorted(all_files)})
         
         # If parsing fails, add non-API generated content
         if not all_files:
-            print("WARNING: No files parsed from AI response!")
+            logger.warning("No files parsed from AI response")
             all_files = {}
+        else:
+            self._store_generated_entities(brd, all_files, results["entity_cache"])
+        for _, cached_files in results["entity_cache"].values():
+            for path, content in (cached_files or {}).items():
+                all_files.setdefault(path, content)
         
-        # Add non-API generated content (GitHub workflows, database scripts, JIRA stories, diagrams)
-        all_files.update(self._generate_github_workflows(parsed_brd))
-        all_files.update(self._generate_database_scripts(parsed_brd))
-        all_files.update(self._generate_jira_stories(parsed_brd))
-        all_files.update(self._generate_architecture_diagrams(parsed_brd))
+        # Deterministic output is merged in the same order as before, after the model's files
+        # Template output wins over anything the model generated for the same path
+        for stage in ("spring_boilerplate", "github_workflows", "database_scripts", "jira_stories", "architecture_diagrams"):
+            all_files.update(results[stage])
         
         return all_files
 
-    def _create_comprehensive_prompt(self, parsed_brd: Dict) -> str:
-        """Create a single comprehensive prompt that generates all code at once."""
-        entities = parsed_brd.get("data_model", {}).get("entities", [])
-        requirements = parsed_brd.get("functional_requirements", [])
-        nonfunc = parsed_brd.get("non_functional_requirements", [])
-
-        # Extract project name for demo naming convention
-        project_name = parsed_brd.get("project_overview", {}).get("name", "spring-app")
-        clean_name, demo_project_name, package_name = self._generate_project_name(project_name)
+    def _lookup_cached_entities(self, brd: BrdModel) -> Dict[str, Tuple[str, Optional[Dict[str, str]]]]:
+        """Entity name -> (signature, cached files or None) for every entity in the BRD."""
+        lookups = {}
+        for entity in brd.entities:
+            signature = entity_signature(entity, brd.package_name, CODEGEN_PROMPT_VERSION, brd.entities)
+            lookups[entity.name] = (signature,
+                                    self.entity_cache.lookup(signature, entity.class_name, brd.demo_project_name))
+        hits = sorted(name for name, (_, files) in lookups.items() if files)
+        if hits:
+            logger.info("Reusing cached entity files", extra={"entities": hits, "entity_count": len(lookups)})
+        return lookups
+
+    def _store_generated_entities(self, brd: BrdModel, all_files: Dict[str, str],
+                                  lookups: Dict[str, Tuple[str, Optional[Dict[str, str]]]]) -> None:
+        """Cache the files the model generated for entities that were cache misses, with the classes they import."""
+        def other_entity_file(path: str) -> bool:
+            return any(is_entity_file(path, other.class_name) for other in brd.entities)
+
+        for entity in brd.entities:
+            signature, cached_files = lookups[entity.name]
+            if cached_files:
+                continue
+            name = entity.class_name
+            files = {path: content for path, content in all_files.items() if is_entity_file(path, name)}
+            # Without the service the model skipped this entity; don't cache a partial set
+            if any(os.path.basename(path) == f"{name}Service.java" for path in files):
+                dependencies = supporting_files(files, all_files, other_entity_file)
+                self.entity_cache.store(signature, name, brd.demo_project_name, files, dependencies)
+
+    def _generate_with_model(self, prompt_suffix: str) -> str:
+        """Send the codegen prompt (cached prefix + run-specific suffix) to Gemini and return the raw response text.
+
+        A response cut off at the output limit is continued from its last complete
+        file with up to CODEGEN_MAX_CONTINUATIONS follow-up calls and stitched together.
+        """
+        prompt = CODEGEN_PROMPT_PREFIX + prompt_suffix
+        route = self.router.choose("codegen", estimate_tokens(prompt))
+        model = genai.GenerativeModel(route.model)
+        prompt_tokens = count_tokens(model, prompt)
+        logger.info("Sending codegen prompt", extra={"prompt_chars": len(prompt), "estimated_prompt_tokens": prompt_tokens,
+                                                     "model": route.model})
+        log_payload(logger, "Codegen prompt suffix", prompt_suffix)
         
-        prompt = (
-            f"You are an expert Java/Spring developer and test engineer. Generate a COMPLETE Spring Boot project named '{demo_project_name}' "
-            + "with ALL associated files including source code, tests, test data, and build configurations. "
-            + f"Use the exact separator format: === filename: {demo_project_name}/<path> ===\n\n"
-            + f"CRITICAL: Generate ALL files in a single response. ALL files must be nested under '{demo_project_name}/' directory.\n\n"
-            + "GENERATE THE FOLLOWING COMPLETE PROJECT STRUCTURE:\n\n"
-            + "1. SPRING BOOT APPLICATION FILES:\n"
-            + f"- {demo_project_name}/pom.xml (Maven with Spring Boot, JPA, H2, TestContainers, JUnit 5, Mockito, JavaFaker)\n"
-            + f"- {demo_project_name}/build.gradle (Gradle equivalent with same dependencies)\n"
-            + f"- {demo_project_name}/gradle/wrapper/gradle-wrapper.properties\n"
-            + f"- {demo_project_name}/gradlew (Unix wrapper script)\n"
-            + f"- {demo_project_name}/gradlew.bat (Windows wrapper script)\n"
-            + f"- {demo_project_name}/src/main/java/com/brdynamo/{package_name}/*Application.java (Main class)\n"
-            + f"- {demo_project_name}/src/main/java/com/brdynamo/{package_name}/entity/*.java (JPA Entities with UUID, Lombok)\n"
-            + f"- {demo_project_name}/src/main/java/com/brdynamo/{package_name}/repository/*.java (Spring Data JPA repositories)\n"
-            + f"- {demo_project_name}/src/main/java/com/brdynamo/{package_name}/service/*.java (Business logic services)\n"
-            + f"- {demo_project_name}/src/main/java/com/brdynamo/{package_name}/controller/*.java (REST controllers with CRUD)\n"
-            + f"- {demo_project_name}/src/main/java/com/brdynamo/{package_name}/exception/*.java (Custom exceptions)\n"
-            + f"- {demo_project_name}/src/main/resources/application.properties (Spring configuration)\n\n"
-            + "2. COMPREHENSIVE TEST FILES:\n"
-            + f"- {demo_project_name}/src/test/java/com/brdynamo/{package_name}/*ApplicationTests.java (Integration tests)\n"
-            + f"- {demo_project_name}/src/test/java/com/brdynamo/{package_name}/controller/*ControllerTest.java (Controller unit tests)\n"
-            + f"- {demo_project_name}/src/test/java/com/brdynamo/{package_name}/service/*ServiceTest.java (Service unit tests)\n"
-            + f"- {demo_project_name}/src/test/java/com/brdynamo/{package_name}/repository/*RepositoryTest.java (Repository tests)\n"
-            + f"- {demo_project_name}/src/test/resources/application-test.properties (Test configuration)\n\n"
-            + "3. TEST DATA AND FIXTURES:\n"
-            + f"- {demo_project_name}/src/test/java/com/brdynamo/{package_name}/testdata/*TestDataBuilder.java (JavaFaker test data builders)\n"
-            + f"- {demo_project_name}/src/test/java/com/brdynamo/{package_name}/util/TestDataGenerator.java (Test data utilities)\n"
-            + f"- {demo_project_name}/src/test/resources/fixtures/*.json (JSON test fixtures for each entity)\n\n"
-            + "REQUIREMENTS:\n"
-            + "- Use UUID for all primary keys\n"
-            + "- Include Lombok annotations (@Data, @Entity, @NoArgsConstructor, @AllArgsConstructor)\n"
-            + "- Implement proper REST endpoints (GET, POST, PUT, DELETE)\n"
-            + "- Add comprehensive error handling and custom exceptions\n"
-            + "- Include validation annotations (@NotNull, @Size, etc.)\n"
-            + "- Generate realistic test data using JavaFaker library\n"
-            + "- Create both unit tests (with @MockBean) and integration tests (@SpringBootTest)\n"
-            + "- Include TestContainers for database integration testing\n"
-            + "- Add proper JSON fixtures for API testing\n"
-            + f"- Package structure: com.brdynamo.{package_name}\n\n"
+        # Single API call for everything
+        text, truncated = self._codegen_call(model, route.model, "codegen", prompt_suffix, prompt_tokens)
+
+        continuations = 0
+        previous_complete: Optional[str] = None
+        while truncated:
+            complete_text, restart_path = _split_at_last_complete_file(text)
+            # A file longer than the output limit can't be finished by asking again
+            if continuations >= CODEGEN_MAX_CONTINUATIONS or complete_text == previous_complete:
+                FAILURES.labels(stage="codegen_truncated").inc()
+                logger.warning("Codegen output still truncated, dropping the incomplete last file",
+                               extra={"continuations": continuations, "dropped_file": restart_path})
+                text = complete_text
+                break
+            previous_complete = complete_text
+            continuations += 1
+            RETRIES.labels(operation="codegen_continuation").inc()
+            logger.warning("Codegen output truncated, requesting a continuation",
+                           extra={"continuation": continuations, "restart_file": restart_path,
+                                  "complete_chars": len(complete_text)})
+            suffix = prompt_suffix + _continuation_note(complete_text, restart_path)
+            continuation_text, truncated = self._codegen_call(
+                model, route.model, "codegen_continuation", suffix,
+                count_tokens(model, CODEGEN_PROMPT_PREFIX + suffix))
+            if complete_text and not complete_text.endswith("\n"):
+                complete_text += "\n"
+            text = complete_text + continuation_text.lstrip("\n")
+        return text
+
+    def _codegen_call(self, model, model_name: str, call: str, prompt_suffix: str,
+                      prompt_tokens: Optional[int]) -> Tuple[str, bool]:
+        """One codegen request; returns (response text, whether it was truncated)."""
+        with LLM_CALL_SECONDS.labels(call=call).time():
+            resp, used_cache = hedger.call(
+                call, lambda: self.prompt_cache.generate(model, CODEGEN_PROMPT_PREFIX, prompt_suffix, model_name))
+
+        usage = record_token_usage(call, resp, prompt_tokens)
+        truncated = _is_truncated(resp, resp.text)
+        logger.info("Codegen response received",
+                    extra={"call": call, "response_chars": len(resp.text), "prompt_prefix_cached": used_cache,
+                           "finish_reason": _finish_reason(resp), "truncated": truncated, **usage})
+        log_payload(logger, "Codegen response", resp.text)
+        return resp.text, truncated
+
+    def _create_comprehensive_prompt(self, brd: BrdModel,
+                                     cached_entities: Optional[Dict[str, Tuple[str, Optional[Dict[str, str]]]]] = None) -> str:
+        """Create the run-specific part of the codegen prompt; it follows CODEGEN_PROMPT_PREFIX.
+
+        Entities whose files came from the entity cache are left out of the data; the
+        model gets the cached classes' declarations instead, so its code can use them.
+        """
+        cached_entities = cached_entities or {}
+        cached = [entity for entity in brd.entities if cached_entities.get(entity.name, (None, None))[1]]
+        cached_files = {path: content for entity in cached for path, content in cached_entities[entity.name][1].items()}
+        # The model sees the entities and requirements exactly as parsed from the BRD,
+        # minus empty members, as compact JSON trimmed to the token budget
+        application_data, trimmed_fields = fit_to_budget({
+            "entities": [entity.raw for entity in brd.entities if entity not in cached],
+            "requirements": [req.raw for req in brd.requirements],
+            "business_rules": [{"title": rule.title, "description": rule.description} for rule in brd.business_rules],
+            "non_functional_requirements": brd.non_functional_requirements,
+        })
+        if trimmed_fields:
+            logger.info("Trimmed long fields to fit the prompt budget",
+                        extra={"trimmed_fields": trimmed_fields, "budget_tokens": APPLICATION_DATA_TOKEN_BUDGET})
+
+        demo_project_name, package_name = brd.demo_project_name, brd.package_name
+        
+        return (
+            f"Generate the project named '{demo_project_name}': <project> = {demo_project_name}, "
+            + f"<package> = {package_name} (package structure: com.brdynamo.{package_name}).\n\n"
+            + (f"These entities already have their service and test files: {', '.join(e.class_name for e in cached)}. "
+               + "The files below, including the classes those files use, already exist: do not generate them, "
+               + "and call them only through the declarations listed:\n"
+               + _existing_files_note(cached_files, demo_project_name, package_name) + "\n\n"
+               if cached else "")
             + "APPLICATION DATA:\n"
-            + json.dumps({"entities": entities, "requirements": requirements, "non_functional_requirements": nonfunc}, indent=2)
+            + application_data
             + "\n\nGenerate ALL files now with proper content. Start output immediately."
         )
-        return prompt
 
     def _split_model_output_to_files(self, text: str) -> Dict[str, str]:
         """Split model output into a dict of path -> content using separators.
@@ -162,22 +454,22 @@ class CodeGeneratorAgent:
         pattern = r"^=== filename:\s*(.+?)\s*===\s*\n(.*?)(?=^=== filename:|\Z)"
         matches = re.findall(pattern, text, flags=re.DOTALL | re.MULTILINE)
         
-        print(f"=== PRIMARY PATTERN MATCHES: {len(matches)} ===")
+        logger.debug("Primary separator pattern matched", extra={"matches": len(matches)})
         
         # If no matches, try alternative patterns
         if not matches:
-            print("Trying alternative separator patterns...")
+            logger.info("No primary separators found, trying alternative patterns")
             
             # Try without newline requirement
             alt_pattern1 = r"=== filename:\s*(.+?)\s*===(.*?)(?==== filename:|\Z)"
             matches = re.findall(alt_pattern1, text, flags=re.DOTALL)
-            print(f"Alternative pattern 1 matches: {len(matches)}")
+            logger.debug("Alternative pattern 1 matched", extra={"matches": len(matches)})
             
             # Try with different separator format
             if not matches:
                 alt_pattern2 = r"```\s*filename:\s*(.+?)\s*```(.*?)(?=```\s*filename:|\Z)"
                 matches = re.findall(alt_pattern2, text, flags=re.DOTALL)
-                print(f"Alternative pattern 2 matches: {len(matches)}")
+                logger.debug("Alternative pattern 2 matched", extra={"matches": len(matches)})
         
         for path, content in matches:
             p = path.strip()
@@ -186,20 +478,17 @@ class CodeGeneratorAgent:
             if clean_content:
                 files[p] = clean_content + "\n"
                 
-        print(f"=== FILES EXTRACTED: {len(files)} ===")
         if not files:
-            print("=== SAMPLE OF RAW TEXT (first 2000 chars) ===")
-            print(text[:2000])
-            print("=== SEARCHING FOR SEPARATOR PATTERNS ===")
-            separator_count = text.count("=== filename:")
-            print(f"Found {separator_count} instances of '=== filename:' in text")
+            logger.warning("No files extracted from model output",
+                           extra={"separator_count": text.count("=== filename:"), "response_chars": len(text)})
+            log_payload(logger, "Unparseable model output", text)
         
         return files
 
-    def _generate_github_workflows(self, parsed_brd: Dict) -> Dict:
+    def _generate_github_workflows(self, brd: BrdModel) -> Dict:
         """Generate GitHub Actions workflows for CI/CD."""
-        project_name = parsed_brd.get("project_overview", {}).get("name", "spring-app")
-        clean_name, demo_project_name, package_name = self._generate_project_name(project_name)
+        project_name = brd.name or DEFAULT_PROJECT_NAME
+        demo_project_name = brd.demo_project_name
         
         # CI/CD Workflow
         ci_workflow = f"""name: {demo_project_name} CI/CD Pipeline
@@ -347,93 +636,45 @@ volumes:
             f"{demo_project_name}/docker-compose.yml": docker_compose
         }
 
-    def _generate_database_scripts(self, parsed_brd: Dict) -> Dict:
+    def _generate_spring_boilerplate(self, brd: BrdModel) -> Dict:
+        """Generate the build files, configuration, entities, repositories and CRUD controllers from the data model."""
+        project, package_name = brd.demo_project_name, brd.package_name
+        main_root = f"{project}/src/main/java/com/brdynamo/{package_name}"
+        application_class = java_class_name(brd.clean_name or DEFAULT_PROJECT_NAME) + "Application"
+        context = {
+            "project_name": project,
+            "package_name": package_name,
+            "description": brd.description or brd.display_name,
+            "application_class": application_class,
+            "versions": SPRING_VERSIONS,
+        }
+
+        files = {
+            f"{project}/pom.xml": _TEMPLATES["spring/pom.xml.j2"].render(context),
+            f"{project}/build.gradle": _TEMPLATES["spring/build.gradle.j2"].render(context),
+            f"{project}/settings.gradle": _TEMPLATES["spring/settings.gradle.j2"].render(context),
+            f"{project}/gradle/wrapper/gradle-wrapper.properties": _TEMPLATES["spring/gradle-wrapper.properties.j2"].render(context),
+            f"{project}/src/main/resources/application.properties": _TEMPLATES["spring/application.properties.j2"].render(context),
+            f"{main_root}/{application_class}.java": _TEMPLATES["spring/Application.java.j2"].render(context),
+        }
+        for entity in brd.entities:
+            entity_context = dict(context, entity=entity, id_import=JAVA_TYPE_IMPORTS.get(entity.id_java_type))
+            name = entity.class_name
+            files[f"{main_root}/entity/{name}.java"] = _TEMPLATES["spring/Entity.java.j2"].render(entity_context)
+            files[f"{main_root}/repository/{name}Repository.java"] = _TEMPLATES["spring/Repository.java.j2"].render(entity_context)
+            files[f"{main_root}/controller/{name}Controller.java"] = _TEMPLATES["spring/Controller.java.j2"].render(entity_context)
+        return files
+
+    def _generate_database_scripts(self, brd: BrdModel) -> Dict:
         """Generate database scripts for Oracle and MongoDB."""
-        entities = parsed_brd.get("data_model", {}).get("entities", [])
-        project_name = parsed_brd.get("project_overview", {}).get("name", "Project")
-        clean_name, demo_project_name, package_name = self._generate_project_name(project_name)
-        
-        # Oracle SQL scripts
-        oracle_script = "-- Oracle Database Schema Script\n"
-        oracle_script += f"-- Generated for {demo_project_name}\n\n"
-        
-        for entity in entities:
-            table_name = entity.get("name", "").upper()
-            oracle_script += f"-- Table: {table_name}\n"
-            oracle_script += f"CREATE TABLE {table_name} (\n"
-            
-            for attr in entity.get("attributes", []):
-                attr_name = attr.get("name", "").upper()
-                attr_type = attr.get("type", "VARCHAR2(255)")
-                
-                # Convert common types to Oracle types
-                if attr_type.lower() == "uuid":
-                    oracle_type = "RAW(16)"
-                elif attr_type.lower() in ["string", "text"]:
-                    oracle_type = "VARCHAR2(255)"
-                elif attr_type.lower() == "integer":
-                    oracle_type = "NUMBER(10)"
-                elif attr_type.lower() == "decimal":
-                    oracle_type = "NUMBER(19,2)"
-                elif attr_type.lower() == "timestamp":
-                    oracle_type = "TIMESTAMP"
-                else:
-                    oracle_type = "VARCHAR2(255)"
-                
-                oracle_script += f"    {attr_name} {oracle_type}"
-                
-                if "primary" in attr.get("constraints", []):
-                    oracle_script += " PRIMARY KEY"
-                elif "not null" in attr.get("constraints", []):
-                    oracle_script += " NOT NULL"
-                
-                oracle_script += ",\n"
-            
-            oracle_script = oracle_script.rstrip(",\n") + "\n);\n\n"
-            
-            # Add sequences for UUID/ID fields
-            oracle_script += f"CREATE SEQUENCE {table_name}_SEQ START WITH 1 INCREMENT BY 1;\n\n"
+        demo_project_name = brd.demo_project_name
 
-        # MongoDB scripts
-        mongodb_script = "// MongoDB Collection Schema Scripts\n"
-        mongodb_script += "// Generated for " + parsed_brd.get("project_overview", {}).get("name", "Application") + "\n\n"
-        
-        for entity in entities:
-            collection_name = entity.get("name", "").lower() + "s"
-            mongodb_script += f"// Collection: {collection_name}\n"
-            mongodb_script += f"db.createCollection('{collection_name}');\n\n"
-            
-            # Create indexes
-            mongodb_script += f"// Indexes for {collection_name}\n"
-            for attr in entity.get("attributes", []):
-                if "primary" in attr.get("constraints", []):
-                    mongodb_script += f"db.{collection_name}.createIndex({{'{attr.get('name', '')}': 1}}, {{unique: true}});\n"
-            
-            mongodb_script += "\n"
-            
-            # Sample document structure
-            mongodb_script += f"// Sample document structure for {collection_name}\n"
-            mongodb_script += f"db.{collection_name}.insertOne({{\n"
-            for attr in entity.get("attributes", []):
-                attr_name = attr.get("name", "")
-                attr_type = attr.get("type", "")
-                
-                if attr_type.lower() == "uuid":
-                    sample_value = "ObjectId()"
-                elif attr_type.lower() == "string":
-                    sample_value = f'"{attr_name}_example"'
-                elif attr_type.lower() == "integer":
-                    sample_value = "123"
-                elif attr_type.lower() == "decimal":
-                    sample_value = "99.99"
-                elif attr_type.lower() == "timestamp":
-                    sample_value = "new Date()"
-                else:
-                    sample_value = f'"{attr_name}_value"'
-                
-                mongodb_script += f'    "{attr_name}": {sample_value},\n'
-            
-            mongodb_script = mongodb_script.rstrip(",\n") + "\n});\n\n"
+        oracle_script = _TEMPLATES["database/oracle-schema.sql.j2"].render(
+            project_name=demo_project_name, entities=brd.entities
+        )
+        mongodb_script = _TEMPLATES["database/mongodb-collections.js.j2"].render(
+            display_name=brd.name or "Application", entities=brd.entities
+        )
 
         return {
             f"{demo_project_name}/database/oracle/schema.sql": oracle_script,
@@ -442,7 +683,7 @@ volumes:
             f"{demo_project_name}/database/mongodb/indexes.js": "-- MongoDB Indexes\n-- Add performance indexes here\n"
         }
 
-    def _generate_jira_stories(self, parsed_brd: Dict) -> Dict:
+    def _generate_jira_stories(self, brd: BrdModel) -> Dict:
         """Generate specific, actionable JIRA stories based on the actual BRD requirements.
         
         Creates real JIRA stories that can be directly imported into JIRA, including:
@@ -454,475 +695,80 @@ volumes:
         - CSV file for direct JIRA import
         - Comprehensive sprint planning guide
         """
-        project_overview = parsed_brd.get("project_overview", {})
-        project_name = project_overview.get("name", "Project")
-        project_description = project_overview.get("description", "")
-        clean_name, demo_project_name, package_name = self._generate_project_name(project_name)
-        
-        requirements = parsed_brd.get("functional_requirements", [])
-        entities = parsed_brd.get("data_model", {}).get("entities", [])
-        api_endpoints = parsed_brd.get("api_specifications", {}).get("endpoints", [])
-        business_rules = parsed_brd.get("business_rules", [])
-        
-        # Generate comprehensive JIRA stories document
-        jira_stories = f"""# {project_name} - JIRA Epic and User Stories
-# Generated on: {self._get_current_timestamp()}
-# Project Description: {project_description}
-
-## Project Overview
-**Project Key:** {clean_name.upper()}
-**Project Type:** Software Development
-**Project Lead:** [To be assigned]
-**Target Release:** [To be determined]
+        demo_project_name = brd.demo_project_name
+        entities, requirements = brd.entities, brd.requirements
+        api_endpoints, business_rules = brd.api_endpoints, brd.business_rules
 
-"""
-
-        # Generate CSV header for JIRA import
-        csv_stories = "Issue Type,Summary,Description,Priority,Story Points,Epic Name,Assignee,Labels,Acceptance Criteria\n"
-        
+        # Story IDs run sequentially across the epics in document order
         story_id = 1
 
-        # Epic 1: Data Model Implementation
-        jira_stories += f"""## Epic 1: Data Model and Entities Implementation
-**Epic Name:** DATA-MODEL
-**Epic Summary:** Implement all data entities and database schema for {project_name}
-**Epic Description:** Create and implement all data models, entities, and database structures required for the {project_name} system.
-
-### User Stories:
-
-"""
-        
+        entity_stories = []
         for entity in entities:
-            entity_name = entity.get("name", "Entity")
-            entity_fields = entity.get("attributes", [])
-            field_list = ", ".join([f["name"] for f in entity_fields]) if entity_fields else "Standard fields"
-            
-            # Generate story for each entity
-            jira_stories += f"""#### {clean_name.upper()}-{story_id}: Create {entity_name} Entity and CRUD Operations
-**Story Type:** Story
-**Story Points:** 3
-**Priority:** High
-**Epic:** DATA-MODEL
-
-**User Story:**
-As a developer, I want to create a {entity_name} entity with full CRUD operations so that the system can manage {entity_name.lower()} data effectively.
-
-**Description:**
-Implement the {entity_name} entity with the following fields: {field_list}. Include repository, service layer, and REST controller with full CRUD operations.
-
-**Acceptance Criteria:**
-- [ ] {entity_name} JPA entity created with fields: {field_list}
-- [ ] {entity_name}Repository interface extends JpaRepository
-- [ ] {entity_name}Service implements business logic and validation
-- [ ] {entity_name}Controller provides REST endpoints (GET, POST, PUT, DELETE)
-- [ ] Custom exceptions for {entity_name} not found scenarios
-- [ ] Unit tests for service layer (minimum 80% coverage)
-- [ ] Integration tests for controller endpoints
-- [ ] OpenAPI documentation for all endpoints
-
-**Technical Tasks:**
-- Create {entity_name}.java entity class
-- Create {entity_name}Repository.java interface
-- Create {entity_name}Service.java service class
-- Create {entity_name}Controller.java REST controller
-- Write unit tests for {entity_name}Service
-- Write integration tests for {entity_name}Controller
-- Update database migration scripts
-
----
-
-"""
-            # Add CSV entry
-            csv_stories += f'Story,"{clean_name.upper()}-{story_id}: Create {entity_name} Entity","Implement {entity_name} entity with CRUD operations including fields: {field_list}",High,3,DATA-MODEL,[Assignee],backend entity crud,"{field_list} entity created; Repository and Service implemented; REST endpoints available; Tests written"\n'
+            entity_stories.append({"id": story_id, "name": entity.name, "field_list": entity.field_list})
             story_id += 1
 
-        # Epic 2: Functional Requirements Implementation
-        if requirements:
-            jira_stories += f"""## Epic 2: Functional Requirements Implementation
-**Epic Name:** FUNCTIONAL-REQS
-**Epic Summary:** Implement all functional requirements for {project_name}
-**Epic Description:** Develop all specific functional requirements and business features as defined in the BRD.
-
-### User Stories:
-
-"""
-            
-            for req in requirements:
-                req_title = req.get("title", f"Requirement {story_id}")
-                req_description = req.get("description", "")
-                priority = req.get("priority", "Medium")
-                story_points = 5 if priority == "High" else 3 if priority == "Medium" else 2
-                
-                jira_stories += f"""#### {clean_name.upper()}-{story_id}: {req_title}
-**Story Type:** Story
-**Story Points:** {story_points}
-**Priority:** {priority}
-**Epic:** FUNCTIONAL-REQS
-
-**User Story:**
-As a user, I want {req_description} so that I can accomplish my business goals effectively.
-
-**Description:**
-Implement the functional requirement: {req_title}. 
-{req_description}
-
-**Acceptance Criteria:**
-- [ ] Requirement "{req_title}" is fully implemented
-- [ ] Business logic follows the specifications in BRD
-- [ ] All edge cases and error scenarios are handled
-- [ ] API endpoints are created and documented
-- [ ] Input validation is implemented
-- [ ] Unit tests cover all business logic paths
-- [ ] Integration tests verify end-to-end functionality
-- [ ] User documentation is updated
-
-**Business Value:**
-This feature directly supports the core business objectives of the {project_name} system.
-
----
-
-"""
-                # Add CSV entry
-                csv_stories += f'Story,"{clean_name.upper()}-{story_id}: {req_title}","{req_description}",{priority},{story_points},FUNCTIONAL-REQS,[Assignee],requirement business-logic,"{req_title} implemented; Business logic working; API documented; Tests passing"\n'
-                story_id += 1
-
-        # Epic 3: API Endpoints Implementation
-        if api_endpoints:
-            jira_stories += f"""## Epic 3: API Endpoints and Integration
-**Epic Name:** API-ENDPOINTS
-**Epic Summary:** Implement all REST API endpoints for {project_name}
-**Epic Description:** Develop all API endpoints as specified in the API documentation with proper error handling and validation.
-
-### User Stories:
-
-"""
-            
-            for endpoint in api_endpoints:
-                endpoint_path = endpoint.get("path", "/api/endpoint")
-                method = endpoint.get("method", "GET")
-                description = endpoint.get("description", f"{method} endpoint")
-                
-                jira_stories += f"""#### {clean_name.upper()}-{story_id}: Implement {method} {endpoint_path} API Endpoint
-**Story Type:** Story
-**Story Points:** 2
-**Priority:** Medium
-**Epic:** API-ENDPOINTS
-
-**User Story:**
-As a client application, I want to access the {method} {endpoint_path} endpoint so that I can {description.lower()}.
-
-**Description:**
-Implement the {method} {endpoint_path} API endpoint with proper request/response handling, validation, and error management.
-
-**Acceptance Criteria:**
-- [ ] {method} {endpoint_path} endpoint is implemented
-- [ ] Request validation is in place
-- [ ] Proper HTTP status codes are returned
-- [ ] Response format matches API specification
-- [ ] Error handling for all edge cases
-- [ ] OpenAPI documentation is complete
-- [ ] Integration tests verify endpoint functionality
-- [ ] Security measures are implemented (if required)
-
----
-
-"""
-                csv_stories += f'Story,"{clean_name.upper()}-{story_id}: {method} {endpoint_path}","Implement {method} {endpoint_path} API endpoint: {description}",Medium,2,API-ENDPOINTS,[Assignee],api endpoint rest,"{method} {endpoint_path} working; Validation in place; Tests passing; Documentation complete"\n'
-                story_id += 1
-
-        # Epic 4: Business Rules Implementation
-        if business_rules:
-            jira_stories += f"""## Epic 4: Business Rules and Validation
-**Epic Name:** BUSINESS-RULES
-**Epic Summary:** Implement all business rules and validation logic for {project_name}
-**Epic Description:** Develop all business rules, validations, and constraints as defined in the BRD.
-
-### User Stories:
-
-"""
-            
-            for rule in business_rules:
-                rule_title = rule.get("title", f"Business Rule {story_id}")
-                rule_description = rule.get("description", "")
-                
-                jira_stories += f"""#### {clean_name.upper()}-{story_id}: Implement {rule_title}
-**Story Type:** Story
-**Story Points:** 3
-**Priority:** High
-**Epic:** BUSINESS-RULES
-
-**User Story:**
-As a system administrator, I want the system to enforce the business rule "{rule_title}" so that business processes are followed correctly.
-
-**Description:**
-Implement the business rule: {rule_title}
-{rule_description}
-
-**Acceptance Criteria:**
-- [ ] Business rule "{rule_title}" is implemented in service layer
-- [ ] Validation logic prevents rule violations
-- [ ] Appropriate error messages are displayed to users
-- [ ] Rule enforcement is tested with various scenarios
-- [ ] Documentation explains the business rule implementation
-- [ ] Edge cases and exceptions are properly handled
-
----
-
-"""
-                csv_stories += f'Story,"{clean_name.upper()}-{story_id}: {rule_title}","Implement business rule: {rule_description}",High,3,BUSINESS-RULES,[Assignee],business-rule validation,"{rule_title} enforced; Validation working; Error handling complete; Tests passing"\n'
-                story_id += 1
-
-        # Epic 5: Testing and Quality Assurance
-        jira_stories += f"""## Epic 5: Testing and Quality Assurance
-**Epic Name:** TESTING-QA
-**Epic Summary:** Comprehensive testing strategy for {project_name}
-**Epic Description:** Implement comprehensive testing including unit tests, integration tests, and quality assurance measures.
-
-### User Stories:
-
-#### {clean_name.upper()}-{story_id}: Unit Testing Implementation
-**Story Type:** Story
-**Story Points:** 5
-**Priority:** High
-**Epic:** TESTING-QA
-
-**User Story:**
-As a developer, I want comprehensive unit tests for all components so that code quality and reliability are maintained.
-
-**Acceptance Criteria:**
-- [ ] Unit tests for all service classes (>90% coverage)
-- [ ] Unit tests for all controller classes
-- [ ] Mockito integration for dependency mocking
-- [ ] Test data builders for consistent test data
-- [ ] Parameterized tests for multiple scenarios
-- [ ] Tests run automatically in CI/CD pipeline
-
----
-
-"""
-        csv_stories += f'Story,"{clean_name.upper()}-{story_id}: Unit Testing","Implement comprehensive unit tests for all components",High,5,TESTING-QA,[Assignee],testing unit-tests,">90% test coverage; Mockito integration; Test builders created; CI/CD integration complete"\n'
-        story_id += 1
-
-        jira_stories += f"""#### {clean_name.upper()}-{story_id}: Integration Testing Implementation
-**Story Type:** Story
-**Story Points:** 5
-**Priority:** High
-**Epic:** TESTING-QA
-
-**User Story:**
-As a developer, I want integration tests for API endpoints so that end-to-end functionality is verified.
-
-**Acceptance Criteria:**
-- [ ] Integration tests using TestContainers
-- [ ] Database integration testing with test data
-- [ ] API endpoint testing with real HTTP calls
-- [ ] Test fixtures and sample data management
-- [ ] Performance testing for critical endpoints
-- [ ] Security testing for authentication/authorization
-
----
-
-"""
-        csv_stories += f'Story,"{clean_name.upper()}-{story_id}: Integration Testing","Implement integration tests for API endpoints and database",High,5,TESTING-QA,[Assignee],testing integration-tests,"TestContainers setup; Database tests working; API tests complete; Performance validated"\n'
-        story_id += 1
-
-        # Epic 6: DevOps and Deployment
-        jira_stories += f"""## Epic 6: DevOps and Deployment
-**Epic Name:** DEVOPS-DEPLOY
-**Epic Summary:** CI/CD pipeline and deployment automation for {project_name}
-**Epic Description:** Set up automated build, test, and deployment pipelines with containerization.
-
-### User Stories:
-
-#### {clean_name.upper()}-{story_id}: CI/CD Pipeline Implementation
-**Story Type:** Story
-**Story Points:** 8
-**Priority:** Medium
-**Epic:** DEVOPS-DEPLOY
-
-**User Story:**
-As a DevOps engineer, I want automated build and deployment pipelines so that code changes are automatically tested and deployed.
-
-**Acceptance Criteria:**
-- [ ] GitHub Actions workflow for CI/CD
-- [ ] Automated testing on pull requests
-- [ ] Docker containerization with multi-stage builds
-- [ ] Environment-specific configuration management
-- [ ] Automated deployment to staging environment
-- [ ] Production deployment with approval gates
-- [ ] Monitoring and alerting setup
+        requirement_stories = []
+        for req in requirements:
+            requirement_stories.append({
+                "id": story_id,
+                "title": req.title if req.title is not None else f"Requirement {story_id}",
+                "description": req.description,
+                "priority": req.priority,
+                "points": 5 if req.priority == "High" else 3 if req.priority == "Medium" else 2,
+            })
+            story_id += 1
 
----
+        endpoint_stories = []
+        for endpoint in api_endpoints:
+            endpoint_stories.append({
+                "id": story_id,
+                "path": endpoint.path,
+                "method": endpoint.method,
+                "description": endpoint.description,
+            })
+            story_id += 1
 
-"""
-        csv_stories += f'Story,"{clean_name.upper()}-{story_id}: CI/CD Pipeline","Setup automated build, test, and deployment pipeline",Medium,8,DEVOPS-DEPLOY,[Assignee],devops cicd docker,"GitHub Actions working; Docker containers built; Automated deployment ready; Monitoring active"\n'
-        story_id += 1
+        rule_stories = []
+        for rule in business_rules:
+            rule_stories.append({
+                "id": story_id,
+                "title": rule.title if rule.title is not None else f"Business Rule {story_id}",
+                "description": rule.description,
+            })
+            story_id += 1
 
-        # Project Summary
-        total_stories = story_id - 1
+        # Testing (2) and DevOps (1) stories close the backlog
+        total_stories = story_id + 2
         estimated_points = len(entities) * 3 + len(requirements) * 3 + len(api_endpoints) * 2 + len(business_rules) * 3 + 18  # Base stories
-        
-        jira_stories += f"""
-## Project Summary and Sprint Planning
-
-### Story Statistics:
-- **Total Stories Created:** {total_stories}
-- **Total Story Points:** ~{estimated_points}
-- **Estimated Duration:** {(estimated_points // 12) + 1} sprints (2-week sprints)
-
-### Epic Breakdown:
-- **DATA-MODEL:** Entity and database implementation
-- **FUNCTIONAL-REQS:** Business requirements implementation  
-- **API-ENDPOINTS:** REST API development
-- **BUSINESS-RULES:** Business logic and validation
-- **TESTING-QA:** Testing and quality assurance
-- **DEVOPS-DEPLOY:** DevOps and deployment automation
-
-### Sprint Recommendations:
-- **Sprint 1:** Focus on DATA-MODEL epic (entities and CRUD)
-- **Sprint 2:** FUNCTIONAL-REQS implementation
-- **Sprint 3:** API-ENDPOINTS and BUSINESS-RULES
-- **Sprint 4:** TESTING-QA and DEVOPS-DEPLOY
-
-### Definition of Done:
-- [ ] Code is peer reviewed and approved
-- [ ] Unit tests pass with >80% coverage
-- [ ] Integration tests pass
-- [ ] Code meets quality gates (SonarQube)
-- [ ] API documentation is updated
-- [ ] Security review completed (if applicable)
-- [ ] Performance requirements met
-- [ ] Acceptance criteria validated by Product Owner
-
----
-*Generated by BRDynamo - {self._get_current_timestamp()}*
-"""
-
-        # Create additional project management files
-        sprint_planning = f"""# Sprint Planning Guide for {project_name}
-Generated on: {self._get_current_timestamp()}
-
-## Project Overview
-- **Total Stories:** {total_stories}
-- **Estimated Story Points:** ~{estimated_points}
-- **Recommended Sprint Duration:** 2 weeks
-- **Estimated Project Duration:** {(estimated_points // 12) + 1} sprints
-
-## Sprint Guidelines for {project_name}:
-
-### Sprint Capacity Planning:
-- Team velocity: 10-15 story points per sprint (adjust based on team size)
-- Include testing tasks in each sprint
-- Reserve 20% capacity for bugs and technical debt
-- Plan for code reviews and documentation updates
-
-### Sprint 1 (Weeks 1-2): Foundation Setup
-**Focus:** Data Model and Core Entities
-**Target Points:** 12-15
-**Goals:** 
-- Complete all entity implementations
-- Setup basic CRUD operations
-- Establish development environment
-
-### Sprint 2 (Weeks 3-4): Business Logic Implementation  
-**Focus:** Functional Requirements
-**Target Points:** 12-15
-**Goals:**
-- Implement core business requirements
-- Complete service layer development
-- Begin API endpoint implementation
-
-### Sprint 3 (Weeks 5-6): API and Integration
-**Focus:** API Endpoints and Business Rules
-**Target Points:** 10-12
-**Goals:**
-- Complete REST API endpoints
-- Implement business validation rules
-- Integration testing setup
-
-### Sprint 4 (Weeks 7-8): Quality and Deployment
-**Focus:** Testing and DevOps
-**Target Points:** 10-12
-**Goals:**
-- Comprehensive testing implementation
-- CI/CD pipeline setup
-- Production deployment preparation
-
-## Definition of Ready (DoR):
-- [ ] User story is well-defined and understood
-- [ ] Acceptance criteria are clear and testable  
-- [ ] Dependencies are identified and resolved
-- [ ] Story is estimated and fits in sprint
-- [ ] Technical approach is discussed
-
-## Definition of Done (DoD):
-- [ ] Code is implemented and peer reviewed
-- [ ] Unit tests written with >80% coverage
-- [ ] Integration tests pass
-- [ ] Documentation updated
-- [ ] Acceptance criteria validated
-- [ ] Code deployed to staging environment
-
-## Risk Management:
-- Monitor velocity and adjust sprint commitments
-- Address technical debt proactively
-- Maintain open communication with stakeholders
-- Regular retrospectives for continuous improvement
-
----
-*This sprint planning guide is specific to {project_name} and should be adjusted based on team capacity and project priorities.*
-"""
-
-        backlog_refinement = f"""# Product Backlog Refinement for {project_name}
-
-## Backlog Prioritization:
-
-### High Priority (Must Have):
-- All Data Model stories (Epic: DATA-MODEL)
-- Core functional requirements (Epic: FUNCTIONAL-REQS)
-- Critical API endpoints (Epic: API-ENDPOINTS)
-
-### Medium Priority (Should Have):
-- Business rules implementation (Epic: BUSINESS-RULES)
-- Integration testing (Epic: TESTING-QA)
 
-### Lower Priority (Could Have):
-- Advanced API features
-- Performance optimization
-- DevOps automation (Epic: DEVOPS-DEPLOY)
-
-## Story Refinement Checklist:
-- [ ] Story follows INVEST criteria
-- [ ] Acceptance criteria are measurable
-- [ ] Technical dependencies identified
-- [ ] Story size is appropriate (1-8 points)
-- [ ] Business value is clear
-
-## Estimation Guidelines:
-- **1 Point:** Simple configuration or minor bug fix
-- **2 Points:** Small feature or API endpoint
-- **3 Points:** Standard entity with CRUD operations
-- **5 Points:** Complex business logic or integration
-- **8 Points:** Major feature or infrastructure setup
-
----
-*Generated for {project_name} project*
-"""
+        context = {
+            "project_name": brd.display_name,
+            "project_description": brd.description,
+            "project_key": brd.clean_name.upper(),
+            "generated_on": self._get_current_timestamp(),
+            "entity_stories": entity_stories,
+            "requirement_stories": requirement_stories,
+            "endpoint_stories": endpoint_stories,
+            "rule_stories": rule_stories,
+            "unit_testing_id": story_id,
+            "integration_testing_id": story_id + 1,
+            "cicd_id": story_id + 2,
+            "total_stories": total_stories,
+            "estimated_points": estimated_points,
+            "sprint_count": (estimated_points // 12) + 1,
+        }
 
         return {
-            f"{demo_project_name}/project-management/jira-stories.md": jira_stories,
-            f"{demo_project_name}/project-management/jira-import.csv": csv_stories,
-            f"{demo_project_name}/project-management/sprint-planning.md": sprint_planning,
-            f"{demo_project_name}/project-management/backlog-refinement.md": backlog_refinement
+            f"{demo_project_name}/project-management/jira-stories.md": _TEMPLATES["jira/jira-stories.md.j2"].render(context),
+            f"{demo_project_name}/project-management/jira-import.csv": _TEMPLATES["jira/jira-import.csv.j2"].render(context),
+            f"{demo_project_name}/project-management/sprint-planning.md": _TEMPLATES["jira/sprint-planning.md.j2"].render(context),
+            f"{demo_project_name}/project-management/backlog-refinement.md": _TEMPLATES["jira/backlog-refinement.md.j2"].render(context)
         }
 
-    def _generate_architecture_diagrams(self, parsed_brd: Dict) -> Dict:
+    def _generate_architecture_diagrams(self, brd: BrdModel) -> Dict:
         """Generate architecture diagrams using Kroki.io API."""
-        project_name = parsed_brd.get("project_overview", {}).get("name", "spring-app")
-        clean_name, demo_project_name, package_name = self._generate_project_name(project_name)
-        
-        entities = parsed_brd.get("data_model", {}).get("entities", [])
-        requirements = parsed_brd.get("functional_requirements", [])
+        demo_project_name = brd.demo_project_name
+        entities, requirements = brd.entities, brd.requirements
         
         diagrams = {}
         
@@ -950,34 +796,33 @@ Generated on: {self._get_current_timestamp()}
         for puml_path, puml_content in list(diagrams.items()):
             if not puml_path.endswith('.puml'):
                 continue
+            diagram_name = os.path.basename(puml_path)[:-len('.puml')]
                 
             try:
                 # Generate SVG version (usually more reliable)
-                svg_content = self._render_with_kroki(puml_content, "plantuml", "svg")
+                svg_content = self._timed_kroki_render(diagram_name, puml_content, "svg")
                 if svg_content:
                     svg_path = puml_path.replace(".puml", ".svg")
                     diagrams[svg_path] = svg_content
                     svg_success += 1
-                    print(f"SUCCESS Generated SVG: {svg_path}")
                 else:
-                    print(f"FAILED SVG: {puml_path}")
-            except Exception as e:
-                print(f"ERROR SVG for {puml_path}: {e}")
+                    logger.warning("SVG rendering failed", extra={"diagram": puml_path})
+            except Exception:
+                logger.exception("SVG rendering raised", extra={"diagram": puml_path})
             
             try:
                 # Generate PNG version (may fail for complex diagrams)
-                png_content = self._render_with_kroki(puml_content, "plantuml", "png")
+                png_content = self._timed_kroki_render(diagram_name, puml_content, "png")
                 if png_content:
                     png_path = puml_path.replace(".puml", ".png")
                     diagrams[png_path] = png_content
                     png_success += 1
-                    print(f"SUCCESS Generated PNG: {png_path}")
                 else:
-                    print(f"FAILED PNG: {puml_path}")
-            except Exception as e:
-                print(f"ERROR PNG for {puml_path}: {e}")
+                    logger.warning("PNG rendering failed", extra={"diagram": puml_path})
+            except Exception:
+                logger.exception("PNG rendering raised", extra={"diagram": puml_path})
         
-        print(f"Kroki.io rendering summary: {svg_success}/{total_diagrams} SVG, {png_success}/{total_diagrams} PNG")
+        logger.info("Kroki rendering finished", extra={"diagrams": total_diagrams, "svg_rendered": svg_success, "png_rendered": png_success})
         
         # Generate README for diagrams
         diagrams_readme = self._generate_diagrams_readme(demo_project_name)
@@ -985,221 +830,60 @@ Generated on: {self._get_current_timestamp()}
         
         return diagrams
     
-    def _generate_system_architecture_plantuml(self, project_name: str, entities: List, requirements: List) -> str:
+    def _generate_system_architecture_plantuml(self, project_name: str, entities: Sequence[Entity], requirements: Sequence[Requirement]) -> str:
         """Generate system architecture diagram in PlantUML format (simplified)."""
-        return f"""@startuml {project_name}-system-architecture
-!theme plain
-title {project_name.replace('-', ' ').title()} - System Architecture
-
-package "Frontend" {{
-    [React App] as frontend
-}}
-
-package "Backend" {{
-    [Spring Boot] as app
-    [Services] as services
-}}
-
-package "Data" {{
-    [JPA] as orm
-    database "Database" as db
-}}
-
-package "External" {{
-    cloud "Storage" as storage
-    cloud "Cache" as cache
-}}
-
-' Connections
-frontend -> app : HTTPS/REST
-app -> services : Internal
-services -> orm : JPA
-orm -> db : SQL
-app -> cache : Cache
-app -> storage : Files
-
-note right of services
-  Components:
-{chr(10).join(f"  - {entity.get('name', 'Entity')}" for entity in entities[:3])}
-end note
-
-@enduml"""
-
-    def _generate_database_er_plantuml(self, project_name: str, entities: List) -> str:
-        """Generate database ER diagram in PlantUML format."""
-        puml = f"""@startuml {project_name}-database-er
-!theme plain
-title {project_name.replace('-', ' ').title()} - Database ER Diagram
+        return _TEMPLATES["diagrams/system-architecture.puml.j2"].render(
+            project_name=project_name,
+            title=project_name.replace('-', ' ').title(),
+            entity_names=[entity.name for entity in entities[:3]],
+        )
 
-' Entity definitions
-"""
-        
-        # Add entities
-        for entity in entities:
-            entity_name = entity.get("name", "Entity")
-            attributes = entity.get("attributes", [])
-            
-            puml += f"""
-entity "{entity_name}" as {entity_name.lower()} {{
-    + id : UUID <<PK>>
-    --
-"""
-            
-            for attr in attributes[:8]:  # Limit to 8 attributes for readability
-                attr_name = attr.get("name", "attribute")
-                attr_type = attr.get("type", "String")
-                nullable = "?" if attr.get("nullable", True) else ""
-                puml += f"    {attr_name} : {attr_type}{nullable}\n"
-            
-            puml += "}\n"
-        
-        # Add relationships (basic many-to-one relationships)
-        puml += "\n' Relationships\n"
-        for i, entity in enumerate(entities):
-            if i > 0:  # Create relationship with previous entity as example
-                prev_entity = entities[i-1]
-                puml += f"{entity.get('name', 'Entity').lower()} }}|--|| {prev_entity.get('name', 'Entity').lower()} : belongs to\n"
-        
-        puml += "\n@enduml"
-        return puml
+    def _generate_database_er_plantuml(self, project_name: str, entities: Sequence[Entity]) -> str:
+        """Generate database ER diagram in PlantUML format."""
+        return _TEMPLATES["diagrams/database-er.puml.j2"].render(
+            project_name=project_name,
+            title=project_name.replace('-', ' ').title(),
+            entities=entities,
+        )
     
-    def _generate_api_flow_plantuml(self, project_name: str, entities: List, requirements: List) -> str:
+    def _generate_api_flow_plantuml(self, project_name: str, entities: Sequence[Entity], requirements: Sequence[Requirement]) -> str:
         """Generate API flow diagram in PlantUML format (simplified for better rendering)."""
-        main_entity = entities[0].get("name", "Resource") if entities else "Resource"
+        main_entity = entities[0].name if entities else "Resource"
         
-        return f"""@startuml {project_name}-api-flow
-!theme plain
-title {project_name.replace('-', ' ').title()} - API Flow
-
-actor Client
-participant Controller
-participant Service  
-participant Repository
-database Database
-
-== Create {main_entity} ==
-Client -> Controller : POST /{main_entity.lower()}s
-Controller -> Service : create{main_entity}()
-Service -> Repository : save()
-Repository -> Database : INSERT
-Database --> Repository : ID
-Repository --> Service : Entity
-Service --> Controller : Created
-Controller --> Client : 201 Created
-
-== Get {main_entity} ==
-Client -> Controller : GET /{main_entity.lower()}s/id
-Controller -> Service : findById()
-Service -> Repository : findById()
-Repository -> Database : SELECT
-Database --> Repository : Data
-Repository --> Service : Entity
-Service --> Controller : Found
-Controller --> Client : 200 OK
-
-== Update {main_entity} ==
-Client -> Controller : PUT /{main_entity.lower()}s/id
-Controller -> Service : update()
-Service -> Repository : save()
-Repository -> Database : UPDATE
-Database --> Repository : OK
-Repository --> Service : Updated
-Service --> Controller : Success
-Controller --> Client : 200 OK
-
-== Delete {main_entity} ==
-Client -> Controller : DELETE /{main_entity.lower()}s/id
-Controller -> Service : delete()
-Service -> Repository : deleteById()
-Repository -> Database : DELETE
-Database --> Repository : OK
-Repository --> Service : Deleted
-Service --> Controller : Success
-Controller --> Client : 204 No Content
-
-@enduml"""
-
-    def _generate_component_diagram_plantuml(self, project_name: str, entities: List) -> str:
+        return _TEMPLATES["diagrams/api-flow.puml.j2"].render(
+            project_name=project_name,
+            title=project_name.replace('-', ' ').title(),
+            main_entity=main_entity,
+            main_entity_path=main_entity.lower(),
+        )
+
+    def _generate_component_diagram_plantuml(self, project_name: str, entities: Sequence[Entity]) -> str:
         """Generate component diagram in PlantUML format."""
-        return f"""@startuml {project_name}-component-diagram
-!theme plain
-title {project_name.replace('-', ' ').title()} - Component Diagram
-
-package "Web Layer" {{
-    [REST Controllers] as controllers
-    [Exception Handlers] as exceptions
-    [Request/Response DTOs] as dtos
-}}
-
-package "Service Layer" {{
-    [Business Services] as services
-    [Validation Logic] as validation
-    [Business Rules] as rules
-}}
-
-package "Data Access Layer" {{
-    [JPA Repositories] as repositories
-    [Entity Models] as entities
-    [Database Config] as dbconfig
-}}
-
-package "Cross-Cutting Concerns" {{
-    [Security Config] as security
-    [Logging] as logging
-    [Caching] as caching
-    [Monitoring] as monitoring
-}}
-
-package "External Integrations" {{
-    [Database] as database
-    [Cache Store] as cache
-    [File Storage] as storage
-}}
-
-' Dependencies
-controllers --> services : uses
-controllers --> dtos : uses
-controllers --> exceptions : handles
-
-services --> repositories : uses
-services --> validation : uses
-services --> rules : applies
-services --> caching : uses
-
-repositories --> entities : manages
-repositories --> dbconfig : configured by
-
-services --> security : secured by
-controllers --> logging : logs to
-services --> logging : logs to
-repositories --> logging : logs to
-
-repositories --> database : persists to
-caching --> cache : stores in
-controllers --> storage : uploads to
-
-controllers --> monitoring : metrics
-services --> monitoring : metrics
-
-note right of services
-  Core Business Components:
-{chr(10).join(f"  - {entity.get('name', 'Entity')}Service" for entity in entities[:5])}
-end note
-
-note left of repositories
-  Data Access Components:
-{chr(10).join(f"  - {entity.get('name', 'Entity')}Repository" for entity in entities[:5])}
-end note
-
-@enduml"""
+        return _TEMPLATES["diagrams/component-diagram.puml.j2"].render(
+            project_name=project_name,
+            title=project_name.replace('-', ' ').title(),
+            entity_names=[entity.name for entity in entities[:5]],
+        )
+
+    def _timed_kroki_render(self, diagram_name: str, puml_content: str, output_format: str) -> str:
+        """Render one PlantUML diagram, recording its latency and counting failed renders."""
+        start = time.perf_counter()
+        rendered = None
+        try:
+            rendered = self._render_with_kroki(puml_content, "plantuml", output_format)
+            return rendered
+        finally:
+            KROKI_RENDER_SECONDS.labels(diagram=diagram_name, format=output_format).observe(time.perf_counter() - start)
+            if not rendered:
+                FAILURES.labels(stage="kroki_render").inc()
 
     def _render_with_kroki(self, diagram_content: str, diagram_type: str, output_format: str) -> str:
         """Render diagram using Kroki.io API."""
         try:
-            print(f"Rendering diagram with Kroki.io: {diagram_type} -> {output_format}")
+            logger.debug("Rendering diagram with Kroki", extra={"diagram_type": diagram_type, "format": output_format})
             
             # Use POST request to avoid URL length limitations
-            url = f"https://kroki.io/{diagram_type}/{output_format}"
+            url = f"{self.kroki_url}/{diagram_type}/{output_format}"
             
             headers = {
                 'Content-Type': 'text/plain',
@@ -1215,7 +899,7 @@ end note
             )
             response.raise_for_status()
             
-            print(f"SUCCESS: Kroki.io returned {len(response.text if output_format=='svg' else response.content)} bytes")
+            logger.debug("Kroki render succeeded", extra={"format": output_format, "bytes": len(response.content)})
             
             if output_format in ['svg']:
                 return response.text
@@ -1223,32 +907,30 @@ end note
                 return base64.b64encode(response.content).decode('ascii')
                 
         except Exception as e:
-            print(f"Failed to render diagram with Kroki.io: {e}")
+            logger.warning("Kroki POST render failed", extra={"format": output_format, "error": str(e)})
             # Fallback: try GET method with encoded content
             try:
-                print(f"Retrying with GET method for {diagram_type} -> {output_format}")
+                RETRIES.labels(operation="kroki_get_fallback").inc()
                 encoded = base64.urlsafe_b64encode(zlib.compress(diagram_content.encode('utf-8'), 9)).decode('ascii')
-                fallback_url = f"https://kroki.io/{diagram_type}/{output_format}/{encoded}"
+                fallback_url = f"{self.kroki_url}/{diagram_type}/{output_format}/{encoded}"
                 
                 # Only try GET if URL is not too long (under 8000 chars - Kroki's limit)
                 if len(fallback_url) < 8000:
                     response = requests.get(fallback_url, timeout=30)
                     response.raise_for_status()
-                    print(f"SUCCESS (fallback): Kroki.io returned {len(response.text if output_format=='svg' else response.content)} bytes")
+                    logger.debug("Kroki GET fallback succeeded", extra={"format": output_format, "bytes": len(response.content)})
                     
                     if output_format in ['svg']:
                         return response.text
                     else:
                         return base64.b64encode(response.content).decode('ascii')
                 else:
-                    print(f"Fallback URL too long ({len(fallback_url)} chars), skipping {output_format} generation")
+                    logger.warning("Kroki GET fallback skipped, URL too long", extra={"format": output_format, "url_chars": len(fallback_url)})
                     return None
                     
             except Exception as fallback_error:
-                print(f"Fallback also failed: {fallback_error}")
                 # For PNG failures, we can still provide the SVG version
-                if output_format == 'png':
-                    print("PNG generation failed, but SVG version should be available")
+                logger.warning("Kroki GET fallback failed", extra={"format": output_format, "error": str(fallback_error)})
                 return None
     
     def _generate_diagrams_readme(self, project_name: str) -> str:
@@ -1319,25 +1001,144 @@ Example markdown for embedding:
 ```
 """
 
-    def save_generated_code(self, generated_files: Dict) -> None:
-        """Save generated code to output directory."""
-        project_folders = []
-        
-        for file_path, content in generated_files.items():
-            try:
-                full_path = os.path.join(self.output_dir, file_path)
-                os.makedirs(os.path.dirname(full_path), exist_ok=True)
-                with open(full_path, "w") as f:
-                    f.write(content)
-                
-                # Track project folders (first level directories)
-                parts = file_path.split(os.sep)
-                if len(parts) > 0 and parts[0] not in project_folders:
-                    project_folders.append(parts[0])
-                    
-            except Exception as e:
-                print(f"Error saving file {file_path}: {str(e)}")
-        
+    def save_generated_code(self, generated_files: Dict, output_dir: Optional[str] = None) -> None:
+        """Save generated code under the output directory (or `output_dir`) as a single atomic run.
+
+        Every file is staged under a hidden folder first. Files whose content hash
+        matches the current version are hard-linked instead of rewritten, the rest
+        are written on a thread pool. The staged run becomes a new folder under
+        .versions/ and is published by repointing the `current` symlink with one
+        rename, so readers see either the previous run or this one, never a mix.
+        Where symlinks aren't available the version's name is swapped into the
+        .current pointer file instead; use current_root() to find the published run.
+        """
+        output_dir = output_dir or self.output_dir
+        # Sortable by publication order, see _prune_versions
+        now_ns = time.time_ns()
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now_ns // 10**9))
+        version = f"{stamp}.{now_ns % 10**9:09d}-{uuid.uuid4().hex[:8]}"
+        staging_root = os.path.join(output_dir, f"{self.STAGING_PREFIX}{version}")
+        current_root = self.current_root(output_dir) or os.path.join(output_dir, self.CURRENT_LINK)
+        os.makedirs(staging_root)
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.SAVE_WORKERS) as pool:
+                results = list(pool.map(
+                    lambda item: self._stage_file(current_root, staging_root, item[0], item[1]),
+                    generated_files.items()
+                ))
+        except Exception:
+            shutil.rmtree(staging_root, ignore_errors=True)
+            raise
+
+        unchanged = sum(1 for reused in results if reused)
+        CACHE_HITS.labels(cache="save_unchanged_file").inc(unchanged)
+        logger.info("Staged generated files", extra={"files": len(results), "unchanged": unchanged, "written": len(results) - unchanged})
+
+        with self._save_lock:
+            self._commit_staging(output_dir, staging_root, version)
+            self._prune_versions(output_dir)
+
         # Note: Zip file creation is handled by the download endpoint
 
+    def _stage_file(self, current_root: str, staging_root: str, file_path: str, content) -> bool:
+        """Stage one file; returns True when the existing copy was reused."""
+        data = content.encode("utf-8") if isinstance(content, str) else content
+        staged_path = os.path.join(staging_root, file_path)
+        os.makedirs(os.path.dirname(staged_path), exist_ok=True)
 
+        current_path = os.path.join(current_root, file_path)
+        if self._has_same_content(current_path, data):
+            try:
+                os.link(current_path, staged_path)
+                return True
+            except OSError:
+                # No hard links on this filesystem, or a concurrent save just swapped the file out
+                pass
+
+        with open(staged_path, "wb") as f:
+            f.write(data)
+        return False
+
+    @staticmethod
+    def _has_same_content(path: str, data: bytes) -> bool:
+        """Compare file content by size first and by SHA-256 only when sizes match."""
+        try:
+            if os.path.getsize(path) != len(data):
+                return False
+            with open(path, "rb") as f:
+                existing_digest = hashlib.sha256(f.read()).digest()
+        except OSError:
+            return False
+        return existing_digest == hashlib.sha256(data).digest()
+
+    @classmethod
+    def current_version(cls, output_dir: str) -> Optional[str]:
+        """Name of the published version under output_dir/.versions/, or None before the first save."""
+        try:
+            return os.path.basename(os.readlink(os.path.join(output_dir, cls.CURRENT_LINK)))
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(output_dir, cls.CURRENT_POINTER), encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def current_root(cls, output_dir: str) -> Optional[str]:
+        """Folder holding the published run's projects, or None before the first save."""
+        version = cls.current_version(output_dir)
+        return os.path.join(output_dir, cls.VERSIONS_DIR, version) if version else None
+
+    def _commit_staging(self, output_dir: str, staging_root: str, version: str) -> None:
+        """Publish a staged run: move it under .versions/ and swap the `current` symlink to it."""
+        versions_root = os.path.join(output_dir, self.VERSIONS_DIR)
+        os.makedirs(versions_root, exist_ok=True)
+        os.rename(staging_root, os.path.join(versions_root, version))
+        # Relative target, so the folder can be moved or mounted elsewhere
+        link_path = os.path.join(output_dir, f"{self.STAGING_PREFIX}link-{version}")
+        try:
+            os.symlink(os.path.join(self.VERSIONS_DIR, version), link_path, target_is_directory=True)
+            os.replace(link_path, os.path.join(output_dir, self.CURRENT_LINK))
+        except (OSError, NotImplementedError) as e:
+            logger.debug("Symlinks unavailable, publishing through the pointer file", extra={"error": str(e)})
+            if os.path.lexists(link_path):
+                os.remove(link_path)
+            self._write_pointer(output_dir, version)
+            return
+        # A pointer left by an earlier fallback save would otherwise go stale
+        try:
+            os.remove(os.path.join(output_dir, self.CURRENT_POINTER))
+        except FileNotFoundError:
+            pass
+
+    def _write_pointer(self, output_dir: str, version: str) -> None:
+        """Swap the version's name into the .current pointer file with one rename."""
+        pointer_path = os.path.join(output_dir, f"{self.STAGING_PREFIX}pointer-{version}")
+        with open(pointer_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(pointer_path, os.path.join(output_dir, self.CURRENT_POINTER))
+        # current_version() prefers the link, so an old one must not shadow the pointer
+        link = os.path.join(output_dir, self.CURRENT_LINK)
+        if os.path.islink(link):
+            os.remove(link)
+
+    def _prune_versions(self, output_dir: str) -> None:
+        """Remove published versions beyond the newest VERSIONS_KEPT, never the current one."""
+        versions_root = os.path.join(output_dir, self.VERSIONS_DIR)
+        current = self.current_version(output_dir)
+        # Version names start with their timestamp, so they sort by age
+        older = sorted((name for name in os.listdir(versions_root) if name != current), reverse=True)
+        for name in older[self.VERSIONS_KEPT:]:
+            shutil.rmtree(os.path.join(versions_root, name), ignore_errors=True)
+
+    def _remove_leftover_staging(self) -> None:
+        """Remove staging folders and links left behind by an interrupted save."""
+        for entry in os.listdir(self.output_dir):
+            if entry.startswith(self.STAGING_PREFIX):
+                path = os.path.join(self.output_dir, entry)
+                if os.path.islink(path):
+                    os.remove(path)
+                else:
+                    shutil.rmtree(path, ignore_errors=True)
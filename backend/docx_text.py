@@ -0,0 +1,137 @@
+import zipfile
+from typing import Container, Iterator, List
+
+from lxml import etree
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+MC_NS = "http://schemas.openxmlformats.org/markup-compatibility/2006"
+DOCUMENT_PART = "word/document.xml"
+# Separates cell texts in an emitted table row
+CELL_SEPARATOR = " | "
+
+_P = f"{{{W_NS}}}p"
+_TBL = f"{{{W_NS}}}tbl"
+_TR = f"{{{W_NS}}}tr"
+_TC = f"{{{W_NS}}}tc"
+_TXBX = f"{{{W_NS}}}txbxContent"
+# Legacy rendering of the mc:Choice next to it; a text box appears in both
+_FALLBACK = f"{{{MC_NS}}}Fallback"
+# Run content rendered the way python-docx renders paragraph text; deleted text and field codes are left out
+_RUN_TEXT = {
+    f"{{{W_NS}}}t": None,
+    f"{{{W_NS}}}tab": "\t",
+    f"{{{W_NS}}}ptab": "\t",
+    f"{{{W_NS}}}br": "\n",
+    f"{{{W_NS}}}cr": "\n",
+    f"{{{W_NS}}}noBreakHyphen": "-",
+}
+
+
+def _find(element: etree._Element, tags: Container[str]) -> Iterator[etree._Element]:
+    """Descendants with one of `tags` in document order, without looking inside a match,
+    an mc:Fallback or (unless searched for) a text box."""
+    for child in element.iterchildren():
+        if child.tag in tags:
+            yield child
+        elif child.tag != _FALLBACK and child.tag != _TXBX:
+            yield from _find(child, tags)
+
+
+def _paragraph_text(paragraph: etree._Element, boxed: bool = True) -> str:
+    """Text of a paragraph; `boxed=False` promises it holds no text box, which allows a faster scan."""
+    parts: List[str] = []
+    for node in _find(paragraph, _RUN_TEXT) if boxed else paragraph.iter(*_RUN_TEXT):
+        text = _RUN_TEXT[node.tag]
+        parts.append((node.text or "") if text is None else text)
+    return "".join(parts)
+
+
+def _row_text(row: etree._Element, boxed: bool = True) -> str:
+    """Cell texts of a row joined by CELL_SEPARATOR; a nested table is flattened into its cell.
+
+    Text boxes anchored in a cell are left out.
+    """
+    cells = []
+    for cell in row.iterchildren(_TC):
+        paragraphs = _find(cell, {_P}) if boxed else cell.iter(_P)
+        cells.append(" ".join(text for text in (_paragraph_text(p, boxed).strip() for p in paragraphs) if text))
+    return CELL_SEPARATOR.join(cells) if any(cells) else ""
+
+
+def _text_box_blocks(paragraph: etree._Element) -> Iterator[str]:
+    """Paragraphs and table rows of the text boxes anchored in a paragraph."""
+    for box in _find(paragraph, {_TXBX}):
+        for child in box.iterchildren(_P, _TBL):
+            if child.tag == _P:
+                yield _paragraph_text(child)
+                yield from _text_box_blocks(child)
+            else:
+                yield from filter(None, (_row_text(row) for row in child.iterchildren(_TR)))
+
+
+def _release(element: etree._Element) -> None:
+    """Free a processed element and the already processed siblings before it."""
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+def iter_docx_blocks(path: str) -> Iterator[str]:
+    """Paragraphs and table rows of a .docx body in document order.
+
+    Streams word/document.xml with iterparse and frees each block once it is
+    emitted, so memory stays flat however long the document is. Every body
+    paragraph is one item (empty ones included, as with python-docx); every
+    top-level table row is one item with its cells joined by CELL_SEPARATOR.
+    The paragraphs of a text box follow the paragraph it is anchored in as items
+    of their own. The mc:Fallback copy of drawings and text boxes is skipped.
+    """
+    with zipfile.ZipFile(path) as archive, archive.open(DOCUMENT_PART) as xml:
+        table_depth = 0
+        paragraph_depth = 0
+        fallback_depth = 0
+        # Whether the block being read holds a text box or a fallback, which need the slower walk
+        boxed = False
+        for event, element in etree.iterparse(xml, events=("start", "end"), tag=(_P, _TBL, _TR, _FALLBACK, _TXBX),
+                                              resolve_entities=False, huge_tree=True):
+            if element.tag == _FALLBACK:
+                fallback_depth += 1 if event == "start" else -1
+                boxed = True
+                continue
+            if element.tag == _TXBX:
+                boxed = True
+                continue
+            if event == "start":
+                if element.tag == _TBL:
+                    table_depth += 1
+                elif element.tag == _P:
+                    paragraph_depth += 1
+                continue
+
+            # Blocks inside a paragraph belong to a text box and are read with that paragraph,
+            # blocks inside a table cell with their row
+            if element.tag == _P:
+                paragraph_depth -= 1
+                if table_depth == 0 and paragraph_depth == 0 and fallback_depth == 0:
+                    yield _paragraph_text(element, boxed)
+                    if boxed:
+                        yield from _text_box_blocks(element)
+                    boxed = False
+                    _release(element)
+            elif element.tag == _TR:
+                if table_depth == 1 and paragraph_depth == 0 and fallback_depth == 0:
+                    text = _row_text(element, boxed)
+                    if text:
+                        yield text
+                    boxed = False
+                    _release(element)
+            else:
+                table_depth -= 1
+                if table_depth == 0 and paragraph_depth == 0:
+                    _release(element)
+
+
+def extract_docx_text(path: str) -> str:
+    return "\n".join(iter_docx_blocks(path))
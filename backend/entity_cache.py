@@ -0,0 +1,249 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from typing import Callable, Dict, Optional, Sequence
+
+from brd_model import Entity
+from metrics import CACHE_HITS, RETENTION_EVICTIONS, RETENTION_RECLAIMED_BYTES
+
+logger = logging.getLogger(__name__)
+
+ENTITY_CACHE_ENABLED = os.getenv("ENTITY_CACHE_ENABLED", "1") == "1"
+ENTITY_CACHE_DIR = os.getenv(
+    "ENTITY_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "entity_cache"))
+# Entries not used for this long are dropped, then the least recently used ones while
+# the cache is over the byte cap; 0 turns a cap off
+ENTITY_CACHE_MAX_AGE_DAYS = float(os.getenv("ENTITY_CACHE_MAX_AGE_DAYS", "30"))
+ENTITY_CACHE_MAX_BYTES = int(os.getenv("ENTITY_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+# Bump when the shape of generated per-entity files changes on purpose
+ENTITY_TEMPLATE_VERSION = "2"
+
+# Generated files whose name is the entity name plus one of these belong to that entity
+ENTITY_FILE_SUFFIXES = (
+    "", "Repository", "Service", "ServiceImpl", "Controller", "Dto", "DTO", "Mapper", "NotFoundException",
+    "Exception", "ValidationException", "Test", "RepositoryTest", "ServiceTest", "ControllerTest", "TestDataBuilder",
+)
+# Digits only, so no entity name pattern can match inside a placeholder
+PROJECT_PLACEHOLDER = "@@0@@"
+_NAME_PLACEHOLDERS = ("@@1@@", "@@2@@", "@@3@@", "@@4@@")
+# import [static] com.brdynamo.<package>.<subpackage>.<Class or *>[.member];
+_PROJECT_IMPORT_RE = re.compile(r"^import\s+(?:static\s+)?com\.brdynamo\.((?:[a-z_]\w*\.)*[a-z_]\w*)\.([A-Z]\w*|\*)", re.MULTILINE)
+
+
+def _name_forms(name: str) -> Sequence[str]:
+    """Entity name as it appears in code: Product / product / productline / PRODUCT, in placeholder order."""
+    return (name, name[:1].lower() + name[1:], name.lower(), name.upper())
+
+
+def _name_pattern(form: str) -> re.Pattern:
+    """Whole camel-case words only, optionally pluralized: createProduct, ProductRepository, /products."""
+    if form[:1].isupper() and not form.isupper():
+        # A capitalized word starts wherever it appears in camel case
+        return re.compile(re.escape(form) + r"(?=(?:e?s)?(?![a-z]))")
+    if form.isupper():
+        return re.compile(r"(?<![A-Za-z0-9])" + re.escape(form) + r"(?=(?:E?S)?(?![A-Z]))")
+    return re.compile(r"(?<![A-Za-z0-9])" + re.escape(form) + r"(?=(?:e?s)?(?![a-z]))")
+
+
+def _is_ambiguous(entity: Entity, package_name: str, others: Sequence[Entity]) -> bool:
+    """True if the entity name occurs inside other names, where substituting it would rename them too."""
+    lowered = entity.name_lower
+    if lowered in package_name.lower() or any(lowered in attr.name.lower() for attr in entity.attributes):
+        return True
+    return any(other is not entity and lowered in other.name_lower for other in others)
+
+
+def entity_signature(entity: Entity, package_name: str, prompt_version: str, others: Sequence[Entity] = ()) -> str:
+    """Hash of an entity's normalized shape (attributes, constraints, relationships), package and template version.
+
+    The entity name is left out so identically shaped entities share files, unless
+    it is ambiguous (see `_is_ambiguous`), in which case only the same name matches.
+    """
+    extra = {}
+    if isinstance(entity.raw, dict):
+        extra = {key: value for key, value in entity.raw.items() if key not in ("name", "description", "attributes")}
+    shape = {
+        "attributes": sorted(
+            [attr.name, attr.type.lower(), sorted(attr.constraints), attr.nullable] for attr in entity.attributes
+        ),
+        "extra": extra,
+        "package": package_name,
+        "template_version": ENTITY_TEMPLATE_VERSION,
+        "prompt_version": prompt_version,
+    }
+    if _is_ambiguous(entity, package_name, others):
+        shape["name"] = entity.name
+    return hashlib.sha256(json.dumps(shape, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def is_entity_file(path: str, entity_name: str) -> bool:
+    stem, ext = os.path.splitext(os.path.basename(path))
+    if ext == ".json" and "/fixtures/" in path:
+        return stem.lower() in (entity_name.lower(), entity_name.lower() + "s")
+    return ext == ".java" and stem in {entity_name + suffix for suffix in ENTITY_FILE_SUFFIXES}
+
+
+def supporting_files(files: Dict[str, str], candidates: Dict[str, str],
+                     exclude: Callable[[str], bool]) -> Dict[str, str]:
+    """Project classes among `candidates` that `files` import, directly or through each other.
+
+    These are the shared exceptions, DTOs and helpers an entity's cached files need to
+    compile in another project. Paths for which `exclude` is true (other entities' files)
+    are left out.
+    """
+    found: Dict[str, str] = {}
+    pending = list(files.values())
+    while pending:
+        for package, name in _PROJECT_IMPORT_RE.findall(pending.pop()):
+            folder = "com/brdynamo/" + package.replace(".", "/")
+            for path, content in candidates.items():
+                if not path.endswith(".java") or path in files or path in found or exclude(path):
+                    continue
+                if path.endswith(f"{folder}/{name}.java") or (name == "*" and os.path.dirname(path).endswith(folder)):
+                    found[path] = content
+                    pending.append(content)
+    return found
+
+
+class EntityFileCache:
+    """Per-entity generated files on disk, keyed by `entity_signature`.
+
+    Files are stored with the project directory and the entity name replaced by
+    placeholders and are restored with the requesting run's names on a hit,
+    together with the supporting classes they import (see `supporting_files`).
+    An entry's mtime is its last use; `prune` applies the age and size caps.
+    """
+
+    def __init__(self, cache_dir: str = ENTITY_CACHE_DIR, enabled: bool = ENTITY_CACHE_ENABLED,
+                 max_age_seconds: float = ENTITY_CACHE_MAX_AGE_DAYS * 86400, max_bytes: int = ENTITY_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        if enabled:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.prune()
+
+    def _path(self, signature: str) -> str:
+        return os.path.join(self.cache_dir, f"{signature}.json")
+
+    def lookup(self, signature: str, entity_name: str, project_name: str) -> Optional[Dict[str, str]]:
+        """Cached files and their supporting classes for `signature` with names substituted, or None on a miss."""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(signature), "r", encoding="utf-8") as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Unreadable entity cache entry", extra={"signature": signature, "error": str(e)})
+            return None
+        try:
+            os.utime(self._path(signature))
+        except OSError:
+            pass
+
+        def restore(text: str) -> str:
+            text = text.replace(PROJECT_PLACEHOLDER, project_name)
+            for placeholder, form in zip(_NAME_PLACEHOLDERS, _name_forms(entity_name)):
+                text = text.replace(placeholder, form)
+            return text
+
+        CACHE_HITS.labels(cache="entity_files").inc()
+        restored = {restore(path): restore(content) for path, content in stored.get("dependencies", {}).items()}
+        restored.update((restore(path), restore(content)) for path, content in stored["files"].items())
+        return restored
+
+    def store(self, signature: str, entity_name: str, project_name: str, files: Dict[str, str],
+              dependencies: Optional[Dict[str, str]] = None) -> bool:
+        """Save an entity's generated files and the supporting classes they import under `signature`.
+
+        Returns False if they can't be templated.
+        """
+        if not self.enabled or not files:
+            return False
+        dependencies = dependencies or {}
+        if any("@@" in path or "@@" in content for path, content in {**files, **dependencies}.items()):
+            return False
+        patterns = [(placeholder, _name_pattern(form))
+                    for placeholder, form in zip(_NAME_PLACEHOLDERS, _name_forms(entity_name))]
+
+        def template(text: str) -> str:
+            for placeholder, pattern in patterns:
+                text = pattern.sub(placeholder, text)
+            return text
+
+        def template_path(path: str) -> str:
+            # The project folder may itself contain the entity name (minimal-product-api)
+            if path.startswith(project_name + "/"):
+                return PROJECT_PLACEHOLDER + template(path[len(project_name):])
+            return template(path)
+
+        entry = {
+            "template_version": ENTITY_TEMPLATE_VERSION,
+            "entity": entity_name,
+            "files": {template_path(path): template(content) for path, content in files.items()},
+            "dependencies": {template_path(path): template(content) for path, content in dependencies.items()},
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._path(signature))
+        except OSError as e:
+            logger.warning("Could not write entity cache entry", extra={"signature": signature, "error": str(e)})
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        self.prune()
+        return True
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop entries unused for `max_age_seconds`, then least recently used ones until under `max_bytes`.
+
+        Returns how many entries were removed.
+        """
+        if not self.enabled or not (self.max_age_seconds or self.max_bytes):
+            return 0
+        now = now or time.time()
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as listing:
+                for item in listing:
+                    if item.name.endswith(".json"):
+                        try:
+                            stat = item.stat()
+                        except FileNotFoundError:
+                            continue
+                        entries.append((stat.st_mtime, stat.st_size, item.path))
+        except FileNotFoundError:
+            return 0
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if self.max_age_seconds and mtime < now - self.max_age_seconds:
+                policy = "age"
+            elif self.max_bytes and total > self.max_bytes:
+                policy = "quota"
+            else:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning("Could not remove entity cache entry", extra={"path": path, "error": str(e)})
+                continue
+            total -= size
+            removed += 1
+            RETENTION_EVICTIONS.labels(area="entity_cache", policy=policy).inc()
+            RETENTION_RECLAIMED_BYTES.labels(area="entity_cache", policy=policy).inc(size)
+        if removed:
+            logger.info("Pruned entity cache", extra={"removed": removed, "cache_bytes": total})
+        return removed
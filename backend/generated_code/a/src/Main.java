@@ -0,0 +1 @@
+class Main{}
@@ -0,0 +1,17 @@
+// MongoDB Collection Schema Scripts
+// Generated for Minimal BRD for brdynamo
+
+// Collection: products
+db.createCollection('products');
+
+// Indexes for products
+db.products.createIndex({'id': 1}, {unique: true});
+
+// Sample document structure for products
+db.products.insertOne({
+    "id": ObjectId(),
+    "name": "name_example",
+    "price": "price_value",
+    "stock": 123
+});
+
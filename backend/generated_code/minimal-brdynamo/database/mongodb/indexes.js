@@ -0,0 +1,2 @@
+-- MongoDB Indexes
+-- Add performance indexes here
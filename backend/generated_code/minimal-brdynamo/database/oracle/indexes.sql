@@ -0,0 +1,2 @@
+-- Oracle Indexes
+-- Add performance indexes here
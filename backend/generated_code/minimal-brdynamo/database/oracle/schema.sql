@@ -0,0 +1,13 @@
+-- Oracle Database Schema Script
+-- Generated for minimal-brdynamo
+
+-- Table: PRODUCT
+CREATE TABLE PRODUCT (
+    ID RAW(16) PRIMARY KEY,
+    NAME VARCHAR2(255),
+    PRICE VARCHAR2(255),
+    STOCK NUMBER(10)
+);
+
+CREATE SEQUENCE PRODUCT_SEQ START WITH 1 INCREMENT BY 1;
+
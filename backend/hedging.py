@@ -0,0 +1,167 @@
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Optional, TypeVar
+
+from metrics import LLM_HEDGES
+from rate_limit import RateLimiter, llm_rate_limiter
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "0") == "1"
+# A duplicate request goes out once a call has been running longer than this percentile of recent calls
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# Hedges are capped at this fraction of recent calls
+HEDGE_BUDGET_FRACTION = float(os.getenv("LLM_HEDGE_BUDGET_FRACTION", "0.05"))
+# Recent latencies kept per call, and how many are needed before hedging starts
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+HEDGE_WORKERS = 32
+
+
+class LatencyTracker:
+    """Sliding window of recent successful latencies per call."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self._lock = threading.Lock()
+
+    def record(self, call: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[call].append(seconds)
+
+    def percentile(self, call: str, pct: float, min_samples: int = MIN_SAMPLES) -> Optional[float]:
+        """Nearest-rank percentile, or None until `min_samples` latencies have been seen."""
+        with self._lock:
+            samples = sorted(self._samples[call])
+        if len(samples) < min_samples:
+            return None
+        rank = max(1, int(round(pct / 100 * len(samples) + 0.5)))
+        return samples[min(rank, len(samples)) - 1]
+
+
+class HedgeBudget:
+    """Allows a hedge only while hedges stay under `fraction` of the last `window` calls."""
+
+    def __init__(self, fraction: float = HEDGE_BUDGET_FRACTION, window: int = LATENCY_WINDOW):
+        self.fraction = fraction
+        self._calls: Deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self._calls.append(False)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            hedges = sum(self._calls)
+            if not self._calls or (hedges + 1) > self.fraction * len(self._calls):
+                return False
+            # Mark the newest plain call as hedged so the window counts it once
+            for index in range(len(self._calls) - 1, -1, -1):
+                if not self._calls[index]:
+                    self._calls[index] = True
+                    break
+            return True
+
+
+class _Attempt:
+    """One request on the hedge executor; records when it started running, so time
+    spent queued behind other requests is not counted as latency."""
+
+    def __init__(self, fn: Callable[[], T], before: Optional[Callable[[], object]] = None):
+        self.fn = fn
+        self.before = before
+        self.started = threading.Event()
+        self.start = 0.0
+
+    def __call__(self) -> T:
+        if self.before is not None:
+            self.before()
+        self.start = time.perf_counter()
+        self.started.set()
+        return self.fn()
+
+
+class Hedger:
+    """Runs an LLM call and, if it is slower than usual, races a duplicate against it.
+
+    The first successful response wins. The other request can't be aborted (the
+    Gemini client call is blocking), so its thread finishes in the background and
+    its result is discarded. Every request, hedge or not, first waits for the
+    shared LLM rate limiter. Latencies and the hedge delay are measured from
+    when the primary starts running, not from when it was queued.
+    """
+
+    def __init__(self, enabled: bool = HEDGING_ENABLED, percentile: float = HEDGE_PERCENTILE,
+                 budget: Optional[HedgeBudget] = None, tracker: Optional[LatencyTracker] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.budget = budget or HedgeBudget()
+        self.tracker = tracker or LatencyTracker()
+        self.rate_limiter = rate_limiter or llm_rate_limiter
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _submit(self, fn: Callable[[], T]) -> Future:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        # Keep the run id and per-run accounting in the request's context
+        return self._executor.submit(contextvars.copy_context().run, fn)
+
+    def call(self, call: str, fn: Callable[[], T]) -> T:
+        # The clock starts once the primary has its rate-limit slot, so throttle
+        # waits don't inflate the latencies the hedge delay is derived from
+        self.rate_limiter.acquire(call)
+        if not self.enabled:
+            return fn()
+
+        self.budget.record_call()
+        delay = self.tracker.percentile(call, self.percentile)
+        if delay is None:
+            start = time.perf_counter()
+            result = fn()
+            self.tracker.record(call, time.perf_counter() - start)
+            return result
+
+        attempt = _Attempt(fn)
+        primary = self._submit(attempt)
+        # With the executor busy the primary waits for a worker; that wait is neither
+        # latency nor a reason to hedge
+        attempt.started.wait()
+        start = attempt.start
+        done, _ = wait([primary], timeout=delay)
+        if done or not self.budget.try_spend():
+            result = primary.result()
+            self.tracker.record(call, time.perf_counter() - start)
+            return result
+
+        logger.info("Hedging slow LLM call", extra={"call": call, "hedge_after_s": round(delay, 3)})
+        hedge = self._submit(_Attempt(fn, before=lambda: self.rate_limiter.acquire(call)))
+        pending = {primary: "primary", hedge: "hedge"}
+        error: Optional[BaseException] = None
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for future in done:
+                winner = pending.pop(future)
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                LLM_HEDGES.labels(call=call, winner=winner).inc()
+                self.tracker.record(call, time.perf_counter() - start)
+                return future.result()
+        LLM_HEDGES.labels(call=call, winner="none").inc()
+        raise error
+
+
+hedger = Hedger()
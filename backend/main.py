@@ -1,15 +1,39 @@
-﻿from flask import Flask, request, jsonify, send_file
+﻿from flask import Flask, Response, g, request, jsonify, send_file, send_from_directory
 from werkzeug.utils import secure_filename
+import mimetypes
 import os
 import json
-import re
+import time
+from datetime import datetime, timezone
 import google.generativeai as genai
 from flask_cors import CORS
-import traceback
+import logging
 import PyPDF2
 from dotenv import load_dotenv
-from docx import Document
+from docx_text import extract_docx_text
+from text_normalize import PAGE_BREAK, normalize_brd_text
 from codegenerator_agent import CodeGeneratorAgent
+from artifact_store import RUN_FILTERS, ArtifactStore, RunNotFound
+from batch import BatchError, BatchRunner, expand_uploads
+from brd_schema import (
+    BRD_RESPONSE_SCHEMA,
+    BrdParseError,
+    REQUIRED_FIELDS,
+    gemini_response_schema,
+    invalid_sections,
+    missing_fields_prompt,
+    missing_required_fields,
+    repair_json,
+    validate_brd,
+)
+from metrics import (EXTRACTION_SECONDS, FAILURES, LLM_CALL_SECONDS, RETRIES, record_token_usage, render_latest,
+                     run_token_usage_var, track_stage)
+from profiling import PROFILE_MODES, ProfileSession
+from hedging import hedger
+from model_router import LATENCY_TIERS, latency_tier_var, router, run_model_routes_var
+from prompt_budget import count_tokens, estimate_tokens
+from retention import RetentionSweeper
+from run_logging import begin_run, configure_logging, end_run, log_payload, run_id_var
 from flasgger import Swagger, LazyJSONEncoder
 
 # ------------------------------
@@ -17,6 +41,8 @@ from flasgger import Swagger, LazyJSONEncoder
 # ------------------------------
 
 load_dotenv()  # Load environment variables
+configure_logging()
+logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app) 
 
@@ -25,17 +51,31 @@ app.json_encoder = LazyJSONEncoder
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Parent of the working folders below (the artifact store has its own ARTIFACT_STORE_DIR)
+DATA_DIR = os.getenv("BRD_DATA_DIR", SCRIPT_DIR)
 
-UPLOAD_FOLDER = os.path.join(SCRIPT_DIR, "uploads")
-PARSED_FOLDER = os.path.join(SCRIPT_DIR, "parsed_json")
-GENERATED_CODE_FOLDER = os.path.join(SCRIPT_DIR, "generated_code")
+UPLOAD_FOLDER = os.path.join(DATA_DIR, "uploads")
+PARSED_FOLDER = os.path.join(DATA_DIR, "parsed_json")
+GENERATED_CODE_FOLDER = os.path.join(DATA_DIR, "generated_code")
+PROFILES_FOLDER = os.path.join(DATA_DIR, "profiles")
+BATCHES_FOLDER = os.path.join(DATA_DIR, "batches")
+# The artifact store serves every read; the loose project tree is only for tools that want files on disk
+SAVE_GENERATED_TREE = os.getenv("SAVE_GENERATED_TREE", "0") == "1"
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(PARSED_FOLDER, exist_ok=True)
 os.makedirs(GENERATED_CODE_FOLDER, exist_ok=True)
+os.makedirs(PROFILES_FOLDER, exist_ok=True)
+os.makedirs(BATCHES_FOLDER, exist_ok=True)
 
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
 code_generator = CodeGeneratorAgent(GENERATED_CODE_FOLDER)
+artifact_store = ArtifactStore()
+# Output generated before the artifact store existed stays readable as the latest run
+if artifact_store.latest_run_id() is None:
+    # Saved runs live under .versions/; older saves wrote the projects straight into the folder
+    legacy_tree = CodeGeneratorAgent.current_root(GENERATED_CODE_FOLDER) or GENERATED_CODE_FOLDER
+    artifact_store.import_tree(f"import-{int(time.time())}", legacy_tree, metadata={"imported_from": legacy_tree})
 
 # ------------------------------
 # Swagger / OpenAPI (Flasgger)
@@ -56,6 +96,68 @@ def set_swagger_host():
     if not swagger_template["host"]:
         swagger_template["host"] = request.host
 
+@app.before_request
+def start_run_logging():
+    """Give each request a run id; `?debug=1` or `X-Debug-Run: 1` logs its full payloads."""
+    debug = request.args.get("debug") == "1" or request.headers.get("X-Debug-Run") == "1"
+    g.run_log_tokens = begin_run(debug)
+    g.token_usage_token = run_token_usage_var.set({})
+    g.model_routes_token = run_model_routes_var.set({})
+
+@app.before_request
+def set_latency_tier():
+    """`?latency_tier=` or `X-Latency-Tier:` (fast|balanced|quality) overrides the deployment's routing tier."""
+    tier = request.args.get("latency_tier") or request.headers.get("X-Latency-Tier")
+    if not tier:
+        return
+    if tier not in LATENCY_TIERS:
+        return jsonify({"error": f"Unknown latency tier '{tier}', expected one of {', '.join(LATENCY_TIERS)}"}), 400
+    g.latency_tier_token = latency_tier_var.set(tier)
+
+@app.before_request
+def start_profiling():
+    """`?profile=cprofile|sample` or `X-Profile: cprofile|sample` profiles this request only."""
+    mode = request.args.get("profile") or request.headers.get("X-Profile")
+    if not mode:
+        return
+    mode = "cprofile" if mode == "1" else mode
+    if mode not in PROFILE_MODES:
+        return jsonify({"error": f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}"}), 400
+    g.profile_session = ProfileSession(mode, os.path.join(PROFILES_FOLDER, run_id_var.get())).start()
+
+@app.after_request
+def add_run_id_header(response):
+    response.headers["X-Run-Id"] = run_id_var.get()
+    return response
+
+@app.after_request
+def stop_profiling(response):
+    session = g.pop("profile_session", None)
+    if session:
+        files = session.stop()
+        logger.info("Request profile written", extra={"mode": session.mode, "files": files})
+        response.headers["X-Profile"] = f"/profiles/{run_id_var.get()}"
+    return response
+
+@app.teardown_request
+def end_run_logging(exc):
+    tokens = g.pop("run_log_tokens", None)
+    if tokens:
+        end_run(tokens)
+    usage_token = g.pop("token_usage_token", None)
+    if usage_token:
+        run_token_usage_var.reset(usage_token)
+    routes_token = g.pop("model_routes_token", None)
+    if routes_token:
+        run_model_routes_var.reset(routes_token)
+    tier_token = g.pop("latency_tier_token", None)
+    if tier_token:
+        latency_tier_var.reset(tier_token)
+    # Only still set if the response was never finalized
+    session = g.pop("profile_session", None)
+    if session:
+        session.stop()
+
 swagger_config = {
     "headers": [],
     "specs": [
@@ -80,6 +182,10 @@ Swagger(app, template=swagger_template, config=swagger_config)
 def extract_text_from_file(file_path):
     """Extract text from txt, docx, or pdf files."""
     ext = os.path.splitext(file_path)[1].lower()
+    with EXTRACTION_SECONDS.labels(file_type=ext.lstrip(".") or "none").time():
+        return _extract_text(file_path, ext)
+
+def _extract_text(file_path, ext):
     text = ""
 
     if ext == ".txt":
@@ -87,108 +193,250 @@ def extract_text_from_file(file_path):
             text = f.read()
 
     elif ext == ".docx":
-        doc = Document(file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
+        # Streams word/document.xml: paragraphs and table rows in order, without building the DOM
+        text = extract_docx_text(file_path)
 
     elif ext == ".pdf":
         reader = PyPDF2.PdfReader(file_path)
-        for page in reader.pages:
-            text += page.extract_text() or ""
+        # Page breaks are kept so normalization can find running headers and footers
+        text = PAGE_BREAK.join(page.extract_text() or "" for page in reader.pages)
 
     else:
         raise ValueError("Unsupported file type. Please upload .txt, .docx, or .pdf")
 
     return text.strip()
 
-def parse_brd_with_gemini(file_path):
-    """Parses a BRD text file using Gemini API and saves structured JSON."""
+def read_run_files(run_id):
+    """A run's generated files as relative-path -> content, skipping zip artifacts."""
+    result = {}
+    for stored in artifact_store.list_files(run_id):
+        if stored.path.endswith('.zip'):
+            continue
+        try:
+            result[stored.path] = artifact_store.read_content(stored).decode('utf-8', errors='ignore')
+        except Exception:
+            # missing blobs are represented as a placeholder
+            result[stored.path] = '<binary or unreadable file>'
+    return result
+
+def requested_run_id():
+    """Run named by the run_id query parameter, else the latest upload run (None before the first)."""
+    run_id = request.args.get('run_id')
+    if not run_id:
+        return artifact_store.latest_run_id()
+    if artifact_store.get_run(run_id) is None:
+        raise RunNotFound(f"Run '{run_id}' not found")
+    return run_id
+
+def parse_timestamp(value):
+    """Epoch seconds or an ISO 8601 date/time (UTC unless it carries an offset) as epoch seconds."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+def send_stored_file(stored):
+    """Response for one stored file; gzip-stored bytes go out as they are to clients that accept gzip."""
+    mimetype = mimetypes.guess_type(stored.path)[0] or 'application/octet-stream'
+    etag = stored.sha256
+    if stored.encoding == 'gzip' and request.accept_encodings['gzip']:
+        response = Response(artifact_store.read_stored(stored), mimetype=mimetype)
+        response.headers['Content-Encoding'] = 'gzip'
+        etag += '-gzip'
+    else:
+        response = Response(artifact_store.read_content(stored), mimetype=mimetype)
+    if stored.encoding == 'gzip':
+        response.vary.add('Accept-Encoding')
+    # Content-addressed, so the hash is a strong validator
+    response.set_etag(etag)
+    return response.make_conditional(request)
+
+def project_name_of(paths):
+    """Top-level folder holding most of the generated files."""
+    folders = [path.split('/', 1)[0] for path in paths if '/' in path]
+    return max(set(folders), key=folders.count) if folders else None
+
+def json_response_config(schema):
+    """Generation config that constrains Gemini to JSON matching `schema`."""
+    return genai.GenerationConfig(response_mime_type="application/json", response_schema=schema)
+
+def load_model_json(raw_text):
+    """Decode a JSON-mode response; local repair only matters if the output was cut off."""
+    try:
+        return json.loads(raw_text)
+    except json.JSONDecodeError:
+        # Constrained decoding only yields invalid JSON when it hits the output token limit
+        RETRIES.labels(operation="json_repair").inc()
+        return repair_json(raw_text)
+
+def request_missing_fields(brd_text, fields):
+    """Ask Gemini for just the given BRD sections and return whichever it provided."""
+    RETRIES.labels(operation="parse_missing_fields").inc()
+    prompt = missing_fields_prompt(brd_text, fields)
+    model = genai.GenerativeModel(router.choose("parse_missing_fields", estimate_tokens(prompt)).model)
+    prompt_tokens = count_tokens(model, prompt)
+    with LLM_CALL_SECONDS.labels(call="parse_missing_fields").time():
+        response = hedger.call("parse_missing_fields", lambda: model.generate_content(
+            prompt,
+            generation_config=json_response_config(gemini_response_schema(fields)),
+        ))
+    record_token_usage("parse_missing_fields", response, prompt_tokens)
+    try:
+        patch = load_model_json(response.text)
+    except BrdParseError as e:
+        logger.warning("Could not recover missing sections", extra={"fields": fields, "error": str(e)})
+        return {}
+    if not isinstance(patch, dict):
+        return {}
+    return {field: patch[field] for field in fields if field in patch}
+
+def parse_brd_with_gemini(file_path, output_dir=None):
+    """Parses a BRD text file using Gemini API and saves structured JSON to PARSED_FOLDER (or `output_dir`).
+
+    Returns (saved path, parsed data, text normalization stats).
+    """
     brd_text = extract_text_from_file(file_path)
     
-    print("BRD TEXT: ", brd_text)
-
-    model = genai.GenerativeModel("gemini-2.0-flash")
+    logger.info("Extracted BRD text", extra={"file": os.path.basename(file_path), "chars": len(brd_text)})
+    brd_text, normalization = normalize_brd_text(brd_text)
+    logger.info("Normalized BRD text", extra=normalization)
+    log_payload(logger, "BRD text", brd_text)
 
     prompt = f"""
     You are an expert systems analyst AI that converts Business Requirement Documents (BRDs)
     into detailed structured data for autonomous code generation.
 
-    Extract every possible business and technical detail. Return ONLY valid JSON (no markdown).
-
-    Expected schema:
-    {{
-      "project_overview": {{
-        "name": "",
-        "objective": "",
-        "business_context": "",
-        "modules": [],
-        "timeline": "",
-        "budget_estimate": ""
-      }},
-      "stakeholders": {{
-        "business_team": [],
-        "technical_team": [],
-        "approvers": [],
-        "end_users": []
-      }},
-      "functional_requirements": [
-        {{
-          "id": "",
-          "title": "",
-          "description": "",
-          "priority": "",
-          "dependencies": [],
-          "input": "",
-          "output": "",
-          "workflow_steps": []
-        }}
-      ],
-      "non_functional_requirements": [],
-      "business_rules": [],
-      "data_model": {{
-        "entities": []
-      }},
-      "api_details": [],
-      "ui_specifications": [],
-      "security_and_compliance": [],
-      "risks_and_mitigations": [],
-      "assumptions_and_constraints": [],
-      "open_questions": [],
-      "glossary": []
-    }}
+    Extract every possible business and technical detail.
 
     BRD TEXT:
     {brd_text}
     """
 
-    response = model.generate_content(prompt)
-    raw_text = response.text.strip()
-    print("RAW OUTPUT: ", raw_text)
-    # Remove code block markers from generated content
-    raw_text = raw_text.replace("```java", "").replace("```", "").strip()
+    # JSON mode with a response schema: the output shape is enforced by the API,
+    # so the prompt no longer has to spell out the schema or forbid markdown
+    model = genai.GenerativeModel(
+        router.choose("parse", estimate_tokens(prompt)).model,
+        generation_config=json_response_config(BRD_RESPONSE_SCHEMA),
+    )
 
-    # Debugging: Print raw_text after removing code block markers
-    print("Processed RAW OUTPUT:", raw_text)
+    prompt_tokens = count_tokens(model, prompt)
+    logger.info("Sending parse prompt", extra={"estimated_prompt_tokens": prompt_tokens})
+    with LLM_CALL_SECONDS.labels(call="parse").time():
+        response = hedger.call("parse", lambda: model.generate_content(prompt))
+    logger.info("Parse response received", extra=record_token_usage("parse", response, prompt_tokens))
+    raw_text = response.text
+    log_payload(logger, "Parse response", raw_text)
 
-    # Try to recover JSON even if wrapped in markdown
     try:
-        parsed_data = json.loads(raw_text)
-    except json.JSONDecodeError:
-        json_str = re.search(r"\{.*\}", raw_text, re.DOTALL)
-        parsed_data = json.loads(json_str.group()) if json_str else {"error": "Invalid JSON", "raw_output": raw_text}
+        raw_data = load_model_json(raw_text)
+    except BrdParseError as e:
+        logger.warning("Could not recover JSON from model output", extra={"error": str(e)})
+        raw_data = {}
+    if not isinstance(raw_data, dict):
+        raw_data = {}
+
+    # Sections of a shape the schema can't coerce are asked for again rather than failing the run
+    invalid = invalid_sections(raw_data)
+    for field in invalid:
+        del raw_data[field]
+    # Only re-prompt for the sections that are actually missing or unusable
+    missing = invalid + [field for field in missing_required_fields(raw_data) if field not in invalid]
+    if missing:
+        logger.info("Parsed BRD is missing sections; requesting only those", extra={"fields": missing})
+        raw_data.update(request_missing_fields(brd_text, missing))
+        if len(missing_required_fields(raw_data)) == len(REQUIRED_FIELDS):
+            raise BrdParseError("Gemini did not return a usable BRD structure")
+
+    # Sections still unusable after the retry fall back to their defaults
+    parsed_data = validate_brd(raw_data)
 
     ext = os.path.splitext(file_path)[1].lower()
+    output_dir = output_dir or PARSED_FOLDER
     output_path = os.path.join(
-        PARSED_FOLDER,
+        output_dir,
         os.path.basename(file_path).replace(ext, "_parsed.json")
     )
 
     # Ensure the output directory exists
-    os.makedirs(PARSED_FOLDER, exist_ok=True)
+    os.makedirs(output_dir, exist_ok=True)
 
-    with open(output_path, "w", encoding="utf-8") as f:
+    # Write-then-rename: concurrent uploads of the same file name never leave a mixed file
+    tmp_path = f"{output_path}.{run_id_var.get()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
         json.dump(parsed_data, f, indent=2)
+    os.replace(tmp_path, output_path)
+
+    return output_path, parsed_data, normalization
+
+def process_brd(filepath, output_dir=None, parsed_dir=None, batch_id=None):
+    """Parse one saved BRD, generate its code and record the run with its artifacts in the
+    artifact store; with SAVE_GENERATED_TREE the project is also written to GENERATED_CODE_FOLDER
+    (or `output_dir`)."""
+    start = time.perf_counter()
+    run = {"source": "batch" if batch_id else "upload", "batch_id": batch_id, "filename": os.path.basename(filepath)}
+    try:
+        with track_stage("parse"):
+            parsed_path, parsed_data, normalization = parse_brd_with_gemini(filepath, parsed_dir)
+        logger.info("Parsed BRD saved", extra={"path": parsed_path})
+
+        # Generate code based on parsed BRD
+        with track_stage("codegen"):
+            generated_files = code_generator.generate_code_from_brd(parsed_data)
+        logger.info("Code generation complete", extra={"file_count": len(generated_files)})
+        
+        if not generated_files:
+            logger.warning("No files were generated")
+        else:
+            logger.debug("Generated file sizes", extra={"file_chars": {path: len(content) for path, content in generated_files.items()}})
+        
+        if SAVE_GENERATED_TREE:
+            with track_stage("save"):
+                code_generator.save_generated_code(generated_files, output_dir)
+            logger.info("Files saved to disk")
+    except Exception as e:
+        try:
+            artifact_store.record_run(run_id_var.get(), {}, metadata={"error": str(e)}, status="failed",
+                                      duration_seconds=round(time.perf_counter() - start, 3), **run)
+        except Exception:
+            logger.exception("Could not record the failed run")
+        raise
+
+    with track_stage("store"):
+        with open(filepath, "rb") as f:
+            upload_bytes = f.read()
+        with open(parsed_path, "rb") as f:
+            parsed_bytes = f.read()
+        routes = run_model_routes_var.get() or {}
+        artifact_store.record_run(
+            run_id_var.get(),
+            {"generated": generated_files, "upload": {run["filename"]: upload_bytes},
+             "parsed": {os.path.basename(parsed_path): parsed_bytes}},
+            metadata={"token_usage": run_token_usage_var.get(), "model_routes": routes, "normalization": normalization},
+            brd_sha256=normalization["text_sha256"],
+            project_name=project_name_of(generated_files),
+            model=routes.get("codegen", {}).get("model"),
+            duration_seconds=round(time.perf_counter() - start, 3),
+            **run,
+        )
 
-    return output_path
+    return {"parsed_path": parsed_path, "parsed_content": parsed_data, "generated_files": generated_files,
+            "normalization": normalization}
+
+batch_runner = BatchRunner(BATCHES_FOLDER, process_brd)
+retention_sweeper = RetentionSweeper(artifact_store, {
+    "uploads": UPLOAD_FOLDER,
+    "parsed": PARSED_FOLDER,
+    "generated": GENERATED_CODE_FOLDER,
+    "batches": BATCHES_FOLDER,
+    "profiles": PROFILES_FOLDER,
+})
+retention_sweeper.start()
 
 
 # ------------------------------
@@ -216,6 +464,17 @@ def upload_file():
           properties:
             message:
               type: string
+            run_id:
+              type: string
+            token_usage:
+              type: object
+              description: Prompt and response tokens per Gemini call of this run
+            model_routes:
+              type: object
+              description: Model, latency tier and input tokens each Gemini call of this run was routed with
+            normalization:
+              type: object
+              description: Lines, page numbers and hyphenations removed from the BRD text, token counts before and after, and the normalized text's SHA-256
             uploaded_file:
               type: string
             parsed_content:
@@ -244,40 +503,242 @@ def upload_file():
         
         file.save(filepath)
 
-        print(f"File saved at: {filepath}")
-
-        parsed_path = parse_brd_with_gemini(filepath)
-        print(f"Parsed output saved at: {parsed_path}")
-
-        with open(parsed_path, 'r') as f:
-            parsed_data = json.load(f)
+        logger.info("Upload saved", extra={"path": filepath})
 
-        # Generate code based on parsed BRD
-        print("=== STARTING CODE GENERATION ===")
-        generated_files = code_generator.generate_code_from_brd(parsed_data)
-        print(f"=== CODE GENERATION COMPLETE. FILES GENERATED: {len(generated_files)} ===")
-        
-        if not generated_files:
-            print("WARNING: No files were generated!")
-        else:
-            print("Generated files:")
-            for file_path in sorted(generated_files.keys()):
-                content_length = len(generated_files[file_path])
-                print(f"  - {file_path} ({content_length} chars)")
-        
-        code_generator.save_generated_code(generated_files)
-        print("=== FILES SAVED TO DISK ===")
+        result = process_brd(filepath)
+        parsed_data, generated_files = result["parsed_content"], result["generated_files"]
 
         return jsonify({
             "message": "File processed and code generated successfully",
+            "run_id": run_id_var.get(),
+            "token_usage": run_token_usage_var.get(),
+            "model_routes": run_model_routes_var.get(),
+            "normalization": result["normalization"],
             "uploaded_file": filepath,
             "parsed_content": parsed_data,
             "generated_files": list(generated_files.keys())
         })
 
     except Exception as e:
-        print("ERROR OCCURRED")
-        traceback.print_exc()
+        logger.exception("Upload processing failed")
+        FAILURES.labels(stage="upload").inc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/batches', methods=['POST'])
+def create_batch():
+    """Process several BRDs at once
+
+    Documents run in the background on a worker pool shared by all batches
+    (BATCH_MAX_CONCURRENCY) and their Gemini calls share the process-wide rate
+    limit; poll the returned batch for per-document status.
+    ---
+    consumes:
+      - multipart/form-data
+    parameters:
+      - name: files
+        in: formData
+        type: file
+        required: true
+        description: BRD files (.txt, .docx, .pdf) and/or .zip archives of them; repeat the field for several files
+    responses:
+      202:
+        description: Batch queued
+        schema:
+          type: object
+          properties:
+            batch_id:
+              type: string
+            status:
+              type: string
+              enum: [queued, running, completed, completed_with_errors, failed]
+            counts:
+              type: object
+            documents:
+              type: array
+              items:
+                type: object
+      400:
+        description: No usable documents, or the batch is too large
+      500:
+        description: Server error
+    """
+    try:
+        uploads = [(file.filename, file.read())
+                   for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+        if not uploads:
+            return jsonify({"error": "No files uploaded"}), 400
+        status = batch_runner.submit(expand_uploads(uploads))
+        response = jsonify(status)
+        response.headers["Location"] = f"/batches/{status['batch_id']}"
+        return response, 202
+    except BatchError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Batch submission failed")
+        FAILURES.labels(stage="batch").inc()
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/batches/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """Status of a batch and of each of its documents
+
+    ---
+    parameters:
+      - name: batch_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: Batch status; completed documents include their run id, project names, file count, token usage and model routes
+      404:
+        description: Unknown batch
+      500:
+        description: Server error
+    """
+    try:
+        status = batch_runner.status(batch_id)
+        if status is None:
+            return jsonify({"error": "Batch not found"}), 404
+        return jsonify(status)
+    except Exception as e:
+        logger.exception("Error reading batch status")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/batches/<batch_id>/documents/<int:index>/files', methods=['GET'])
+def get_batch_document_files(batch_id, index):
+    """Generated files of one batch document as JSON mapping relative-path -> content
+
+    ---
+    parameters:
+      - name: batch_id
+        in: path
+        type: string
+        required: true
+      - name: index
+        in: path
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Successfully retrieved generated files
+        schema:
+          type: object
+          additionalProperties:
+            type: string
+      404:
+        description: Unknown batch or document, or the document has not completed
+      500:
+        description: Server error
+    """
+    try:
+        run_id = batch_runner.document_run_id(batch_id, index)
+        if run_id is None:
+            return jsonify({"error": "No generated files for this document"}), 404
+        return jsonify(read_run_files(run_id))
+    except Exception as e:
+        logger.exception("Error listing batch document files")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/runs', methods=['GET'])
+def list_runs():
+    """Run history, newest first, one page at a time
+
+    Every read endpoint (/generated-files, /generated-code, /diagrams,
+    /jira-stories, ...) takes ?run_id= to serve any listed run.
+    ---
+    parameters:
+      - name: brd_sha256
+        in: query
+        type: string
+        description: Hash of the normalized BRD text (normalization.text_sha256 of the upload)
+      - name: project_name
+        in: query
+        type: string
+      - name: source
+        in: query
+        type: string
+        enum: [upload, batch]
+      - name: status
+        in: query
+        type: string
+        enum: [completed, failed]
+      - name: batch_id
+        in: query
+        type: string
+      - name: created_after
+        in: query
+        type: string
+        description: Epoch seconds or ISO 8601 date/time (UTC unless an offset is given), inclusive
+      - name: created_before
+        in: query
+        type: string
+        description: Epoch seconds or ISO 8601 date/time, exclusive
+      - name: limit
+        in: query
+        type: integer
+        description: Page size, at most 200 (default 50)
+      - name: cursor
+        in: query
+        type: string
+        description: next_cursor of the previous page
+    responses:
+      200:
+        description: A page of runs with their BRD hash, project, model, status, duration, file count and metadata
+        schema:
+          type: object
+          properties:
+            runs:
+              type: array
+              items:
+                type: object
+            next_cursor:
+              type: string
+      400:
+        description: Malformed limit, date or cursor
+      500:
+        description: Server error
+    """
+    try:
+        runs, next_cursor = artifact_store.list_runs(
+            limit=int(request.args.get('limit', 50)),
+            cursor=request.args.get('cursor'),
+            created_after=parse_timestamp(request.args.get('created_after')),
+            created_before=parse_timestamp(request.args.get('created_before')),
+            **{name: request.args[name] for name in RUN_FILTERS if request.args.get(name)},
+        )
+        return jsonify({"runs": runs, "next_cursor": next_cursor})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.exception("Error listing runs")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/runs/<run_id>', methods=['GET'])
+def get_run(run_id):
+    """One run with its metadata (token usage, model routes, normalization stats)
+
+    ---
+    parameters:
+      - name: run_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: The run
+      404:
+        description: Unknown run
+      500:
+        description: Server error
+    """
+    try:
+        run = artifact_store.get_run(run_id)
+        if run is None:
+            return jsonify({"error": "Run not found"}), 404
+        return jsonify(run)
+    except Exception as e:
+        logger.exception("Error reading run")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/generated-files', methods=['GET'])
@@ -285,6 +746,12 @@ def get_generated_files():
     """Return generated files as JSON mapping relative-path -> content.
 
     ---
+    parameters:
+      - name: run_id
+        in: query
+        type: string
+        required: false
+        description: Run to read (see /runs); defaults to the latest upload
     responses:
       200:
         description: Successfully retrieved generated files
@@ -292,36 +759,74 @@ def get_generated_files():
           type: object
           additionalProperties:
             type: string
+      404:
+        description: Unknown run_id
       500:
         description: Server error
     """
     try:
-        result = {}
-        for root, _, files in os.walk(GENERATED_CODE_FOLDER):
-            for fname in files:
-                # skip zip artifacts
-                if fname.endswith('.zip'):
-                    continue
-                full = os.path.join(root, fname)
-                # normalize path separators to forward slashes for JSON keys
-                rel = os.path.relpath(full, GENERATED_CODE_FOLDER).replace('\\', '/')
-                try:
-                    with open(full, 'r', encoding='utf-8', errors='ignore') as f:
-                        result[rel] = f.read()
-                except Exception:
-                    # binary files or unreadable files are represented as a placeholder
-                    result[rel] = '<binary or unreadable file>'
-        return jsonify(result)
+        run_id = requested_run_id()
+        return jsonify(read_run_files(run_id) if run_id else {})
+    except RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logger.exception("Error listing generated files")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/generated-files/<path:file_path>', methods=['GET'])
+def get_generated_file(file_path):
+    """Download one generated file of the latest run, or of the run given by run_id.
+
+    Files stored gzipped are sent as stored, with Content-Encoding gzip, when
+    the client accepts gzip, and decompressed otherwise.
+    ---
+    parameters:
+      - name: file_path
+        in: path
+        type: string
+        required: true
+        description: Path relative to the generated code root, e.g. my-project/README.md
+      - name: run_id
+        in: query
+        type: string
+        required: false
+        description: Run to read (see /runs); defaults to the latest upload
+    responses:
+      200:
+        description: The file content
+        schema:
+          type: string
+          format: binary
+      304:
+        description: Not modified since the ETag sent in If-None-Match
+      404:
+        description: No such file in the latest run, or unknown run_id
+      500:
+        description: Server error
+    """
+    try:
+        run_id = requested_run_id()
+        stored = artifact_store.get_file(run_id, file_path) if run_id else None
+        if stored is None:
+            return jsonify({"error": "File not found"}), 404
+        return send_stored_file(stored)
+    except RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
-        print('ERROR listing generated files', e)
-        traceback.print_exc()
+        logger.exception("Error sending generated file")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/generated-code/status', methods=['GET'])
 def generated_code_status():
-    """Return JSON { ready: true/false } indicating whether the zip exists.
+    """Return JSON { ready: true/false } indicating whether a generated package can be downloaded.
 
     ---
+    parameters:
+      - name: run_id
+        in: query
+        type: string
+        required: false
+        description: Run to read (see /runs); defaults to the latest upload
     responses:
       200:
         description: ZIP file status
@@ -330,16 +835,18 @@ def generated_code_status():
           properties:
             ready:
               type: boolean
+      404:
+        description: Unknown run_id
       500:
         description: Server error
     """
     try:
-        zip_path = os.path.join(GENERATED_CODE_FOLDER, 'generated_package.zip')
-        ready = os.path.exists(zip_path)
-        return jsonify({'ready': ready})
+        run_id = requested_run_id()
+        return jsonify({'ready': run_id is not None and artifact_store.get_run(run_id)['file_count'] > 0})
+    except RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
-        print("ERROR checking generated zip status:", e)
-        traceback.print_exc()
+        logger.exception("Error checking generated zip status")
         return jsonify({'error': str(e)}), 500
 
 @app.route('/generated-code', methods=['GET'])
@@ -347,6 +854,12 @@ def get_generated_code():
     """Download generated code as a ZIP file.
 
     ---
+    parameters:
+      - name: run_id
+        in: query
+        type: string
+        required: false
+        description: Run to read (see /runs); defaults to the latest upload
     responses:
       200:
         description: Successfully downloaded ZIP file
@@ -354,68 +867,26 @@ def get_generated_code():
           type: string
           format: binary
       404:
-        description: ZIP file not found
+        description: ZIP file not found, or unknown run_id
       500:
         description: Server error
     """
     try:
-        print("=== /generated-code ENDPOINT CALLED ===")
-        # Prefer the zip produced by the generator
-        package_zip = os.path.join(GENERATED_CODE_FOLDER, 'generated_package.zip')
-        print(f"Looking for generated_package.zip at: {package_zip}")
-        print(f"generated_package.zip exists: {os.path.exists(package_zip)}")
-        
-        if os.path.exists(package_zip):
-            zip_path = package_zip
-            print(f"Using existing generated_package.zip")
-        else:
-            # Create a zip from the generated folder, excluding zip files
-            zip_path = os.path.join(GENERATED_CODE_FOLDER, 'generated_code_temp.zip')
-            import shutil
-            if os.path.exists(zip_path):
-                os.remove(zip_path)
-            
-            # Find the project folder (any directory that's not hidden)
-            project_folders = [d for d in os.listdir(GENERATED_CODE_FOLDER) 
-                             if os.path.isdir(os.path.join(GENERATED_CODE_FOLDER, d)) 
-                             and not d.startswith('.')]
-            
-            if project_folders:
-                # Zip only the project folder, not the entire generated_code folder
-                project_path = os.path.join(GENERATED_CODE_FOLDER, project_folders[0])
-                print(f"Creating zip from project folder: {project_path}")
-                
-                # Check if the project folder actually contains files
-                has_files = False
-                file_count = 0
-                for root, dirs, files in os.walk(project_path):
-                    if files:
-                        has_files = True
-                        file_count += len(files)
-                
-                if has_files:
-                    # Create zip with the project folder as the root, preserving folder structure
-                    print(f"Creating temp zip with {file_count} files using shutil.make_archive")
-                    shutil.make_archive(zip_path[:-4], 'zip', GENERATED_CODE_FOLDER, project_folders[0])
-                    
-                    # Verify creation
-                    if os.path.exists(zip_path):
-                        zip_size = os.path.getsize(zip_path)
-                        print(f"Temp zip created successfully: {zip_path} (size: {zip_size} bytes)")
-                    else:
-                        print(f"ERROR: Temp zip was not created")
-                else:
-                    print("Project folder exists but contains no files")
-                    # Create empty zip if project folder has no files
-                    import zipfile
-                    with zipfile.ZipFile(zip_path, 'w') as zipf:
-                        pass
-            else:
-                print("No project folder found, creating empty zip")
-                # Create empty zip if no project folder exists
-                import zipfile
-                with zipfile.ZipFile(zip_path, 'w') as zipf:
-                    pass
+        run_id = requested_run_id()
+        if run_id is None:
+            return jsonify({"error": "No generated code yet"}), 404
+        stored_files = artifact_store.list_files(run_id)
+        project = project_name_of([stored.path for stored in stored_files])
+        if project is None:
+            logger.warning("No generated project found, sending an empty zip")
+
+        # Zip only the project folder, with the folder as the archive root; built once per run
+        # and cached, so repeated downloads cost no compression
+        with track_stage("zip"):
+            zip_path = artifact_store.cached_zip(run_id, [
+                stored for stored in stored_files
+                if project and stored.path.startswith(project + '/') and not stored.path.endswith('.zip')
+            ])
 
         return send_file(
             zip_path,
@@ -424,9 +895,10 @@ def get_generated_code():
             download_name='generated_package.zip'
         )
 
+    except RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
-        print("ERROR OCCURRED")
-        traceback.print_exc()
+        logger.exception("Error building generated code zip")
         return jsonify({"error": str(e)}), 500
 
 
@@ -436,6 +908,12 @@ def get_diagrams():
     ---
     tags:
       - Diagrams
+    parameters:
+      - name: run_id
+        in: query
+        type: string
+        required: false
+        description: Run to read (see /runs); defaults to the latest upload
     responses:
       200:
         description: Successfully retrieved diagrams
@@ -456,6 +934,8 @@ def get_diagrams():
                   type: integer
                 png_files:
                   type: integer
+      404:
+        description: Unknown run_id
       500:
         description: Server error
     """
@@ -468,70 +948,65 @@ def get_diagrams():
             "png_files": 0
         }
         
-        # Look for diagram files in generated projects
-        for root, dirs, files in os.walk(GENERATED_CODE_FOLDER):
-            normalized_root = root.replace('\\', '/')
-            
-            for fname in files:
-                if 'docs/diagrams' in normalized_root:
-                    full_path = os.path.join(root, fname)
-                    rel_path = os.path.relpath(full_path, GENERATED_CODE_FOLDER).replace('\\', '/')
-                    
-                    try:
-                        if fname.endswith('.puml'):
-                            # PlantUML source files
-                            with open(full_path, 'r', encoding='utf-8') as f:
-                                diagrams[rel_path] = {
-                                    "type": "plantuml",
-                                    "content": f.read(),
-                                    "format": "text"
-                                }
-                            summary["puml_files"] += 1
-                        elif fname.endswith('.svg'):
-                            # SVG files
-                            with open(full_path, 'r', encoding='utf-8') as f:
-                                diagrams[rel_path] = {
-                                    "type": "svg",
-                                    "content": f.read(),
-                                    "format": "svg"
-                                }
-                            summary["svg_files"] += 1
-                        elif fname.endswith('.png'):
-                            # PNG files (base64 encoded)
-                            import base64
-                            with open(full_path, 'rb') as f:
-                                diagrams[rel_path] = {
-                                    "type": "png",
-                                    "content": base64.b64encode(f.read()).decode('ascii'),
-                                    "format": "base64"
-                                }
-                            summary["png_files"] += 1
-                        elif fname == 'README.md':
-                            # README files
-                            with open(full_path, 'r', encoding='utf-8') as f:
-                                diagrams[rel_path] = {
-                                    "type": "markdown",
-                                    "content": f.read(),
-                                    "format": "text"
-                                }
-                    except Exception as e:
-                        print(f"Error reading diagram file {rel_path}: {e}")
+        # Look for diagram files in the latest generated project
+        run_id = requested_run_id()
+        stored_files = artifact_store.list_files(run_id, path_like='%docs/diagrams%') if run_id else []
+        for stored in stored_files:
+            rel_path = stored.path
+            fname = os.path.basename(rel_path)
+            if 'docs/diagrams' in os.path.dirname(rel_path):
+                try:
+                    if fname.endswith('.puml'):
+                        # PlantUML source files
                         diagrams[rel_path] = {
-                            "type": "error",
-                            "content": f"Error reading file: {str(e)}",
+                            "type": "plantuml",
+                            "content": artifact_store.read_content(stored).decode('utf-8'),
                             "format": "text"
                         }
-                    
-                    summary["total_diagrams"] += 1
+                        summary["puml_files"] += 1
+                    elif fname.endswith('.svg'):
+                        # SVG files
+                        diagrams[rel_path] = {
+                            "type": "svg",
+                            "content": artifact_store.read_content(stored).decode('utf-8'),
+                            "format": "svg"
+                        }
+                        summary["svg_files"] += 1
+                    elif fname.endswith('.png'):
+                        # PNG files (base64 encoded)
+                        import base64
+                        diagrams[rel_path] = {
+                            "type": "png",
+                            "content": base64.b64encode(artifact_store.read_content(stored)).decode('ascii'),
+                            "format": "base64"
+                        }
+                        summary["png_files"] += 1
+                    elif fname == 'README.md':
+                        # README files
+                        diagrams[rel_path] = {
+                            "type": "markdown",
+                            "content": artifact_store.read_content(stored).decode('utf-8'),
+                            "format": "text"
+                        }
+                except Exception as e:
+                    logger.warning("Error reading diagram file", extra={"path": rel_path, "error": str(e)})
+                    diagrams[rel_path] = {
+                        "type": "error",
+                        "content": f"Error reading file: {str(e)}",
+                        "format": "text"
+                    }
+                
+                summary["total_diagrams"] += 1
         
         return jsonify({
             "diagrams": diagrams,
             "summary": summary
         })
         
+    except RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
-        print('ERROR listing diagrams', e)
-        traceback.print_exc()
+        logger.exception("Error listing diagrams")
         return jsonify({'error': str(e)}), 500
 
 
@@ -541,6 +1016,12 @@ def get_jira_stories():
     ---
     tags:
       - JIRA
+    parameters:
+      - name: run_id
+        in: query
+        type: string
+        required: false
+        description: Run to read (see /runs); defaults to the latest upload
     responses:
       200:
         description: Successfully retrieved JIRA stories
@@ -557,6 +1038,8 @@ def get_jira_stories():
                   type: integer
                 project_name:
                   type: string
+      404:
+        description: Unknown run_id
       500:
         description: Server error
     """
@@ -567,43 +1050,108 @@ def get_jira_stories():
             "project_name": None
         }
         
-        # Look for project-management files in generated projects
-        for root, dirs, filenames in os.walk(GENERATED_CODE_FOLDER):
-            normalized_root = root.replace('\\', '/')
+        # Look for project-management files in the latest generated project
+        run_id = requested_run_id()
+        stored_files = artifact_store.list_files(run_id, path_like='%project-management%') if run_id else []
+        for stored in stored_files:
+            # Check if this is in a project-management folder
+            if 'project-management' not in os.path.dirname(stored.path):
+                continue
+            if not summary["project_name"]:
+                summary["project_name"] = stored.path.split('/', 1)[0]
             
-            # Check if this is a project-management folder
-            if 'project-management' in normalized_root:
-                # Extract project name from path
-                if not summary["project_name"]:
-                    parts = normalized_root.split('/')
-                    for i, part in enumerate(parts):
-                        if part == 'generated_code' and i + 1 < len(parts):
-                            summary["project_name"] = parts[i + 1]
-                            break
-                
-                for fname in filenames:
-                    if fname.endswith(('.md', '.csv', '.txt')):
-                        full_path = os.path.join(root, fname)
-                        
-                        try:
-                            with open(full_path, 'r', encoding='utf-8') as f:
-                                files[fname] = f.read()
-                            summary["total_files"] += 1
-                        except Exception as file_error:
-                            print(f'Error reading {full_path}: {file_error}')
-                            continue
+            fname = os.path.basename(stored.path)
+            if fname.endswith(('.md', '.csv', '.txt')):
+                try:
+                    files[fname] = artifact_store.read_content(stored).decode('utf-8')
+                    summary["total_files"] += 1
+                except Exception as file_error:
+                    logger.warning("Error reading JIRA file", extra={"path": stored.path, "error": str(file_error)})
+                    continue
         
         return jsonify({
             "files": files,
             "summary": summary
         })
         
+    except RunNotFound as e:
+        return jsonify({"error": str(e)}), 404
     except Exception as e:
-        print('ERROR listing JIRA stories', e)
-        traceback.print_exc()
+        logger.exception("Error listing JIRA stories")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics
+
+    ---
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Stage latency histograms and cache/retry/failure counters in Prometheus text format
+    """
+    body, content_type = render_latest()
+    return Response(body, content_type=content_type)
+
+
+@app.route('/profiles/<run_id>', methods=['GET'])
+def list_profile_files(run_id):
+    """List the profile files of a profiled request
+
+    ---
+    parameters:
+      - name: run_id
+        in: path
+        type: string
+        required: true
+        description: Value of the X-Run-Id header of the profiled request
+    responses:
+      200:
+        description: Profile files, downloadable from /profiles/<run_id>/<filename>
+      404:
+        description: No profile for this run
+    """
+    profile_dir = os.path.join(PROFILES_FOLDER, secure_filename(run_id))
+    if not run_id or not os.path.isdir(profile_dir):
+        return jsonify({"error": "No profile for this run"}), 404
+    files = sorted(os.listdir(profile_dir))
+    return jsonify({
+        "run_id": run_id,
+        "files": [
+            {"name": name, "size": os.path.getsize(os.path.join(profile_dir, name)),
+             "url": f"/profiles/{run_id}/{name}"}
+            for name in files
+        ],
+    })
+
+
+@app.route('/profiles/<run_id>/<filename>', methods=['GET'])
+def download_profile_file(run_id, filename):
+    """Download a profile file
+
+    ---
+    parameters:
+      - name: run_id
+        in: path
+        type: string
+        required: true
+      - name: filename
+        in: path
+        type: string
+        required: true
+        description: profile.prof (pstats/snakeviz), profile.txt or stacks.collapsed (flamegraph.pl/speedscope)
+    responses:
+      200:
+        description: The profile file
+      404:
+        description: File not found
+    """
+    profile_dir = os.path.join(PROFILES_FOLDER, secure_filename(run_id))
+    return send_from_directory(profile_dir, secure_filename(filename), as_attachment=True)
+
+
 # ------------------------------
 # ENTRY POINT
 # ------------------------------
@@ -0,0 +1,114 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# Upload latency spans milliseconds (templates, save) to minutes (LLM calls)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+STAGE_SECONDS = Histogram(
+    "brdynamo_stage_duration_seconds",
+    "Duration of each upload/pipeline stage",
+    ["stage"],
+    buckets=LATENCY_BUCKETS,
+)
+EXTRACTION_SECONDS = Histogram(
+    "brdynamo_extraction_duration_seconds",
+    "Text extraction time per uploaded file type",
+    ["file_type"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_SECONDS = Histogram(
+    "brdynamo_llm_call_duration_seconds",
+    "Duration of individual Gemini calls",
+    ["call"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_RATE_LIMIT_WAIT_SECONDS = Histogram(
+    "brdynamo_llm_rate_limit_wait_seconds",
+    "Time Gemini calls waited for the request rate limit",
+    ["call"],
+    buckets=LATENCY_BUCKETS,
+)
+KROKI_RENDER_SECONDS = Histogram(
+    "brdynamo_kroki_render_duration_seconds",
+    "Duration of each Kroki diagram render, including the GET fallback",
+    ["diagram", "format"],
+    buckets=LATENCY_BUCKETS,
+)
+
+LLM_TOKENS = Counter("brdynamo_llm_tokens_total", "Gemini tokens by call, prompt, cached prompt or response",
+                     ["call", "kind"])
+
+CACHE_HITS = Counter("brdynamo_cache_hits_total", "Work skipped because a cached result was reused", ["cache"])
+RETRIES = Counter("brdynamo_retries_total", "Retries and follow-up requests", ["operation"])
+FAILURES = Counter("brdynamo_failures_total", "Failed stages and calls", ["stage"])
+LLM_HEDGES = Counter("brdynamo_llm_hedges_total", "Hedged Gemini calls by which request won", ["call", "winner"])
+NORMALIZATION_SAVED_TOKENS = Counter("brdynamo_normalization_saved_tokens_total",
+                                     "Estimated parse prompt tokens removed by BRD text normalization")
+ARTIFACT_STORE_BYTES = Counter("brdynamo_artifact_store_bytes_total",
+                               "Artifact bytes written as new blobs (raw and as stored on disk) or found already stored",
+                               ["kind"])
+RETENTION_RECLAIMED_BYTES = Counter("brdynamo_retention_reclaimed_bytes_total",
+                                    "Bytes freed by the retention sweeper by area and policy", ["area", "policy"])
+RETENTION_EVICTIONS = Counter("brdynamo_retention_evictions_total",
+                              "Runs, files and folders removed by the retention sweeper", ["area", "policy"])
+BATCH_DOCUMENTS = Counter("brdynamo_batch_documents_total", "Batch documents by final status", ["status"])
+MODEL_ROUTES = Counter("brdynamo_model_routes_total", "Gemini calls by routed model and latency tier",
+                       ["call", "model", "tier"])
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time a block into STAGE_SECONDS and count it in FAILURES if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        FAILURES.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def observe_pipeline_stage(stage: str, seconds: float, failed: bool) -> None:
+    """Pipeline observer feeding per-stage codegen timings into the same histogram."""
+    STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    if failed:
+        FAILURES.labels(stage=stage).inc()
+
+
+# Token usage of the current run, keyed by call; set per request so concurrent runs don't mix
+run_token_usage_var: contextvars.ContextVar[Optional[Dict[str, Dict[str, int]]]] = contextvars.ContextVar(
+    "run_token_usage", default=None)
+
+
+def record_token_usage(call: str, response, estimated_prompt_tokens: Optional[int] = None) -> Dict[str, int]:
+    """Count a Gemini response's usage_metadata and add it to the current run's totals."""
+    usage = getattr(response, "usage_metadata", None)
+    entry = {
+        "prompt_tokens": getattr(usage, "prompt_token_count", 0) or 0,
+        "response_tokens": getattr(usage, "candidates_token_count", 0) or 0,
+    }
+    cached_tokens = getattr(usage, "cached_content_token_count", 0) or 0
+    if cached_tokens:
+        entry["cached_prompt_tokens"] = cached_tokens
+        LLM_TOKENS.labels(call=call, kind="cached_prompt").inc(cached_tokens)
+    if estimated_prompt_tokens is not None:
+        entry["estimated_prompt_tokens"] = estimated_prompt_tokens
+    LLM_TOKENS.labels(call=call, kind="prompt").inc(entry["prompt_tokens"])
+    LLM_TOKENS.labels(call=call, kind="response").inc(entry["response_tokens"])
+
+    run_usage = run_token_usage_var.get()
+    if run_usage is not None:
+        totals = run_usage.setdefault(call, {})
+        for key, value in entry.items():
+            totals[key] = totals.get(key, 0) + value
+    return entry
+
+
+def render_latest():
+    """Metrics in the Prometheus text exposition format, with its content type."""
+    return generate_latest(), CONTENT_TYPE_LATEST
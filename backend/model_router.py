@@ -0,0 +1,96 @@
+import contextvars
+import logging
+import os
+from typing import Dict, List, NamedTuple, Optional
+
+from metrics import MODEL_ROUTES
+
+logger = logging.getLogger(__name__)
+
+# "fast" always takes a stage's first (fastest) model, "quality" its last (highest capacity)
+# one, "balanced" picks by input size
+LATENCY_TIERS = ("fast", "balanced", "quality")
+DEFAULT_LATENCY_TIER = os.getenv("MODEL_LATENCY_TIER", "balanced")
+
+# Per stage: comma-separated "model:max_input_tokens" entries, fastest first; the last entry
+# takes everything larger. Override per deployment with MODEL_ROUTES_<STAGE>.
+DEFAULT_ROUTES = {
+    "parse": "gemini-2.0-flash-lite:4000,gemini-2.0-flash",
+    "parse_missing_fields": "gemini-2.0-flash-lite",
+    "codegen": "gemini-2.0-flash:16000,gemini-2.5-flash",
+}
+
+# Tier requested for the current run (query/header override of DEFAULT_LATENCY_TIER)
+latency_tier_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("latency_tier", default=None)
+# Routing decisions of the current run, keyed by call
+run_model_routes_var: contextvars.ContextVar[Optional[Dict[str, Dict]]] = contextvars.ContextVar(
+    "run_model_routes", default=None)
+
+
+class Route(NamedTuple):
+    model: str
+    max_input_tokens: Optional[int]
+
+
+class RouteDecision(NamedTuple):
+    call: str
+    model: str
+    tier: str
+    input_tokens: int
+
+
+def parse_routes(spec: str) -> List[Route]:
+    """Parse "model-a:4000,model-b" into routes; raises ValueError on a malformed spec."""
+    routes = []
+    for entry in spec.split(","):
+        model, _, limit = entry.strip().partition(":")
+        if not model:
+            raise ValueError(f"Empty model in route spec '{spec}'")
+        routes.append(Route(model, int(limit) if limit else None))
+    if not routes:
+        raise ValueError("Route spec has no models")
+    return routes
+
+
+class ModelRouter:
+    """Chooses the Gemini model for each call from its stage, input size and latency tier."""
+
+    def __init__(self, routes: Dict[str, List[Route]], default_tier: str = DEFAULT_LATENCY_TIER):
+        if default_tier not in LATENCY_TIERS:
+            raise ValueError(f"Unknown latency tier '{default_tier}', expected one of {', '.join(LATENCY_TIERS)}")
+        self.routes = routes
+        self.default_tier = default_tier
+
+    @classmethod
+    def from_env(cls) -> "ModelRouter":
+        return cls({
+            stage: parse_routes(os.getenv(f"MODEL_ROUTES_{stage.upper()}", spec))
+            for stage, spec in DEFAULT_ROUTES.items()
+        })
+
+    def choose(self, call: str, input_tokens: int, tier: Optional[str] = None) -> RouteDecision:
+        """Pick the model for `call` and record the decision for the current run."""
+        tier = tier or latency_tier_var.get() or self.default_tier
+        routes = self.routes.get(call) or self.routes["codegen"]
+        if tier == "fast":
+            route = routes[0]
+        elif tier == "quality":
+            route = routes[-1]
+        else:
+            route = next((r for r in routes if r.max_input_tokens is None or input_tokens <= r.max_input_tokens),
+                         routes[-1])
+        decision = RouteDecision(call, route.model, tier, input_tokens)
+        record_route(decision)
+        return decision
+
+
+def record_route(decision: RouteDecision) -> None:
+    MODEL_ROUTES.labels(call=decision.call, model=decision.model, tier=decision.tier).inc()
+    logger.info("Routed model call", extra=decision._asdict())
+    run_routes = run_model_routes_var.get()
+    if run_routes is not None:
+        run_routes[decision.call] = {"model": decision.model, "tier": decision.tier,
+                                     "input_tokens": decision.input_tokens}
+
+
+router = ModelRouter.from_env()
@@ -0,0 +1,100 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from typing import Any, Callable, ContextManager, Dict, Iterable, List, Optional
+
+
+class Stage:
+    """A named unit of work that runs once all of its dependencies have finished."""
+
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+
+
+class Pipeline:
+    """Runs stages as a dependency graph, overlapping every stage whose inputs are ready.
+
+    Each stage function receives a dict of its dependencies' results keyed by stage
+    name. Wall-clock duration of every stage is recorded in `timings` (seconds)
+    and, if given, reported to `observer(name, seconds, failed)` as it finishes.
+    `stage_context`, if given, is entered around every stage in its worker thread.
+    """
+
+    def __init__(self, max_workers: int = 8, observer: Optional[Callable[[str, float, bool], None]] = None,
+                 stage_context: Callable[[], ContextManager] = nullcontext):
+        self.max_workers = max_workers
+        self.observer = observer
+        self.stage_context = stage_context
+        self.stages: Dict[str, Stage] = {}
+        self.results: Dict[str, Any] = {}
+        self.timings: Dict[str, float] = {}
+
+    def add_stage(self, name: str, func: Callable[[Dict[str, Any]], Any], depends_on: Iterable[str] = ()) -> None:
+        if name in self.stages:
+            raise ValueError(f"Duplicate pipeline stage: {name}")
+        self.stages[name] = Stage(name, func, depends_on)
+
+    def _validate(self) -> None:
+        """Reject unknown dependencies and cycles before anything is scheduled."""
+        for stage in self.stages.values():
+            missing = [dep for dep in stage.depends_on if dep not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(missing)}")
+
+        resolved: List[str] = []
+        remaining = dict(self.stages)
+        while remaining:
+            ready = [name for name, stage in remaining.items() if all(dep in resolved for dep in stage.depends_on)]
+            if not ready:
+                raise ValueError(f"Pipeline has a dependency cycle among: {', '.join(sorted(remaining))}")
+            for name in ready:
+                resolved.append(name)
+                del remaining[name]
+
+    def _run_stage(self, stage: Stage) -> Any:
+        inputs = {dep: self.results[dep] for dep in stage.depends_on}
+        start = time.perf_counter()
+        failed = True
+        try:
+            with self.stage_context():
+                result = stage.func(inputs)
+            failed = False
+            return result
+        finally:
+            self.timings[stage.name] = time.perf_counter() - start
+            if self.observer:
+                self.observer(stage.name, self.timings[stage.name], failed)
+
+    def run(self) -> Dict[str, Any]:
+        """Execute all stages and return their results.
+
+        The first stage failure is re-raised as soon as it happens, without waiting
+        for the other stages still running.
+        """
+        self._validate()
+        pending = dict(self.stages)
+        running = {}
+        start = time.perf_counter()
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                for name in [n for n, s in pending.items() if all(dep in self.results for dep in s.depends_on)]:
+                    # Each stage runs in a copy of the caller's context so run-scoped state (run id, log flags) follows it
+                    running[pool.submit(contextvars.copy_context().run, self._run_stage, pending.pop(name))] = name
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.results[running.pop(future)] = future.result()
+        except BaseException:
+            # Stages already running can't be interrupted; they finish in the background
+            # while the failure propagates, and queued ones never start
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+        self.timings["total"] = time.perf_counter() - start
+        return self.results
@@ -0,0 +1,126 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+# "cprofile": deterministic per-function stats (.prof for snakeviz/gprof2dot plus a text summary)
+# "sample": wall-clock stack sampling written as collapsed stacks for flamegraph.pl/speedscope
+PROFILE_MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+profile_session_var: contextvars.ContextVar[Optional["ProfileSession"]] = contextvars.ContextVar(
+    "profile_session", default=None)
+
+
+class StackSampler(threading.Thread):
+    """Samples the stacks of the profiled request's threads every `interval` seconds.
+
+    Sampled threads are the request thread plus any thread started while the
+    session runs (pipeline and save workers); pre-existing idle threads are ignored.
+    """
+
+    def __init__(self, request_thread_id: int, interval: float = SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._request_thread_id = request_thread_id
+        self._preexisting = {thread.ident for thread in threading.enumerate()} - {request_thread_id}
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id or thread_id in self._preexisting:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                thread_name = "request" if thread_id == self._request_thread_id else names.get(thread_id, "thread")
+                self.counts[";".join([thread_name] + stack[::-1])] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+
+class ProfileSession:
+    """Profiler for a single request; `stop()` writes its output files to `output_dir`."""
+
+    def __init__(self, mode: str, output_dir: str):
+        self.mode = mode
+        self.output_dir = output_dir
+        self._profiler: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+        self._token: Optional[contextvars.Token] = None
+
+    def start(self) -> "ProfileSession":
+        self._token = profile_session_var.set(self)
+        if self.mode == "cprofile":
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            self._sampler = StackSampler(threading.get_ident())
+            self._sampler.start()
+        return self
+
+    def add_thread_profile(self, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            self._thread_profiles.append(profiler)
+
+    def stop(self) -> List[str]:
+        """Stop profiling and write the output; returns the written file names."""
+        if self._token is None:
+            return []
+        profile_session_var.reset(self._token)
+        self._token = None
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            summary = io.StringIO()
+            stats = pstats.Stats(self._profiler, stream=summary)
+            for profiler in self._thread_profiles:
+                stats.add(profiler)
+            stats.dump_stats(os.path.join(self.output_dir, "profile.prof"))
+            stats.sort_stats("cumulative").print_stats(60)
+            with open(os.path.join(self.output_dir, "profile.txt"), "w", encoding="utf-8") as f:
+                f.write(summary.getvalue())
+            return ["profile.prof", "profile.txt"]
+
+        self._sampler.stop()
+        with open(os.path.join(self.output_dir, "stacks.collapsed"), "w", encoding="utf-8") as f:
+            for stack, count in self._sampler.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return ["stacks.collapsed"]
+
+
+@contextmanager
+def profile_thread() -> Iterator[None]:
+    """cProfile the current worker thread when the calling request is being cProfiled.
+
+    cProfile only sees the thread it is enabled in, so pool workers profile
+    themselves and merge into the request's session. A no-op otherwise.
+    """
+    session = profile_session_var.get()
+    if session is None or session.mode != "cprofile":
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        session.add_thread_profile(profiler)
@@ -0,0 +1,82 @@
+import json
+import os
+from typing import Any, Tuple
+
+# Token budget for the APPLICATION DATA block of the codegen prompt
+APPLICATION_DATA_TOKEN_BUDGET = int(os.getenv("PROMPT_APPLICATION_DATA_TOKEN_BUDGET", "24000"))
+# Strings are never trimmed below this many characters, even if the budget is still exceeded
+MIN_FIELD_CHARS = int(os.getenv("PROMPT_MIN_FIELD_CHARS", "120"))
+# Exact counts cost a count_tokens round trip per call; the estimate is free
+COUNT_TOKENS_WITH_API = os.getenv("PROMPT_COUNT_TOKENS_WITH_API", "0") == "1"
+
+TRIM_MARKER = "..."
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate Gemini token count (about four characters per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+
+def count_tokens(model, text: str) -> int:
+    """Token count for `text`: exact via the API when enabled, otherwise the local estimate."""
+    if COUNT_TOKENS_WITH_API:
+        return model.count_tokens(text).total_tokens
+    return estimate_tokens(text)
+
+
+def prune_empty(value: Any) -> Any:
+    """Drop null, empty-string and empty-collection members; they carry no information for the model."""
+    if isinstance(value, dict):
+        pruned = {key: prune_empty(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        return [item for item in (prune_empty(v) for v in value) if item not in (None, "", [], {})]
+    return value
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _trim_strings(value: Any, limit: int) -> Tuple[Any, int]:
+    if isinstance(value, str):
+        if len(value) > limit:
+            return value[:limit] + TRIM_MARKER, 1
+        return value, 0
+    if isinstance(value, dict):
+        trimmed, count = {}, 0
+        for key, item in value.items():
+            trimmed[key], n = _trim_strings(item, limit)
+            count += n
+        return trimmed, count
+    if isinstance(value, list):
+        trimmed, count = [], 0
+        for item in value:
+            new_item, n = _trim_strings(item, limit)
+            trimmed.append(new_item)
+            count += n
+        return trimmed, count
+    return value, 0
+
+
+def fit_to_budget(data: Any, max_tokens: int = APPLICATION_DATA_TOKEN_BUDGET,
+                  min_field_chars: int = MIN_FIELD_CHARS) -> Tuple[str, int]:
+    """Compact JSON for `data`, trimming its longest strings until it fits `max_tokens`.
+
+    The per-string limit starts at the longest string and is halved until the
+    estimate fits or reaches `min_field_chars`. Returns (json_text, trimmed_field_count).
+    """
+    data = prune_empty(data)
+    text = compact_json(data)
+    if estimate_tokens(text) <= max_tokens:
+        return text, 0
+
+    limit = max(len(text) // 2, min_field_chars)
+    trimmed_count = 0
+    while estimate_tokens(text) > max_tokens and limit >= min_field_chars:
+        trimmed, trimmed_count = _trim_strings(data, limit)
+        text = compact_json(trimmed)
+        if limit == min_field_chars:
+            break
+        limit = max(limit // 2, min_field_chars)
+    return text, trimmed_count
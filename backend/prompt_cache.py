@@ -0,0 +1,156 @@
+import datetime
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from metrics import CACHE_HITS, FAILURES
+from prompt_budget import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1") == "1"
+# Context caching needs an explicitly versioned model
+PROMPT_CACHE_MODEL = os.getenv("PROMPT_CACHE_MODEL", "models/gemini-2.0-flash-001")
+PROMPT_CACHE_TTL_SECONDS = int(os.getenv("PROMPT_CACHE_TTL_SECONDS", "3600"))
+# Gemini rejects caches below a per-model minimum size; shorter prefixes are sent inline
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "4096"))
+
+
+def _base_model(name: str) -> str:
+    """models/gemini-2.0-flash-001 -> gemini-2.0-flash"""
+    return re.sub(r"-\d{3}$", "", name.split("/")[-1])
+
+
+# A cache this close to expiry is extended rather than used as is
+REFRESH_MARGIN_SECONDS = 120
+# After a failed create/extend, prefixes are sent inline for this long before trying again
+FAILURE_BACKOFF_SECONDS = 300
+
+
+class _CachedPrefix:
+    def __init__(self, cache, ttl_seconds: int):
+        self.cache = cache
+        self.expires_at = time.time() + ttl_seconds
+        self.uses = 0
+
+
+class PromptCache:
+    """Keeps a static prompt prefix in Gemini's context cache and reuses it across runs.
+
+    Entries are keyed by a hash of the model and prefix, so changing the
+    instructions creates a new cache. Entries are extended when close to expiry
+    and dropped if the provider no longer has them. When caching is disabled, or
+    the prefix is below the provider's minimum size, `generate` sends
+    prefix + suffix inline with the fallback model.
+    """
+
+    def __init__(self, model_name: str = PROMPT_CACHE_MODEL, ttl_seconds: int = PROMPT_CACHE_TTL_SECONDS,
+                 min_tokens: int = PROMPT_CACHE_MIN_TOKENS, enabled: bool = PROMPT_CACHE_ENABLED):
+        self.model_name = model_name
+        self.ttl_seconds = ttl_seconds
+        self.min_tokens = min_tokens
+        self.enabled = enabled
+        self._entries: Dict[str, _CachedPrefix] = {}
+        self._retry_at = 0.0
+        # Prefixes whose cache is being created or extended, set once that is done
+        self._inflight: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, prefix: str) -> str:
+        return hashlib.sha256(f"{model_name}\0{prefix}".encode("utf-8")).hexdigest()
+
+    def cacheable(self, prefix: str, model_name: Optional[str] = None) -> bool:
+        """Whether `prefix` can be cached for calls routed to `model_name` (caches are bound to one model)."""
+        if model_name and _base_model(model_name) != _base_model(self.model_name):
+            return False
+        return self.enabled and estimate_tokens(prefix) >= self.min_tokens
+
+    def _use(self, entry: _CachedPrefix) -> _CachedPrefix:
+        """Count a use of a live entry; called with the lock held."""
+        if entry.uses:
+            CACHE_HITS.labels(cache="prompt_prefix").inc()
+        entry.uses += 1
+        return entry
+
+    def _cached_prefix(self, prefix: str) -> Optional[_CachedPrefix]:
+        """Live cache for `prefix`, creating or extending it as needed; None if it can't be cached.
+
+        The create/extend calls go to the network, so they run outside the lock: one
+        caller per prefix does the work while the others keep using the entry if it
+        is still live, or wait for the result.
+        """
+        key = self._key(self.model_name, prefix)
+        while True:
+            with self._lock:
+                now = time.time()
+                if now < self._retry_at:
+                    return None
+                entry = self._entries.get(key)
+                if entry is not None and entry.expires_at - now >= REFRESH_MARGIN_SECONDS:
+                    return self._use(entry)
+                pending = self._inflight.get(key)
+                if pending is None:
+                    pending = self._inflight[key] = threading.Event()
+                    break
+                if entry is not None and entry.expires_at > now:
+                    return self._use(entry)
+            pending.wait()
+
+        try:
+            if entry is None or entry.expires_at <= now:
+                cache = genai.caching.CachedContent.create(
+                    model=self.model_name,
+                    display_name=f"brdynamo-{key[:12]}",
+                    contents=[prefix],
+                    ttl=datetime.timedelta(seconds=self.ttl_seconds),
+                )
+                entry = _CachedPrefix(cache, self.ttl_seconds)
+                logger.info("Created prompt prefix cache",
+                            extra={"cache": cache.name, "ttl_seconds": self.ttl_seconds})
+            else:
+                entry.cache.update(ttl=datetime.timedelta(seconds=self.ttl_seconds))
+        except Exception as e:
+            FAILURES.labels(stage="prompt_cache").inc()
+            logger.warning("Prompt prefix cache unavailable, sending the prefix inline", extra={"error": str(e)})
+            with self._lock:
+                self._entries.pop(key, None)
+                self._retry_at = time.time() + FAILURE_BACKOFF_SECONDS
+                del self._inflight[key]
+            pending.set()
+            return None
+
+        with self._lock:
+            entry.expires_at = now + self.ttl_seconds
+            self._entries[key] = entry
+            del self._inflight[key]
+            pending.set()
+            return self._use(entry)
+
+    def invalidate(self, prefix: str) -> None:
+        with self._lock:
+            self._entries.pop(self._key(self.model_name, prefix), None)
+
+    def generate(self, fallback_model, prefix: str, suffix: str, model_name: Optional[str] = None) -> Tuple[object, bool]:
+        """Generate from prefix + suffix, serving the prefix from the cache when possible.
+
+        `model_name` is the model the call was routed to; the cache is only used if it
+        matches the cache's model. Returns (response, used_cache).
+        """
+        entry = self._cached_prefix(prefix) if self.cacheable(prefix, model_name) else None
+        if entry is not None:
+            try:
+                model = genai.GenerativeModel.from_cached_content(cached_content=entry.cache)
+                return model.generate_content(suffix), True
+            except google_exceptions.NotFound:
+                # Expired or deleted on the provider side before our TTL said so
+                logger.warning("Prompt prefix cache was evicted, sending the prefix inline")
+                self.invalidate(prefix)
+        return fallback_model.generate_content(prefix + suffix), False
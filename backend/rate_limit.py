@@ -0,0 +1,52 @@
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from metrics import LLM_RATE_LIMIT_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Gemini requests per minute across the whole process (uploads, batches and hedges); 0 disables the limit
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+# Requests that may go out back to back before the per-minute pacing applies
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+
+
+class RateLimiter:
+    """Token bucket shared by every caller; `acquire` blocks until a request may be sent."""
+
+    def __init__(self, per_minute: float = LLM_REQUESTS_PER_MINUTE, burst: int = LLM_BURST):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _reserve(self) -> float:
+        """Take a token, returning how long the caller must wait for it (the bucket may go negative)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, call: Optional[str] = None) -> float:
+        """Wait for a request slot; returns the seconds waited."""
+        if not self.enabled:
+            return 0.0
+        wait = self._reserve()
+        if wait > 0:
+            logger.debug("Waiting for LLM rate limit", extra={"call": call, "wait_s": round(wait, 3)})
+            time.sleep(wait)
+        LLM_RATE_LIMIT_WAIT_SECONDS.labels(call=call or "unknown").observe(wait)
+        return wait
+
+
+llm_rate_limiter = RateLimiter()
@@ -0,0 +1,251 @@
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from artifact_store import ArtifactStore
+from codegenerator_agent import CodeGeneratorAgent
+from metrics import RETENTION_EVICTIONS, RETENTION_RECLAIMED_BYTES
+
+logger = logging.getLogger(__name__)
+
+# 0 turns a policy off; with all three off the sweeper doesn't start
+RETENTION_MAX_AGE_DAYS = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+RETENTION_MAX_RUNS = int(os.getenv("RETENTION_MAX_RUNS", "0"))
+# Disk quota over the artifact store and the working folders together
+RETENTION_MAX_BYTES = int(os.getenv("RETENTION_MAX_BYTES", "0"))
+RETENTION_SWEEP_INTERVAL_SECONDS = float(os.getenv("RETENTION_SWEEP_INTERVAL_SECONDS", "3600"))
+# Working-folder entries changed more recently than this may belong to a run in progress
+RETENTION_GRACE_SECONDS = float(os.getenv("RETENTION_GRACE_SECONDS", "3600"))
+
+STORE_AREA = "store"
+
+
+class RetentionPolicy(NamedTuple):
+    max_age_seconds: float = RETENTION_MAX_AGE_DAYS * 86400
+    max_runs: int = RETENTION_MAX_RUNS
+    max_bytes: int = RETENTION_MAX_BYTES
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_age_seconds or self.max_runs or self.max_bytes)
+
+
+class _Entry(NamedTuple):
+    """A top-level file or folder of a working folder, or a saved version of generated code.
+
+    `last_used` is the newest mtime in its tree. A pinned entry (the version `current`
+    points to) counts towards the quota but is never evicted.
+    """
+    area: str
+    path: str
+    size: int
+    last_used: float
+    pinned: bool = False
+
+
+def _unseen_size(file_stat: os.stat_result, seen: Set[Tuple[int, int]]) -> int:
+    """File size, or 0 for a hard link to a file already counted in this scan."""
+    key = (file_stat.st_dev, file_stat.st_ino)
+    if key in seen:
+        return 0
+    seen.add(key)
+    return file_stat.st_size
+
+
+def _scan_entry(area: str, path: str, seen: Set[Tuple[int, int]], pinned: bool = False) -> Optional[_Entry]:
+    """Size and newest mtime of a file or folder tree, without following symlinks.
+
+    Saved versions hard-link their unchanged files, so a file is counted in the first
+    entry scanned that holds it; later entries only count what evicting them frees.
+    """
+    try:
+        top = os.lstat(path)
+    except FileNotFoundError:
+        return None
+    if not stat.S_ISDIR(top.st_mode):
+        return _Entry(area, path, _unseen_size(top, seen), top.st_mtime, pinned)
+    size, last_used = 0, top.st_mtime
+    for root, dirs, names in os.walk(path):
+        for name in dirs + names:
+            try:
+                child = os.lstat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            last_used = max(last_used, child.st_mtime)
+            if stat.S_ISREG(child.st_mode):
+                size += _unseen_size(child, seen)
+    return _Entry(area, path, size, last_used, pinned)
+
+
+def _scan_versions(area: str, folder: str, seen: Set[Tuple[int, int]]) -> List[_Entry]:
+    """Saved versions under folder/.versions, the current one first and pinned, then newest first."""
+    versions_root = os.path.join(folder, CodeGeneratorAgent.VERSIONS_DIR)
+    current = CodeGeneratorAgent.current_version(folder)
+    try:
+        names = sorted(os.listdir(versions_root), reverse=True)
+    except FileNotFoundError:
+        return []
+    names.sort(key=lambda name: name != current)
+    entries = [_scan_entry(area, os.path.join(versions_root, name), seen, pinned=name == current) for name in names]
+    return [entry for entry in entries if entry is not None]
+
+
+class RetentionSweeper:
+    """Applies a RetentionPolicy to the artifact store and the working folders.
+
+    Store runs are evicted by creation time for max age and max runs and by
+    last read for the disk quota; their blobs go once no remaining run
+    references them. Each top-level entry of a working folder (an upload, a
+    parsed JSON, a project folder, a batch, a profile) is handled the same way,
+    by its newest mtime, with max runs applying per folder. Saved versions of
+    generated code (folder/.versions/<version>) are entries of their own; the
+    `current` link and the version it points to are never evicted. The newest
+    completed upload run, which the read endpoints serve, is never evicted, nor
+    are working-folder entries changed within the grace period or other hidden
+    ones (staging folders). Symlinks are never followed.
+    """
+
+    def __init__(self, store: ArtifactStore, folders: Dict[str, str], policy: Optional[RetentionPolicy] = None,
+                 interval: float = RETENTION_SWEEP_INTERVAL_SECONDS, grace: float = RETENTION_GRACE_SECONDS):
+        self.store = store
+        self.folders = folders
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.grace = grace
+        self._sweep_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> bool:
+        """Sweep every `interval` seconds in a daemon thread; returns False if no policy is set."""
+        if not self.policy.enabled or self.interval <= 0 or self._thread is not None:
+            return False
+        self._thread = threading.Thread(target=self._loop, name="retention-sweeper", daemon=True)
+        self._thread.start()
+        logger.info("Retention sweeper started", extra={"policy": self.policy._asdict(), "interval": self.interval})
+        return True
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def _loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Retention sweep failed")
+
+    def sweep(self, now: Optional[float] = None) -> Dict:
+        """Run every enabled policy once and return what was evicted and reclaimed, by area."""
+        with self._sweep_lock:
+            now = now or time.time()
+            self._stats = {"evicted": defaultdict(int), "reclaimed_bytes": defaultdict(int)}
+            protected = self.store.latest_run_id()
+            runs = [run for run in self.store.list_runs_by_access() if run["run_id"] != protected]
+            entries = self._scan_folders()
+            evictable = [entry for entry in entries if not entry.pinned and entry.last_used < now - self.grace]
+            policy = self.policy
+
+            if policy.max_age_seconds:
+                cutoff = now - policy.max_age_seconds
+                runs, expired = self._split(runs, lambda run: run["created_at"] < cutoff)
+                self._evict_runs(expired, "age")
+                evictable, expired = self._split(evictable, lambda entry: entry.last_used < cutoff)
+                self._evict_entries(expired, "age")
+
+            if policy.max_runs:
+                runs.sort(key=lambda run: run["created_at"], reverse=True)
+                keep = max(0, policy.max_runs - (1 if protected else 0))
+                self._evict_runs(runs[keep:], "count")
+                runs = runs[:keep]
+                for area in self.folders:
+                    present = [entry for entry in entries if entry.area == area and os.path.lexists(entry.path)]
+                    excess = len(present) - policy.max_runs
+                    oldest = sorted((entry for entry in evictable if entry.area == area), key=lambda e: e.last_used)
+                    self._evict_entries(oldest[:max(0, excess)], "count")
+                evictable = [entry for entry in evictable if os.path.lexists(entry.path)]
+
+            if policy.max_bytes:
+                self._enforce_quota(runs, entries, evictable)
+
+            stray = self.store.remove_stray_blobs(now - self.grace)
+            if stray:
+                self._record(STORE_AREA, "orphan", 0, stray)
+
+            stats = {key: dict(value) for key, value in self._stats.items()}
+            stats["storage_bytes"] = self.store.storage_bytes() + sum(
+                entry.size for entry in entries if os.path.lexists(entry.path))
+            if stats["evicted"] or stats["reclaimed_bytes"]:
+                logger.info("Retention sweep finished", extra=stats)
+            return stats
+
+    def _enforce_quota(self, runs: List[Dict], entries: List[_Entry], evictable: List[_Entry]) -> None:
+        """Evict runs and working-folder entries, least recently used first, until under max_bytes."""
+        total = self.store.storage_bytes() + sum(entry.size for entry in entries if os.path.lexists(entry.path))
+        candidates = [(run["accessed_at"], run, None) for run in runs]
+        candidates += [(entry.last_used, None, entry) for entry in evictable]
+        candidates.sort(key=lambda candidate: candidate[0])
+        for _, run, entry in candidates:
+            if total <= self.policy.max_bytes:
+                break
+            total -= self._evict_runs([run], "quota") if run else self._evict_entries([entry], "quota")
+        if total > self.policy.max_bytes:
+            logger.warning("Storage still over quota after eviction",
+                           extra={"storage_bytes": total, "max_bytes": self.policy.max_bytes})
+
+    def _scan_folders(self) -> List[_Entry]:
+        entries: List[_Entry] = []
+        seen: Set[Tuple[int, int]] = set()
+        for area, folder in self.folders.items():
+            try:
+                names = os.listdir(folder)
+            except FileNotFoundError:
+                continue
+            if CodeGeneratorAgent.VERSIONS_DIR in names:
+                entries += _scan_versions(area, folder, seen)
+            for name in names:
+                path = os.path.join(folder, name)
+                if not name.startswith(".") and not os.path.islink(path):
+                    entry = _scan_entry(area, path, seen)
+                    if entry is not None:
+                        entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _split(items: List, evict) -> tuple:
+        return [item for item in items if not evict(item)], [item for item in items if evict(item)]
+
+    def _evict_runs(self, runs: List[Dict], policy: str) -> int:
+        if not runs:
+            return 0
+        freed = self.store.delete_runs([run["run_id"] for run in runs])
+        self._record(STORE_AREA, policy, len(runs), freed)
+        return freed
+
+    def _evict_entries(self, entries: List[_Entry], policy: str) -> int:
+        freed = 0
+        for entry in entries:
+            try:
+                if os.path.isdir(entry.path) and not os.path.islink(entry.path):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logger.warning("Could not remove expired entry", extra={"path": entry.path, "error": str(e)})
+                continue
+            freed += entry.size
+            self._record(entry.area, policy, 1, entry.size)
+        return freed
+
+    def _record(self, area: str, policy: str, count: int, freed: int) -> None:
+        RETENTION_EVICTIONS.labels(area=area, policy=policy).inc(count)
+        RETENTION_RECLAIMED_BYTES.labels(area=area, policy=policy).inc(freed)
+        self._stats["evicted"][area] += count
+        self._stats["reclaimed_bytes"][area] += freed
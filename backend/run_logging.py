@@ -0,0 +1,117 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple
+
+# Per-request context; Pipeline copies it into its worker threads
+run_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("run_id", default="-")
+debug_run_var: contextvars.ContextVar[bool] = contextvars.ContextVar("debug_run", default=False)
+
+# Payload previews longer than this are cut unless the run has debug logging enabled
+PAYLOAD_PREVIEW_CHARS = int(os.getenv("LOG_PAYLOAD_PREVIEW_CHARS", "500"))
+# Fraction of DEBUG records kept (when LOG_LEVEL=DEBUG) for runs without the debug flag
+DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))
+
+# Loggers of this app (one per backend module, as getLogger(__name__)); only these log
+# below LOG_LEVEL for debug-flagged runs, library loggers (urllib3, google, werkzeug) never do
+APP_LOGGERS = frozenset(
+    [os.path.splitext(name)[0] for name in os.listdir(os.path.dirname(os.path.abspath(__file__)))
+     if name.endswith(".py")] + ["__main__"])
+
+# Attributes every LogRecord has; anything else came in through `extra=` and is emitted as a field
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, run_id, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "run_id": run_id_var.get(),
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RunLevelFilter(logging.Filter):
+    """Level gate that debug-flagged runs bypass for app loggers; DEBUG records of other runs are sampled."""
+
+    def __init__(self, level: int, debug_sample_rate: float):
+        super().__init__()
+        self.level = level
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if debug_run_var.get() and record.name in APP_LOGGERS:
+            return True
+        if record.levelno < self.level:
+            return False
+        return record.levelno > logging.DEBUG or random.random() < self.debug_sample_rate
+
+
+def configure_logging() -> None:
+    """Send the root logger to stderr as JSON lines, gated at LOG_LEVEL (default INFO).
+
+    The root logger, and with it every library logger, is set to LOG_LEVEL. Only
+    the app loggers are at DEBUG so a debug-flagged run can log everything of its
+    own; for them the level gate and sampling happen in the handler's filter.
+    """
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(RunLevelFilter(level, DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    for name in APP_LOGGERS:
+        logging.getLogger(name).setLevel(logging.DEBUG)
+
+
+def preview(text: Optional[str], limit: int = PAYLOAD_PREVIEW_CHARS) -> str:
+    """The payload itself for debug runs, otherwise its first `limit` characters."""
+    if text is None:
+        return ""
+    if debug_run_var.get() or len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} more chars]"
+
+
+def log_payload(logger: logging.Logger, label: str, text: Optional[str]) -> None:
+    """Log a large payload at DEBUG: in full for debug runs, as a truncated preview otherwise."""
+    logger.debug(label, extra={"chars": len(text or ""), "payload": preview(text)})
+
+
+def begin_run(debug: bool = False, run_id: Optional[str] = None) -> Tuple[contextvars.Token, contextvars.Token]:
+    """Set the run id and debug flag for the current context; pass the result to end_run."""
+    return run_id_var.set(run_id or uuid.uuid4().hex[:12]), debug_run_var.set(debug)
+
+
+def end_run(tokens: Tuple[contextvars.Token, contextvars.Token]) -> None:
+    run_token, debug_token = tokens
+    run_id_var.reset(run_token)
+    debug_run_var.reset(debug_token)
+
+
+@contextmanager
+def run_context(debug: bool = False, run_id: Optional[str] = None) -> Iterator[str]:
+    """Tag every log record in the block with a run id and the run's debug flag."""
+    tokens = begin_run(debug, run_id)
+    try:
+        yield run_id_var.get()
+    finally:
+        end_run(tokens)
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def offline_main():
+    """The Flask app module with fake Gemini/Kroki and every data folder in a temp dir.
+
+    Call it with a FakeGemini (or subclass) to script the model's answers.
+    """
+    from benchmarks.fakes import FakeGemini, offline_app
+
+    stack = []
+
+    def start(gemini=None):
+        context = offline_app(gemini or FakeGemini())
+        stack.append(context)
+        return context.__enter__()
+
+    yield start
+    for context in reversed(stack):
+        context.__exit__(None, None, None)
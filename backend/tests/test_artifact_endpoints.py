@@ -0,0 +1,113 @@
+import gzip
+import io
+import zipfile
+
+import pytest
+
+README = "# Shop\n\n" + "Run ./gradlew bootRun to start the service.\n" * 40
+
+
+@pytest.fixture
+def main(offline_main):
+    main = offline_main()
+    main.artifact_store.record_run("r1", {"generated": {"shop/README.md": README, "shop/logo.png": b"\x89PNG"}})
+    return main
+
+
+@pytest.fixture
+def client(main):
+    return main.app.test_client()
+
+
+def test_gzip_stored_file_is_sent_as_stored_to_gzip_clients(client):
+    response = client.get("/generated-files/shop/README.md", headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert gzip.decompress(response.data).decode("utf-8") == README
+
+
+def test_gzip_stored_file_is_decompressed_for_other_clients(client):
+    plain = client.get("/generated-files/shop/README.md", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/generated-files/shop/README.md", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert "Accept-Encoding" in plain.headers["Vary"]
+    assert plain.get_data(as_text=True) == README
+    # The two representations differ, so they must not share a validator
+    assert plain.headers["ETag"] != gzipped.headers["ETag"]
+
+
+def test_identity_stored_file_has_no_vary(client):
+    response = client.get("/generated-files/shop/logo.png", headers={"Accept-Encoding": "gzip"})
+
+    assert response.data == b"\x89PNG"
+    assert "Content-Encoding" not in response.headers
+    assert "Vary" not in response.headers
+
+
+@pytest.mark.parametrize("accept_encoding", ["gzip", "identity"])
+def test_matching_etag_is_not_modified(client, accept_encoding):
+    url = "/generated-files/shop/README.md?run_id=r1"
+    etag = client.get(url, headers={"Accept-Encoding": accept_encoding}).headers["ETag"]
+
+    response = client.get(url, headers={"Accept-Encoding": accept_encoding, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_runs_are_listed_and_filtered(main, client):
+    main.artifact_store.record_run("b1", {"generated": {"shop/pom.xml": "<project/>"}}, source="batch", batch_id="x")
+
+    listed = client.get("/runs").get_json()
+    batch = client.get("/runs?source=batch").get_json()
+
+    assert {run["run_id"] for run in listed["runs"]} == {"r1", "b1"}
+    assert listed["next_cursor"] is None
+    assert [run["run_id"] for run in batch["runs"]] == ["b1"]
+    assert client.get("/runs/b1").get_json()["batch_id"] == "x"
+    assert client.get("/runs/missing").status_code == 404
+
+
+@pytest.mark.parametrize("query", ["limit=many", "cursor=not-a-cursor", "created_after=yesterday"])
+def test_malformed_run_query_is_a_bad_request(client, query):
+    response = client.get(f"/runs?{query}")
+
+    assert response.status_code == 400
+    assert "error" in response.get_json()
+
+
+def test_read_endpoints_default_to_the_latest_upload(main, client):
+    main.artifact_store.record_run("r2", {"generated": {"shop/README.md": "# Shop v2"}})
+
+    assert client.get("/generated-files").get_json() == {"shop/README.md": "# Shop v2"}
+    assert client.get("/generated-files?run_id=r1").get_json()["shop/README.md"] == README
+    assert client.get("/generated-files/shop/logo.png").status_code == 404
+    assert client.get("/generated-code/status").get_json() == {"ready": True}
+
+
+def test_unknown_run_id_is_not_found(client):
+    for url in ("/generated-files", "/generated-files/shop/README.md", "/generated-code", "/generated-code/status"):
+        response = client.get(f"{url}?run_id=missing")
+        assert response.status_code == 404, url
+        assert "missing" in response.get_json()["error"]
+
+
+def test_generated_code_zips_the_project_folder(client):
+    response = client.get("/generated-code?run_id=r1")
+
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert sorted(archive.namelist()) == ["shop/README.md", "shop/logo.png"]
+        assert archive.read("shop/README.md").decode("utf-8") == README
+
+
+def test_no_runs_yet(offline_main):
+    client = offline_main().app.test_client()
+
+    assert client.get("/generated-files").get_json() == {}
+    assert client.get("/generated-code/status").get_json() == {"ready": False}
+    assert client.get("/generated-code").status_code == 404
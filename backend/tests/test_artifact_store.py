@@ -0,0 +1,108 @@
+import base64
+import json
+import os
+
+import pytest
+
+import artifact_store
+from artifact_store import ArtifactStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+def test_shared_blob_evicted_while_recording(store, monkeypatch):
+    shared = "shared content " * 40
+    store.record_run("old", {"generated": {"p/a.txt": shared}})
+
+    lookup = store._known_blobs
+    calls = []
+
+    def evict_after_first_lookup(digests):
+        known = lookup(digests)
+        calls.append(len(known))
+        if len(calls) == 1:
+            # The sweeper evicts the blob's only run between the lookup and the transaction
+            store.delete_runs(["old"])
+        return known
+
+    monkeypatch.setattr(store, "_known_blobs", evict_after_first_lookup)
+    store.record_run("new", {"generated": {"p/a.txt": shared}})
+
+    assert calls[0] == 1
+    assert store.read_file("new", "p/a.txt") == shared.encode("utf-8")
+    [stored] = store.list_files("new")
+    assert os.path.exists(store._blob_path(stored.sha256))
+
+
+def _record_runs(store, monkeypatch, stamps):
+    """Record one run per (run_id, created_at, columns) with a pinned clock."""
+    for run_id, created_at, columns in stamps:
+        with monkeypatch.context() as patch:
+            patch.setattr(artifact_store.time, "time", lambda: created_at)
+            store.record_run(run_id, {"generated": {"a.txt": run_id}}, **columns)
+
+
+def _all_pages(store, **kwargs):
+    pages, cursor = [], None
+    while True:
+        runs, cursor = store.list_runs(cursor=cursor, **kwargs)
+        pages.append([run["run_id"] for run in runs])
+        if cursor is None:
+            return pages
+
+
+def test_list_runs_pages_break_ties_on_run_id(store, monkeypatch):
+    _record_runs(store, monkeypatch, [
+        ("r1", 100.0, {}), ("r2", 200.0, {}), ("r3", 200.0, {}), ("r4", 200.0, {}), ("r5", 300.0, {}),
+    ])
+
+    # The page boundary falls between runs sharing a created_at
+    assert _all_pages(store, limit=2) == [["r5", "r4"], ["r3", "r2"], ["r1"]]
+    assert _all_pages(store, limit=5) == [["r5", "r4", "r3", "r2", "r1"]]
+
+
+def test_list_runs_cursor_round_trips(store, monkeypatch):
+    _record_runs(store, monkeypatch, [("r1", 100.0, {}), ("r2", 200.0, {})])
+
+    _, cursor = store.list_runs(limit=1)
+
+    assert json.loads(base64.urlsafe_b64decode(cursor)) == [200.0, "r2"]
+    runs, next_cursor = store.list_runs(limit=1, cursor=cursor)
+    assert [run["run_id"] for run in runs] == ["r1"]
+    assert next_cursor is None
+
+
+def test_list_runs_combines_filters_and_window(store, monkeypatch):
+    _record_runs(store, monkeypatch, [
+        ("a1", 100.0, {"source": "upload", "status": "completed"}),
+        ("a2", 200.0, {"source": "upload", "status": "failed"}),
+        ("a3", 300.0, {"source": "upload", "status": "completed"}),
+        ("b1", 300.0, {"source": "batch", "status": "completed"}),
+        ("a4", 400.0, {"source": "upload", "status": "completed"}),
+    ])
+
+    def ids(**kwargs):
+        return [run["run_id"] for run in store.list_runs(**kwargs)[0]]
+
+    assert ids(source="upload", status="completed") == ["a4", "a3", "a1"]
+    assert ids(source="upload", status="completed", created_after=100.0, created_before=400.0) == ["a3", "a1"]
+    assert ids(status="completed", created_after=300.0) == ["a4", "b1", "a3"]
+    assert ids(source=None, status="failed") == ["a2"]
+    assert _all_pages(store, limit=1, source="upload", status="completed") == [["a4"], ["a3"], ["a1"]]
+    with pytest.raises(ValueError, match="Unknown run filters"):
+        store.list_runs(filename="brd.pdf")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"not json").decode("ascii"),
+    base64.urlsafe_b64encode(b"[1, 2, 3]").decode("ascii"),
+    base64.urlsafe_b64encode(b"42").decode("ascii"),
+    "café",
+])
+def test_list_runs_rejects_malformed_cursor(store, cursor):
+    with pytest.raises(ValueError, match="Malformed cursor"):
+        store.list_runs(cursor=cursor)
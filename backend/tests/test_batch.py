@@ -0,0 +1,95 @@
+import io
+import json
+import os
+import threading
+import time
+import zipfile
+
+import pytest
+
+import batch
+from batch import MANIFEST_NAME, BatchError, BatchRunner, expand_uploads
+
+
+def _wait_finished(runner, batch_id):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        status = runner.status(batch_id)
+        if status["status"] not in ("queued", "running"):
+            return status
+        time.sleep(0.01)
+    raise AssertionError("batch did not finish")
+
+
+def test_identical_documents_run_once_and_paths_stay_relative(tmp_path):
+    calls = []
+    lock = threading.Lock()
+
+    def process(input_path, output_dir, parsed_dir, batch_id=None):
+        with lock:
+            calls.append((input_path, output_dir, parsed_dir))
+        return {"generated_files": {"shop/pom.xml": "<project/>"}}
+
+    runner = BatchRunner(str(tmp_path), process)
+    queued = runner.submit([("a.txt", b"same"), ("b.txt", b"other"), ("copy.txt", b"same")])
+    status = _wait_finished(runner, queued["batch_id"])
+
+    assert status["status"] == "completed"
+    assert len(calls) == 2
+    root = os.path.join(str(tmp_path), queued["batch_id"])
+    assert sorted(call[0] for call in calls) == [os.path.join(root, "000-a", "a.txt"), os.path.join(root, "001-b", "b.txt")]
+    assert all(os.path.isfile(call[0]) for call in calls)
+
+    first, _, duplicate = status["documents"]
+    assert duplicate["duplicate_of"] == 0
+    assert duplicate["output_dir"] == first["output_dir"] == "000-a/code"
+    assert first["input_path"] == "000-a/a.txt"
+    # Nothing in the status, served by GET /batches/<id>, reveals the data folder
+    assert str(tmp_path) not in json.dumps(status)
+    with open(os.path.join(root, MANIFEST_NAME), encoding="utf-8") as f:
+        assert json.load(f) == status
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def test_expand_uploads_flattens_archives_and_skips_extras():
+    archive = _zip({
+        "brds/": b"",
+        "brds/shop.docx": b"docx",
+        "brds/nested/notes.TXT": b"notes",
+        "brds/.hidden.txt": b"hidden",
+        "__MACOSX/brds/._shop.docx": b"resource fork",
+        "brds/diagram.png": b"png",
+    })
+
+    documents = expand_uploads([("single.pdf", b"pdf"), ("bundle.zip", archive)])
+
+    assert documents == [("single.pdf", b"pdf"), ("shop.docx", b"docx"), ("notes.TXT", b"notes")]
+
+
+@pytest.mark.parametrize("uploads, message", [
+    ([("bundle.zip", b"not a zip")], "not a valid zip archive"),
+    ([("brd.md", b"# BRD")], "Unsupported file type"),
+    ([("bundle.zip", _zip({"diagram.png": b"png", ".DS_Store": b""}))], "No .txt, .docx or .pdf documents"),
+])
+def test_expand_uploads_rejects_unusable_uploads(uploads, message):
+    with pytest.raises(BatchError, match=message):
+        expand_uploads(uploads)
+
+
+def test_expand_uploads_enforces_the_batch_limits(monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_DOCUMENTS", 2)
+    with pytest.raises(BatchError, match="at most 2 documents"):
+        expand_uploads([("a.txt", b"a"), ("bundle.zip", _zip({"b.txt": b"b", "c.txt": b"c"}))])
+
+    monkeypatch.setattr(batch, "BATCH_MAX_BYTES", 10)
+    with pytest.raises(BatchError, match="at most 10 bytes"):
+        expand_uploads([("bundle.zip", _zip({"big.txt": b"x" * 11}))])
+    with pytest.raises(BatchError, match="at most 10 bytes"):
+        expand_uploads([("a.txt", b"x" * 6), ("b.txt", b"x" * 5)])
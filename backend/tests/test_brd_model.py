@@ -0,0 +1,84 @@
+import pytest
+
+from brd_model import BrdModel, Entity, java_class_name, java_field_name, java_type
+
+
+@pytest.mark.parametrize("attr_type, expected", [
+    ("uuid", "UUID"),
+    ("VARCHAR(50)", "String"),
+    ("Decimal(10,2)", "BigDecimal"),
+    ("bigint", "Long"),
+    ("timestamp", "LocalDateTime"),
+    ("date", "LocalDate"),
+    ("bool", "Boolean"),
+    ("", "String"),
+    ("geometry", "String"),
+])
+def test_java_type(attr_type, expected):
+    assert java_type(attr_type) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("created_at", "createdAt"),
+    ("Unit Price", "unitPrice"),
+    ("ID", "id"),
+    ("URLPath", "urlPath"),
+    ("class", "classValue"),
+    ("2fa", "f2fa"),
+    ("", "field"),
+])
+def test_java_field_name(name, expected):
+    assert java_field_name(name) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("order item", "OrderItem"),
+    ("OrderItem", "OrderItem"),
+    ("3d model", "E3dModel"),
+    ("", "Entity"),
+])
+def test_java_class_name(name, expected):
+    assert java_class_name(name) == expected
+
+
+def test_entity_names_and_primary_key_come_from_the_attributes():
+    entity = Entity.from_parsed({"name": "order item", "attributes": [
+        {"name": "Order Number", "type": "long", "constraints": ["Primary Key"]},
+        {"name": "unit_price", "type": "decimal", "nullable": False},
+        {"name": "placed_on", "type": "date", "constraints": ["NOT NULL", "unique"]},
+    ]})
+
+    assert (entity.class_name, entity.table_name, entity.resource_path) == ("OrderItem", "order_items", "order-items")
+    assert entity.id_attribute.java_name == "orderNumber"
+    assert entity.id_java_type == "Long"
+    assert entity.java_imports == ["java.math.BigDecimal", "java.time.LocalDate"]
+    price, placed_on = entity.attributes[1:]
+    assert (price.java_name, price.column_name, price.is_required, price.java_accessor) == (
+        "unitPrice", "unit_price", True, "UnitPrice")
+    assert placed_on.is_required and placed_on.is_unique
+
+
+def test_entity_without_a_key_gets_a_generated_uuid():
+    entity = Entity.from_parsed({"name": "Note", "attributes": ["body", {"type": "text"}]})
+
+    assert [attr.name for attr in entity.attributes] == ["body"]
+    assert entity.id_attribute is None
+    assert entity.id_java_type == "UUID"
+    assert entity.java_imports == ["java.util.UUID"]
+
+
+def test_attribute_named_id_is_the_key_without_a_constraint():
+    entity = Entity.from_parsed({"name": "Tag", "attributes": [{"name": "label"}, {"name": "id", "type": "integer"}]})
+
+    assert entity.id_attribute is entity.attributes[1]
+    assert entity.id_java_type == "Integer"
+
+
+def test_brd_model_tolerates_nulls_and_scalars():
+    brd = BrdModel.from_parsed({"project_overview": None, "data_model": {"entities": ["Order", None]},
+                                "functional_requirements": "FR", "business_rules": None})
+
+    assert brd.display_name == "Project"
+    assert [entity.class_name for entity in brd.entities] == ["Order", "Entity"]
+    assert brd.entities_by_name["order"] is brd.entities[0]
+    assert brd.business_rules == ()
@@ -0,0 +1,145 @@
+import pytest
+
+from brd_model import BrdModel
+from brd_schema import (BRD_RESPONSE_SCHEMA, REQUIRED_FIELDS, BrdParseError, gemini_response_schema, invalid_sections,
+                        missing_required_fields, repair_json, validate_brd)
+
+
+@pytest.mark.parametrize("rules, expected", [
+    ([{"title": "Stock", "description": "no negative"}], [{"title": "Stock", "description": "no negative"}]),
+    (["Orders over 100 need approval"], [{"title": None, "description": "Orders over 100 need approval"}]),
+    ({"BR-1": {"title": "Stock", "description": "no negative"}}, [{"title": "Stock", "description": "no negative"}]),
+    ("Single rule", [{"title": None, "description": "Single rule"}]),
+])
+def test_business_rules_keep_title_and_description(rules, expected):
+    assert validate_brd({"business_rules": rules})["business_rules"] == expected
+
+
+def test_business_rules_reach_the_model_with_titles():
+    parsed = validate_brd({"business_rules": [{"title": "Stock", "description": "no negative"}, "Bare rule"]})
+
+    rules = BrdModel.from_parsed(parsed).business_rules
+
+    assert [(rule.title, rule.description) for rule in rules] == [("Stock", "no negative"), (None, "Bare rule")]
+
+
+def test_response_schema_asks_for_rule_objects():
+    items = BRD_RESPONSE_SCHEMA["properties"]["business_rules"]["items"]
+
+    assert items["type"] == "object"
+    assert set(items["properties"]) == {"title", "description"}
+
+
+def test_response_schema_uses_only_what_gemini_accepts():
+    def keys(node):
+        for key, value in node.items():
+            yield key
+            # Property names are data, not schema keywords
+            for child in (value.values() if key == "properties" else [value]):
+                if isinstance(child, dict):
+                    yield from keys(child)
+
+    assert set(keys(BRD_RESPONSE_SCHEMA)) <= {"type", "properties", "items", "required"}
+    assert BRD_RESPONSE_SCHEMA["required"] == list(REQUIRED_FIELDS)
+    entities = BRD_RESPONSE_SCHEMA["properties"]["data_model"]["properties"]["entities"]["items"]
+    assert entities["properties"]["attributes"]["items"]["type"] == "object"
+
+
+def test_response_schema_for_missing_fields_covers_only_those():
+    schema = gemini_response_schema(["glossary", "data_model"])
+
+    assert list(schema["properties"]) == ["glossary", "data_model"]
+    assert schema["required"] == ["data_model"]
+    assert schema["properties"]["glossary"] == {"type": "array", "items": {"type": "string"}}
+
+
+@pytest.mark.parametrize("field, value, expected", [
+    ("project_overview", "Shop", {"name": "Shop"}),
+    ("project_overview", "An online shop for ordering spare parts, with delivery tracking and invoices for "
+                         "business customers", {"objective": "An online shop for ordering spare parts, with delivery "
+                                                             "tracking and invoices for business customers"}),
+    ("stakeholders", ["Operations", "Finance"], {"business_team": ["Operations", "Finance"]}),
+    ("data_model", [{"name": "Order"}], {"entities": [{"name": "Order", "attributes": []}]}),
+    ("data_model", ["Order"], {"entities": [{"name": "Order", "attributes": []}]}),
+])
+def test_wrong_typed_sections_are_coerced(field, value, expected):
+    section = validate_brd({field: value})[field]
+
+    assert {key: section[key] for key in expected} == expected
+
+
+def test_uncoercible_sections_are_reported_and_reset():
+    data = {"project_overview": 42, "stakeholders": "Ops", "data_model": {"entities": ["Order"]}}
+
+    assert invalid_sections(data) == ["project_overview", "stakeholders"]
+    parsed = validate_brd(data)
+    assert parsed["project_overview"]["name"] == ""
+    assert parsed["stakeholders"]["business_team"] == []
+    assert parsed["data_model"]["entities"][0]["name"] == "Order"
+
+
+def test_missing_requirement_fields_keep_their_defaults():
+    [requirement] = validate_brd({"functional_requirements": [{"id": "FR-1", "title": "", "priority": None}]})[
+        "functional_requirements"]
+
+    assert requirement["title"] is None
+    assert requirement["priority"] == "Medium"
+    assert BrdModel.from_parsed({"functional_requirements": [requirement]}).requirements[0].priority == "Medium"
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ('{"a": 1}', {"a": 1}),
+    ('```json\n{"a": 1}\n```', {"a": 1}),
+    ('```\n[1, 2]\n```', [1, 2]),
+    ('Here is the BRD:\n{"a": {"b": [1, 2]}}\nLet me know if you need more.', {"a": {"b": [1, 2]}}),
+    ('{"a": [1, 2,], "b": {"c": 3,},}', {"a": [1, 2], "b": {"c": 3}}),
+    ('{"a": "x, y", "b": "brace } in a string"}', {"a": "x, y", "b": "brace } in a string"}),
+    ('{"a": [1, 2', {"a": [1, 2]}),
+    ('{"a": {"b": "unfinished str', {"a": {"b": "unfinished str"}}),
+    ('{"a": "escape at the cut \\', {"a": "escape at the cut "}),
+    ('{"a": 1, "b": {"c": tr', {"a": 1, "b": {"c": True}}),
+    ('{"a": tru', {"a": True}),
+    ('{"a": fals', {"a": False}),
+    ('{"a": nul', {"a": None}),
+    ('{"a": 12.', {"a": 12}),
+    ('{"a": 1, "b": 3e+', {"a": 1, "b": 3}),
+    ('{"a": 1, "b":', {"a": 1}),
+    ('{"a": 1, "dangling_ke', {"a": 1}),
+    ('{"a": tre', {}),
+    ('{"only_ke', {}),
+])
+def test_repair_json(raw, expected):
+    assert repair_json(raw) == expected
+
+
+@pytest.mark.parametrize("raw", ["", "no json here", "```\nstill nothing\n```"])
+def test_repair_json_gives_up_without_an_object(raw):
+    with pytest.raises(BrdParseError):
+        repair_json(raw)
+
+
+@pytest.mark.parametrize("data, missing", [
+    ({}, ["project_overview", "functional_requirements", "data_model"]),
+    ([], ["project_overview", "functional_requirements", "data_model"]),
+    ({"project_overview": {"name": "Shop"}, "functional_requirements": [{"id": "FR-1"}],
+      "data_model": {"entities": [{"name": "Order"}]}}, []),
+    ({"project_overview": "Shop", "functional_requirements": ["Order online"], "data_model": ["Order"]}, []),
+    ({"project_overview": {}, "functional_requirements": [], "data_model": {"entities": []}},
+     ["project_overview", "functional_requirements", "data_model"]),
+    ({"project_overview": {"name": "Shop"}, "functional_requirements": [{"id": "FR-1"}], "data_model": {}},
+     ["data_model"]),
+])
+def test_missing_required_fields(data, missing):
+    assert missing_required_fields(data) == missing
+
+
+def test_validate_brd_rejects_non_objects():
+    with pytest.raises(BrdParseError):
+        validate_brd(["not", "an", "object"])
+
+
+def test_validate_brd_keeps_unknown_keys():
+    parsed = validate_brd({"project_overview": {"name": "Shop", "sponsor": "CFO"}, "extra_section": [1]})
+
+    assert parsed["project_overview"]["sponsor"] == "CFO"
+    assert parsed["extra_section"] == [1]
@@ -0,0 +1,105 @@
+from types import SimpleNamespace
+
+import pytest
+
+import codegenerator_agent
+from codegenerator_agent import (CodeGeneratorAgent, _continuation_note, _is_truncated,
+                                 _split_at_last_complete_file)
+
+COMPLETE = (
+    "=== filename: shop/pom.xml ===\n<project></project>\n"
+    "=== filename: shop/src/Order.java ===\nclass Order {\n}\n"
+)
+
+
+def _response(text, reason=None):
+    candidates = [SimpleNamespace(finish_reason=SimpleNamespace(name=reason))] if reason else []
+    return SimpleNamespace(text=text, candidates=candidates)
+
+
+def test_finish_reason_decides_truncation():
+    assert _is_truncated(_response(COMPLETE, "MAX_TOKENS"), COMPLETE)
+    assert not _is_truncated(_response(COMPLETE + "class Cut {", "STOP"), COMPLETE + "class Cut {")
+
+
+@pytest.mark.parametrize("reason", ["SAFETY", "RECITATION", "OTHER", "FINISH_REASON_UNSPECIFIED"])
+def test_unclean_finish_reasons_fall_back_to_the_last_file_heuristic(reason):
+    cut = COMPLETE + "=== filename: shop/src/Cut.java ===\nclass Cut {\n"
+
+    assert _is_truncated(_response(cut, reason), cut)
+    assert not _is_truncated(_response(COMPLETE, reason), COMPLETE)
+
+
+@pytest.mark.parametrize("tail, truncated", [
+    ("", False),
+    ("=== filename: shop/src/Cut.java ===\nclass Cut {\n  void a() {\n", True),
+    ("=== filename: shop/data.json ===\n{\"a\": [1, 2", True),
+    ("=== filename: shop/data.json ===\n{\"a\": [1, 2]}\n", False),
+    ("=== filename: shop/src/main/resources/beans.xml ===\n<beans><bean id=", True),
+    ("=== filename: shop/README.md ===\n", True),
+])
+def test_last_file_heuristic_without_finish_reason(tail, truncated):
+    assert _is_truncated(_response(COMPLETE + tail), COMPLETE + tail) is truncated
+
+
+def test_split_keeps_files_before_the_cut_one():
+    text = COMPLETE + "=== filename: shop/src/Cut.java ===\nclass Cut {\n"
+
+    assert _split_at_last_complete_file(text) == (COMPLETE, "shop/src/Cut.java")
+
+
+def test_split_on_a_cut_separator_keeps_everything_before_it():
+    assert _split_at_last_complete_file(COMPLETE + "=== filena") == (COMPLETE, None)
+
+
+def test_split_without_any_header_keeps_nothing():
+    assert _split_at_last_complete_file("Here are the fil") == ("", None)
+
+
+def test_continuation_note_lists_done_files_and_restart_point():
+    note = _continuation_note(COMPLETE, "shop/src/Cut.java")
+
+    assert "- shop/pom.xml\n- shop/src/Order.java\n" in note
+    assert "starting again from the beginning of 'shop/src/Cut.java'" in note
+    assert "starting again" not in _continuation_note(COMPLETE, None)
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.setattr(codegenerator_agent.genai, "GenerativeModel", lambda name: SimpleNamespace(name=name))
+    return CodeGeneratorAgent(str(tmp_path))
+
+
+def test_continuations_are_stitched_after_the_last_complete_file(agent, monkeypatch):
+    replies = iter([
+        (COMPLETE + "=== filename: shop/src/Cut.java ===\nclass Cut {", True),
+        ("\n=== filename: shop/src/Cut.java ===\nclass Cut {\n}\n", False),
+    ])
+    suffixes = []
+
+    def codegen_call(model, model_name, call, suffix, prompt_tokens):
+        suffixes.append(suffix)
+        return next(replies)
+
+    monkeypatch.setattr(agent, "_codegen_call", codegen_call)
+
+    text = agent._generate_with_model("SUFFIX")
+
+    assert text == COMPLETE + "=== filename: shop/src/Cut.java ===\nclass Cut {\n}\n"
+    assert suffixes[0] == "SUFFIX"
+    assert suffixes[1].startswith("SUFFIX\n\nCONTINUATION:")
+
+
+def test_file_that_never_fits_is_dropped(agent, monkeypatch):
+    cut = COMPLETE + "=== filename: shop/src/Huge.java ===\nclass Huge {"
+    calls = []
+
+    def codegen_call(model, model_name, call, suffix, prompt_tokens):
+        calls.append(call)
+        return (cut if call == "codegen" else "=== filename: shop/src/Huge.java ===\nclass Huge {"), True
+
+    monkeypatch.setattr(agent, "_codegen_call", codegen_call)
+
+    # The continuation makes no progress, so it is not asked again
+    assert agent._generate_with_model("SUFFIX") == COMPLETE
+    assert calls == ["codegen", "codegen_continuation"]
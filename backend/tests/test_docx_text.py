@@ -0,0 +1,75 @@
+import zipfile
+
+import pytest
+
+from docx_text import CELL_SEPARATOR, DOCUMENT_PART, iter_docx_blocks
+
+NAMESPACES = (
+    'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+    'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006" '
+    'xmlns:wps="http://schemas.microsoft.com/office/word/2010/wordprocessingShape" '
+    'xmlns:v="urn:schemas-microsoft-com:vml"'
+)
+
+
+def _p(text):
+    return f"<w:p><w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def _row(*cells):
+    return "<w:tr>" + "".join(f"<w:tc>{cell}</w:tc>" for cell in cells) + "</w:tr>"
+
+
+def _text_box(*paragraphs):
+    """A text box the way Word saves it: a DrawingML choice and a VML fallback with the same content."""
+    content = "<w:txbxContent>" + "".join(paragraphs) + "</w:txbxContent>"
+    return (
+        "<w:r><mc:AlternateContent>"
+        f"<mc:Choice Requires=\"wps\"><w:drawing><wps:txbx>{content}</wps:txbx></w:drawing></mc:Choice>"
+        f"<mc:Fallback><w:pict><v:shape><v:textbox>{content}</v:textbox></v:shape></w:pict></mc:Fallback>"
+        "</mc:AlternateContent></w:r>"
+    )
+
+
+@pytest.fixture
+def docx(tmp_path):
+    def build(body):
+        path = tmp_path / "brd.docx"
+        with zipfile.ZipFile(path, "w") as archive:
+            archive.writestr(DOCUMENT_PART, f"<w:document {NAMESPACES}><w:body>{body}</w:body></w:document>")
+        return str(path)
+    return build
+
+
+def test_paragraphs_and_table_rows_in_document_order(docx):
+    nested = "<w:tbl>" + _row(_p("inner")) + "</w:tbl>"
+    path = docx(
+        _p("Overview")
+        + "<w:p/>"
+        + "<w:tbl>" + _row(_p("Id"), _p("Title")) + _row(_p(""), _p("")) + _row(_p("FR-1"), _p("Login") + nested) + "</w:tbl>"
+        + '<w:p><w:r><w:t xml:space="preserve">Tab</w:t><w:tab/><w:t>bed</w:t><w:br/><w:t>line</w:t></w:r></w:p>'
+    )
+
+    assert list(iter_docx_blocks(path)) == [
+        "Overview",
+        "",
+        f"Id{CELL_SEPARATOR}Title",
+        f"FR-1{CELL_SEPARATOR}Login inner",
+        "Tab\tbed\nline",
+    ]
+
+
+def test_text_box_is_read_once_after_its_paragraph(docx):
+    path = docx(
+        "<w:p><w:r><w:t>Anchor text</w:t></w:r>" + _text_box(_p("Boxed note"), _p("Second line")) + "</w:p>"
+        + _p("Next")
+    )
+
+    assert list(iter_docx_blocks(path)) == ["Anchor text", "Boxed note", "Second line", "Next"]
+
+
+def test_text_box_in_a_table_cell_is_left_out(docx):
+    cell = "<w:p><w:r><w:t>Cell</w:t></w:r>" + _text_box(_p("Boxed")) + "</w:p>"
+    path = docx("<w:tbl>" + _row(cell, _p("Other")) + "</w:tbl>")
+
+    assert list(iter_docx_blocks(path)) == [f"Cell{CELL_SEPARATOR}Other"]
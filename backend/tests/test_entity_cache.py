@@ -0,0 +1,112 @@
+import os
+import time
+
+from brd_model import BrdModel
+from codegenerator_agent import CodeGeneratorAgent
+from entity_cache import EntityFileCache, is_entity_file, supporting_files
+
+FILES = {"shop/src/Order.java": "class Order {}\n" + "// padding\n" * 50}
+
+
+def _entry_path(cache, signature):
+    return os.path.join(cache.cache_dir, f"{signature}.json")
+
+
+def _age(cache, signature, seconds_ago):
+    stamp = time.time() - seconds_ago
+    os.utime(_entry_path(cache, signature), (stamp, stamp))
+
+
+def test_entries_unused_past_max_age_are_dropped(tmp_path):
+    cache = EntityFileCache(str(tmp_path), enabled=True, max_age_seconds=3600, max_bytes=0)
+    cache.store("old", "Order", "shop", FILES)
+    cache.store("fresh", "Order", "shop", FILES)
+    _age(cache, "old", 7200)
+
+    assert cache.prune() == 1
+    assert cache.lookup("old", "Order", "shop") is None
+    assert cache.lookup("fresh", "Order", "shop") is not None
+
+
+def test_least_recently_used_entries_go_first_over_max_bytes(tmp_path):
+    cache = EntityFileCache(str(tmp_path), enabled=True, max_age_seconds=0, max_bytes=0)
+    for signature in ("a", "b", "c"):
+        cache.store(signature, "Order", "shop", FILES)
+    for seconds_ago, signature in enumerate(("c", "b", "a")):
+        _age(cache, signature, 100 * (seconds_ago + 1))
+    # A hit counts as a use, so "a" is now the most recently used
+    assert cache.lookup("a", "Order", "shop") is not None
+
+    cache.max_bytes = 2 * os.path.getsize(_entry_path(cache, "a"))
+    assert cache.prune() == 1
+
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+
+
+def test_store_applies_the_caps(tmp_path):
+    cache = EntityFileCache(str(tmp_path), enabled=True, max_age_seconds=0, max_bytes=1)
+
+    assert cache.store("only", "Order", "shop", FILES)
+
+    assert os.listdir(tmp_path) == []
+
+
+MAIN = "shop/src/main/java/com/brdynamo/shop"
+SERVICE = (
+    "package com.brdynamo.shop.service;\n\n"
+    "import com.brdynamo.shop.exception.ResourceNotFoundException;\n"
+    "import com.brdynamo.shop.dto.*;\n\n"
+    "public class OrderService {\n"
+    "    public OrderDto findById(UUID id) {\n        throw new ResourceNotFoundException(\"Order\", id);\n    }\n}\n"
+)
+GENERATED = {
+    f"{MAIN}/service/OrderService.java": SERVICE,
+    f"{MAIN}/exception/ResourceNotFoundException.java": (
+        "package com.brdynamo.shop.exception;\n\nimport com.brdynamo.shop.util.Messages;\n\n"
+        "public class ResourceNotFoundException extends RuntimeException {\n"
+        "    public ResourceNotFoundException(String resource, Object id) {\n"
+        "        super(Messages.notFound(resource, id));\n    }\n}\n"),
+    f"{MAIN}/util/Messages.java": "package com.brdynamo.shop.util;\n\npublic final class Messages {}\n",
+    f"{MAIN}/dto/OrderDto.java": "package com.brdynamo.shop.dto;\n\npublic class OrderDto {}\n",
+    f"{MAIN}/dto/CustomerDto.java": "package com.brdynamo.shop.dto;\n\npublic class CustomerDto {}\n",
+    f"{MAIN}/exception/UnusedException.java": "package com.brdynamo.shop.exception;\n\npublic class UnusedException {}\n",
+}
+
+
+def test_supporting_files_follow_imports_and_skip_other_entities():
+    files = {f"{MAIN}/service/OrderService.java": SERVICE}
+
+    found = supporting_files(files, GENERATED, lambda path: is_entity_file(path, "Customer"))
+
+    assert sorted(found) == [f"{MAIN}/dto/OrderDto.java", f"{MAIN}/exception/ResourceNotFoundException.java",
+                             f"{MAIN}/util/Messages.java"]
+
+
+def test_hit_restores_supporting_files_under_the_new_names(tmp_path):
+    cache = EntityFileCache(str(tmp_path), enabled=True, max_age_seconds=0, max_bytes=0)
+    files = {f"{MAIN}/service/OrderService.java": SERVICE}
+    dependencies = supporting_files(files, GENERATED, lambda path: False)
+    assert cache.store("sig", "Order", "shop", files, dependencies)
+
+    restored = cache.lookup("sig", "Purchase", "store")
+
+    assert "store/src/main/java/com/brdynamo/shop/exception/ResourceNotFoundException.java" in restored
+    assert "store/src/main/java/com/brdynamo/shop/util/Messages.java" in restored
+    assert "public PurchaseDto findById" in restored["store/src/main/java/com/brdynamo/shop/service/PurchaseService.java"]
+
+
+def test_prompt_lists_the_declarations_of_cached_classes(tmp_path):
+    brd = BrdModel.from_parsed({"project_overview": {"name": "shop"},
+                                "data_model": {"entities": [{"name": "Order", "attributes": ["id"]},
+                                                            {"name": "Customer", "attributes": ["id"]}]}})
+    cached = {path.replace("shop/", f"{brd.demo_project_name}/", 1): content for path, content in GENERATED.items()}
+
+    prompt = CodeGeneratorAgent(str(tmp_path))._create_comprehensive_prompt(
+        brd, {"Order": ("sig", cached), "Customer": ("sig2", None)})
+
+    assert "already have their service and test files: Order." in prompt
+    assert "- MAIN/exception/ResourceNotFoundException.java\n" in prompt
+    assert "    public ResourceNotFoundException(String resource, Object id)\n" in prompt
+    assert "    public OrderDto findById(UUID id)\n" in prompt
+    # Customer was a miss, so its data still goes to the model
+    assert '"Customer"' in prompt and '"Order"' not in prompt
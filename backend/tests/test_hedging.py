@@ -0,0 +1,49 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from hedging import MIN_SAMPLES, HedgeBudget, Hedger, LatencyTracker
+
+
+class _SlowLimiter:
+    def __init__(self, wait):
+        self.wait = wait
+        self.acquired = 0
+
+    def acquire(self, call=None):
+        self.acquired += 1
+        time.sleep(self.wait)
+        return self.wait
+
+
+def test_rate_limit_wait_is_not_recorded_as_latency():
+    tracker = LatencyTracker()
+    limiter = _SlowLimiter(0.2)
+    hedger = Hedger(enabled=True, tracker=tracker, rate_limiter=limiter)
+
+    assert hedger.call("parse", lambda: "ok") == "ok"
+
+    assert limiter.acquired == 1
+    assert tracker.percentile("parse", 100, min_samples=1) < 0.1
+
+
+def test_queue_wait_for_a_worker_is_not_latency():
+    tracker = LatencyTracker()
+    for _ in range(MIN_SAMPLES):
+        tracker.record("codegen", 0.05)
+    hedger = Hedger(enabled=True, tracker=tracker, budget=HedgeBudget(fraction=1.0),
+                    rate_limiter=_SlowLimiter(0))
+    hedger._executor = ThreadPoolExecutor(max_workers=1)
+    busy = hedger._executor.submit(time.sleep, 0.3)
+    calls = []
+
+    def fn():
+        calls.append(time.perf_counter())
+        time.sleep(0.01)
+        return "ok"
+
+    assert hedger.call("codegen", fn) == "ok"
+
+    assert busy.done()
+    # Queued behind the busy worker for 0.3s, which is longer than the 0.05s hedge delay
+    assert len(calls) == 1
+    assert tracker.percentile("codegen", 100, min_samples=1) < 0.2
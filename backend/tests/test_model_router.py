@@ -0,0 +1,69 @@
+import contextvars
+
+import pytest
+
+from model_router import ModelRouter, Route, latency_tier_var, parse_routes, run_model_routes_var
+
+ROUTES = {
+    "parse": parse_routes("lite:4000,flash:16000,pro"),
+    "codegen": parse_routes("flash:16000,pro"),
+}
+
+
+def test_parse_routes():
+    assert parse_routes(" lite:4000 , pro") == [Route("lite", 4000), Route("pro", None)]
+    with pytest.raises(ValueError):
+        parse_routes("lite:4000,:100")
+    with pytest.raises(ValueError):
+        parse_routes("lite:many")
+
+
+@pytest.mark.parametrize("input_tokens, model", [(100, "lite"), (4000, "lite"), (4001, "flash"), (50000, "pro")])
+def test_balanced_tier_picks_the_first_model_that_fits(input_tokens, model):
+    assert ModelRouter(ROUTES).choose("parse", input_tokens).model == model
+
+
+def test_balanced_tier_falls_back_to_the_last_model():
+    router = ModelRouter({"codegen": parse_routes("flash:100,pro:200")})
+
+    assert router.choose("codegen", 500).model == "pro"
+
+
+@pytest.mark.parametrize("tier, model", [("fast", "lite"), ("quality", "pro"), ("balanced", "flash")])
+def test_tier_overrides_the_size_rule(tier, model):
+    assert ModelRouter(ROUTES).choose("parse", 8000, tier=tier).model == model
+
+
+def test_run_tier_and_deployment_default():
+    router = ModelRouter(ROUTES, default_tier="quality")
+    assert router.choose("parse", 10).tier == "quality"
+
+    def with_run_tier():
+        latency_tier_var.set("fast")
+        return router.choose("parse", 50000)
+
+    decision = contextvars.copy_context().run(with_run_tier)
+    assert (decision.model, decision.tier) == ("lite", "fast")
+    with pytest.raises(ValueError):
+        ModelRouter(ROUTES, default_tier="cheap")
+
+
+def test_unknown_call_uses_codegen_routes_and_decisions_are_recorded_per_run():
+    router = ModelRouter(ROUTES)
+
+    def run():
+        run_model_routes_var.set({})
+        router.choose("summarize", 20000)
+        return run_model_routes_var.get()
+
+    routes = contextvars.copy_context().run(run)
+
+    assert routes == {"summarize": {"model": "pro", "tier": "balanced", "input_tokens": 20000}}
+
+
+def test_unknown_request_tier_is_a_bad_request(offline_main):
+    client = offline_main().app.test_client()
+
+    assert client.get("/runs?latency_tier=cheap").status_code == 400
+    assert client.get("/runs", headers={"X-Latency-Tier": "cheap"}).status_code == 400
+    assert client.get("/runs?latency_tier=fast").status_code == 200
@@ -0,0 +1,86 @@
+import json
+
+from benchmarks.fakes import FakeGemini, FakeResponse
+
+
+class ScriptedGemini(FakeGemini):
+    """Answers the parse calls (JSON mode) with the given responses in order."""
+
+    def __init__(self, *parse_responses):
+        super().__init__()
+        self.parse_responses = list(parse_responses)
+        self.prompts = []
+
+    def respond(self, prompt, structured):
+        if not structured:
+            return super().respond(prompt, structured)
+        self.prompts.append(prompt)
+        response = self.parse_responses.pop(0)
+        # A string is sent as is, e.g. output cut off at the token limit
+        return FakeResponse(response if isinstance(response, str) else json.dumps(response), prompt)
+
+
+def _parse(offline_main, tmp_path, gemini):
+    main = offline_main(gemini)
+    brd = tmp_path / "brd.txt"
+    brd.write_text("Project Name: Shop\nOrders are placed online.\n", encoding="utf-8")
+    _, parsed, _ = main.parse_brd_with_gemini(str(brd))
+    return parsed
+
+
+def test_wrong_typed_sections_are_coerced_locally(offline_main, tmp_path):
+    gemini = ScriptedGemini({
+        "project_overview": "Shop",
+        "stakeholders": ["Operations"],
+        "data_model": [{"name": "Order", "attributes": {"id": "Long"}}],
+        "functional_requirements": [{"id": "FR-1", "description": "Place an order"}],
+    })
+
+    parsed = _parse(offline_main, tmp_path, gemini)
+
+    assert len(gemini.prompts) == 1
+    assert parsed["project_overview"]["name"] == "Shop"
+    assert parsed["stakeholders"]["business_team"] == ["Operations"]
+    assert parsed["data_model"]["entities"][0]["attributes"] == [{"name": "id", "type": "Long", "constraints": []}]
+    requirement = parsed["functional_requirements"][0]
+    assert requirement["title"] is None
+    assert requirement["priority"] == "Medium"
+
+
+def test_uncoercible_section_is_asked_for_again(offline_main, tmp_path):
+    gemini = ScriptedGemini(
+        {"project_overview": 42, "functional_requirements": [{"id": "FR-1"}], "data_model": {"entities": ["Order"]}},
+        {"project_overview": {"name": "Shop"}},
+    )
+
+    parsed = _parse(offline_main, tmp_path, gemini)
+
+    assert len(gemini.prompts) == 2
+    assert "ONLY the following sections" in gemini.prompts[1] and "project_overview" in gemini.prompts[1]
+    assert parsed["project_overview"]["name"] == "Shop"
+
+
+def test_section_still_unusable_after_retry_falls_back_to_default(offline_main, tmp_path):
+    gemini = ScriptedGemini(
+        {"stakeholders": 7, "functional_requirements": [{"id": "FR-1"}], "data_model": {"entities": ["Order"]},
+         "project_overview": {"name": "Shop"}},
+        {"stakeholders": 8},
+    )
+
+    parsed = _parse(offline_main, tmp_path, gemini)
+
+    assert parsed["stakeholders"] == {"business_team": [], "technical_team": [], "approvers": [], "end_users": []}
+    assert parsed["project_overview"]["name"] == "Shop"
+
+
+def test_json_cut_off_at_the_output_limit_is_repaired(offline_main, tmp_path):
+    gemini = ScriptedGemini(
+        '{"project_overview": {"name": "Shop"}, "functional_requirements": [{"id": "FR-1", "description": "Order"}], '
+        '"data_model": {"entities": [{"name": "Order", "attributes": [{"name": "id", "type": "Lo'
+    )
+
+    parsed = _parse(offline_main, tmp_path, gemini)
+
+    assert len(gemini.prompts) == 1
+    assert parsed["data_model"]["entities"][0]["name"] == "Order"
+    assert parsed["data_model"]["entities"][0]["attributes"][0]["type"] == "Lo"
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline
+
+
+def test_stages_receive_dependency_results():
+    pipeline = Pipeline()
+    pipeline.add_stage("parse", lambda inputs: 2)
+    pipeline.add_stage("entities", lambda inputs: inputs["parse"] * 3, depends_on=["parse"])
+    pipeline.add_stage("diagrams", lambda inputs: inputs["parse"] + 1, depends_on=["parse"])
+    pipeline.add_stage("save", lambda inputs: inputs, depends_on=["entities", "diagrams"])
+
+    results = pipeline.run()
+
+    assert results["save"] == {"entities": 6, "diagrams": 3}
+    assert set(pipeline.timings) == {"parse", "entities", "diagrams", "save", "total"}
+
+
+def test_independent_stages_overlap():
+    both_started = threading.Barrier(2, timeout=5)
+    pipeline = Pipeline()
+    pipeline.add_stage("a", lambda inputs: both_started.wait())
+    pipeline.add_stage("b", lambda inputs: both_started.wait())
+
+    pipeline.run()
+
+
+def test_cycle_is_rejected_before_anything_runs():
+    ran = []
+    pipeline = Pipeline()
+    pipeline.add_stage("root", lambda inputs: ran.append("root"))
+    pipeline.add_stage("a", lambda inputs: ran.append("a"), depends_on=["root", "b"])
+    pipeline.add_stage("b", lambda inputs: ran.append("b"), depends_on=["a"])
+
+    with pytest.raises(ValueError, match="cycle among: a, b"):
+        pipeline.run()
+    assert ran == []
+
+
+def test_unknown_and_duplicate_stages_are_rejected():
+    pipeline = Pipeline()
+    pipeline.add_stage("a", lambda inputs: None, depends_on=["missing"])
+    with pytest.raises(ValueError, match="Duplicate"):
+        pipeline.add_stage("a", lambda inputs: None)
+    with pytest.raises(ValueError, match="unknown stage"):
+        pipeline.run()
+
+
+def test_failure_propagates_and_is_reported_to_observer():
+    observed = []
+    pipeline = Pipeline(observer=lambda name, seconds, failed: observed.append((name, failed)))
+    pipeline.add_stage("parse", lambda inputs: "brd")
+    pipeline.add_stage("generate", lambda inputs: 1 / 0, depends_on=["parse"])
+    pipeline.add_stage("save", lambda inputs: "saved", depends_on=["generate"])
+
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run()
+
+    assert observed == [("parse", False), ("generate", True)]
+    assert "save" not in pipeline.results
+
+
+def test_stage_context_wraps_every_stage():
+    entered = []
+    local = threading.local()
+
+    class _Context:
+        def __enter__(self):
+            local.inside = True
+            entered.append(threading.current_thread().name)
+
+        def __exit__(self, *exc):
+            local.inside = False
+
+    pipeline = Pipeline(stage_context=_Context)
+    pipeline.add_stage("a", lambda inputs: local.inside)
+    pipeline.add_stage("b", lambda inputs: local.inside, depends_on=["a"])
+
+    assert pipeline.run() == {"a": True, "b": True}
+    assert len(entered) == 2
+
+
+def test_failure_does_not_wait_for_running_stages():
+    release = threading.Event()
+    pipeline = Pipeline()
+    pipeline.add_stage("slow", lambda inputs: release.wait(5))
+    pipeline.add_stage("after_slow", lambda inputs: "never", depends_on=["slow"])
+    pipeline.add_stage("bad", lambda inputs: 1 / 0)
+
+    start = time.perf_counter()
+    with pytest.raises(ZeroDivisionError):
+        pipeline.run()
+    elapsed = time.perf_counter() - start
+    release.set()
+
+    assert elapsed < 1
+    assert "after_slow" not in pipeline.results
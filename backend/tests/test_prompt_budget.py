@@ -0,0 +1,41 @@
+import json
+
+from prompt_budget import TRIM_MARKER, estimate_tokens, fit_to_budget, prune_empty
+
+
+def test_fits_without_trimming():
+    text, trimmed = fit_to_budget({"name": "Order", "fields": ["id", "total"]}, max_tokens=100)
+
+    assert json.loads(text) == {"name": "Order", "fields": ["id", "total"]}
+    assert trimmed == 0
+
+
+def test_empty_members_are_dropped():
+    data = {"a": None, "b": "", "c": [], "d": {}, "e": [{"x": None}, "kept"], "f": {"g": [""]}, "h": 0}
+
+    assert prune_empty(data) == {"e": ["kept"], "h": 0}
+    text, _ = fit_to_budget(data, max_tokens=100)
+    assert json.loads(text) == {"e": ["kept"], "h": 0}
+
+
+def test_longest_strings_are_trimmed_to_fit():
+    data = {"description": "d" * 4000, "title": "short"}
+
+    text, trimmed = fit_to_budget(data, max_tokens=300, min_field_chars=10)
+
+    assert estimate_tokens(text) <= 300
+    assert trimmed == 1
+    result = json.loads(text)
+    assert result["title"] == "short"
+    assert result["description"].endswith(TRIM_MARKER)
+
+
+def test_trimming_stops_at_min_field_chars():
+    data = {"rules": ["r" * 500 for _ in range(50)]}
+
+    text, trimmed = fit_to_budget(data, max_tokens=10, min_field_chars=120)
+
+    # The budget can't be met without going under the floor, so the floor wins
+    assert estimate_tokens(text) > 10
+    assert trimmed == 50
+    assert all(rule == "r" * 120 + TRIM_MARKER for rule in json.loads(text)["rules"])
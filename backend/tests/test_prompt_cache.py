@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import prompt_cache
+from codegenerator_agent import CODEGEN_PROMPT_PREFIX
+from prompt_cache import PROMPT_CACHE_MODEL, PromptCache
+
+
+class _Cache:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_create_runs_outside_the_lock_once_per_prefix(monkeypatch):
+    cache = PromptCache(enabled=True, min_tokens=0)
+    release = threading.Event()
+    created = []
+
+    def create(model, display_name, contents, ttl):
+        created.append(contents[0])
+        if contents[0] == "slow":
+            # Another prefix must still be served while this call is pending
+            assert release.wait(5)
+        return _Cache(display_name)
+
+    monkeypatch.setattr(prompt_cache.genai.caching.CachedContent, "create", create)
+    with ThreadPoolExecutor(4) as pool:
+        slow = [pool.submit(cache._cached_prefix, "slow") for _ in range(3)]
+        assert cache._cached_prefix("fast") is not None
+        release.set()
+        entries = [future.result(5) for future in slow]
+
+    assert created.count("slow") == 1
+    assert entries[0] is entries[1] is entries[2]
+    assert entries[0].uses == 3
+
+
+def test_failed_create_backs_off_waiting_callers(monkeypatch):
+    cache = PromptCache(enabled=True, min_tokens=0)
+    calls = []
+
+    def create(**kwargs):
+        calls.append(kwargs)
+        raise RuntimeError("quota")
+
+    monkeypatch.setattr(prompt_cache.genai.caching.CachedContent, "create", create)
+    assert cache._cached_prefix("prefix") is None
+    assert cache._cached_prefix("prefix") is None
+    assert len(calls) == 1
+    assert not cache._inflight
+
+
+def test_codegen_prefix_reaches_the_cache_minimum():
+    # Below the provider's minimum every call would resend the prefix inline
+    assert PromptCache(enabled=True).cacheable(CODEGEN_PROMPT_PREFIX, PROMPT_CACHE_MODEL)
+    assert "<project>" in CODEGEN_PROMPT_PREFIX and "{{" not in CODEGEN_PROMPT_PREFIX
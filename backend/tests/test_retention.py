@@ -0,0 +1,134 @@
+import os
+import time
+
+import pytest
+
+import artifact_store
+from artifact_store import ArtifactStore
+from codegenerator_agent import CodeGeneratorAgent
+from retention import RetentionPolicy, RetentionSweeper
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / "artifacts"))
+
+
+def _sweeper(store, folders, **policy):
+    return RetentionSweeper(store, folders, RetentionPolicy(**{"max_age_seconds": 0, "max_runs": 0,
+                                                               "max_bytes": 0, **policy}), grace=0)
+
+
+def _record_runs(store, monkeypatch, stamps):
+    """Record one run per (run_id, created_at, columns) with a pinned clock."""
+    for run_id, created_at, columns in stamps:
+        with monkeypatch.context() as patch:
+            patch.setattr(artifact_store.time, "time", lambda: created_at)
+            store.record_run(run_id, {"generated": {"a.txt": run_id}}, **columns)
+
+
+def _run_ids(store):
+    return sorted(run["run_id"] for run in store.list_runs_by_access())
+
+
+def _write(path, size, mtime):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_max_runs_keeps_the_newest_runs_and_the_latest_upload(store, monkeypatch):
+    _record_runs(store, monkeypatch, [
+        ("u1", 100.0, {}), ("u2", 200.0, {}), ("u3", 300.0, {}), ("b1", 400.0, {"source": "batch"}),
+    ])
+
+    stats = _sweeper(store, {}, max_runs=2).sweep(now=1000.0)
+
+    # u3, the newest upload run, counts as one of the two kept
+    assert _run_ids(store) == ["b1", "u3"]
+    assert stats["evicted"] == {"store": 2}
+
+
+def test_max_age_spares_the_latest_upload_however_old(store, monkeypatch):
+    _record_runs(store, monkeypatch, [
+        ("u1", 100.0, {}), ("u2", 200.0, {"status": "failed"}), ("b1", 900.0, {"source": "batch"}),
+    ])
+
+    _sweeper(store, {}, max_age_seconds=500).sweep(now=1000.0)
+
+    assert _run_ids(store) == ["b1", "u1"]
+
+
+def test_old_versions_are_evicted_but_current_is_kept(store, tmp_path):
+    generated = tmp_path / "generated"
+    agent = CodeGeneratorAgent(str(generated))
+    for i in range(3):
+        agent.save_generated_code({"p/shared.txt": "s" * 100, "p/own.txt": str(i) * 10})
+    current = os.readlink(generated / CodeGeneratorAgent.CURRENT_LINK)
+
+    stats = _sweeper(store, {"generated": str(generated)}, max_runs=1).sweep(now=time.time() + 10)
+
+    assert os.listdir(generated / CodeGeneratorAgent.VERSIONS_DIR) == [os.path.basename(current)]
+    assert os.readlink(generated / CodeGeneratorAgent.CURRENT_LINK) == current
+    assert (generated / "current" / "p" / "own.txt").read_text() == "2" * 10
+    # The shared file is hard-linked into every version; only each old version's own file is freed
+    assert stats["evicted"] == {"generated": 2}
+    assert stats["reclaimed_bytes"] == {"generated": 20}
+    assert stats["storage_bytes"] == store.storage_bytes() + 110
+
+
+def test_current_version_is_never_evicted_over_quota(store, tmp_path):
+    generated = tmp_path / "generated"
+    CodeGeneratorAgent(str(generated)).save_generated_code({"p/a.txt": "x" * 1000})
+
+    stats = _sweeper(store, {"generated": str(generated)}, max_bytes=1, max_age_seconds=1).sweep(
+        now=time.time() + 10)
+
+    assert stats["evicted"] == {}
+    assert (generated / "current" / "p" / "a.txt").exists()
+
+
+def test_symlinks_are_neither_followed_nor_evicted(store, tmp_path):
+    outside = tmp_path / "outside"
+    outside.mkdir()
+    (outside / "big.bin").write_bytes(b"0" * 5000)
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    (uploads / "shortcut").symlink_to(outside, target_is_directory=True)
+    (uploads / "old.pdf").write_bytes(b"1" * 10)
+
+    stats = _sweeper(store, {"uploads": str(uploads)}, max_bytes=1).sweep(now=time.time() + 10)
+
+    assert stats["evicted"] == {"uploads": 1}
+    assert stats["reclaimed_bytes"] == {"uploads": 10}
+    assert os.listdir(uploads) == ["shortcut"]
+    assert (outside / "big.bin").exists()
+
+
+def test_quota_evicts_runs_and_entries_least_recently_used_first(store, tmp_path, monkeypatch):
+    _record_runs(store, monkeypatch, [("b1", 200.0, {"source": "batch"})])
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    _write(uploads / "old.pdf", 1000, 100.0)
+    _write(uploads / "new.pdf", 1000, 300.0)
+
+    _sweeper(store, {"uploads": str(uploads)}, max_bytes=store.storage_bytes() + 1000).sweep(now=1000.0)
+    assert sorted(os.listdir(uploads)) == ["new.pdf"]
+    assert _run_ids(store) == ["b1"]
+
+    stats = _sweeper(store, {"uploads": str(uploads)}, max_bytes=1000).sweep(now=1000.0)
+    assert _run_ids(store) == []
+    assert os.listdir(uploads) == ["new.pdf"]
+    assert stats["storage_bytes"] == 1000
+
+
+def test_entries_changed_within_the_grace_period_are_kept(store, tmp_path):
+    uploads = tmp_path / "uploads"
+    uploads.mkdir()
+    now = time.time()
+    _write(uploads / "stale.pdf", 10, now - 3600)
+    _write(uploads / "fresh.pdf", 10, now - 30)
+    policy = RetentionPolicy(max_age_seconds=1, max_runs=0, max_bytes=0)
+
+    RetentionSweeper(store, {"uploads": str(uploads)}, policy, grace=60).sweep(now=now)
+
+    assert os.listdir(uploads) == ["fresh.pdf"]
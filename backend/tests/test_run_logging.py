@@ -0,0 +1,31 @@
+import io
+import json
+import logging
+
+import pytest
+
+import run_logging
+
+
+@pytest.fixture
+def captured(monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL", "INFO")
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    run_logging.configure_logging()
+    stream = io.StringIO()
+    root.handlers[0].stream = stream
+    yield lambda: [json.loads(line)["msg"] for line in stream.getvalue().splitlines()]
+    root.handlers[:], level = saved
+    root.setLevel(level)
+
+
+def test_debug_runs_only_open_up_app_loggers(captured):
+    with run_logging.run_context(debug=True):
+        logging.getLogger("urllib3.connectionpool").debug("library debug")
+        logging.getLogger("codegenerator_agent").debug("app debug")
+    with run_logging.run_context(debug=False):
+        logging.getLogger("codegenerator_agent").debug("app debug, normal run")
+
+    assert captured() == ["app debug"]
+    assert not logging.getLogger("urllib3").isEnabledFor(logging.DEBUG)
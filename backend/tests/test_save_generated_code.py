@@ -0,0 +1,64 @@
+import os
+
+from codegenerator_agent import CodeGeneratorAgent
+
+
+def test_save_publishes_whole_run_through_current_link(tmp_path):
+    agent = CodeGeneratorAgent(str(tmp_path))
+    agent.save_generated_code({"first/a.txt": "1"})
+    first_version = os.readlink(tmp_path / "current")
+
+    agent.save_generated_code({"second/a.txt": "2", "second/b.txt": "3"})
+
+    assert sorted(os.listdir(tmp_path / "current")) == ["second"]
+    assert (tmp_path / "current" / "second" / "b.txt").read_text() == "3"
+    # The previous run stays intact for readers that resolved it before the swap
+    assert (tmp_path / first_version / "first" / "a.txt").read_text() == "1"
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(CodeGeneratorAgent.STAGING_PREFIX)]
+
+
+def test_old_versions_are_pruned_but_current_is_kept(tmp_path):
+    agent = CodeGeneratorAgent(str(tmp_path))
+    for i in range(CodeGeneratorAgent.VERSIONS_KEPT + 3):
+        agent.save_generated_code({f"p{i}/a.txt": str(i)})
+
+    versions = os.listdir(tmp_path / CodeGeneratorAgent.VERSIONS_DIR)
+    assert len(versions) == CodeGeneratorAgent.VERSIONS_KEPT + 1
+    assert os.path.basename(os.readlink(tmp_path / "current")) in versions
+
+
+def test_unchanged_files_are_hard_linked_from_the_current_version(tmp_path):
+    agent = CodeGeneratorAgent(str(tmp_path))
+    agent.save_generated_code({"p/a.txt": "same", "p/b.txt": "old"})
+    before = os.stat(tmp_path / "current" / "p" / "a.txt").st_ino
+
+    agent.save_generated_code({"p/a.txt": "same", "p/b.txt": "new"})
+
+    assert os.stat(tmp_path / "current" / "p" / "a.txt").st_ino == before
+    assert (tmp_path / "current" / "p" / "b.txt").read_text() == "new"
+
+
+def _no_symlinks(*args, **kwargs):
+    raise OSError("symbolic link privilege not held")
+
+
+def test_save_falls_back_to_pointer_file_without_symlinks(tmp_path, monkeypatch):
+    agent = CodeGeneratorAgent(str(tmp_path))
+    agent.save_generated_code({"p/a.txt": "linked"})
+    monkeypatch.setattr(os, "symlink", _no_symlinks)
+
+    for i in range(CodeGeneratorAgent.VERSIONS_KEPT + 2):
+        agent.save_generated_code({"p/a.txt": "linked", "p/b.txt": str(i)})
+
+    assert not os.path.lexists(tmp_path / CodeGeneratorAgent.CURRENT_LINK)
+    version = (tmp_path / CodeGeneratorAgent.CURRENT_POINTER).read_text()
+    assert CodeGeneratorAgent.current_version(str(tmp_path)) == version
+    current_root = CodeGeneratorAgent.current_root(str(tmp_path))
+    assert open(os.path.join(current_root, "p", "b.txt")).read() == str(CodeGeneratorAgent.VERSIONS_KEPT + 1)
+    assert len(os.listdir(tmp_path / CodeGeneratorAgent.VERSIONS_DIR)) == CodeGeneratorAgent.VERSIONS_KEPT + 1
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(CodeGeneratorAgent.STAGING_PREFIX)]
+
+    monkeypatch.undo()
+    agent.save_generated_code({"p/a.txt": "linked again"})
+    assert not (tmp_path / CodeGeneratorAgent.CURRENT_POINTER).exists()
+    assert (tmp_path / "current" / "p" / "a.txt").read_text() == "linked again"
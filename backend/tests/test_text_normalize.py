@@ -0,0 +1,95 @@
+import text_normalize
+from text_normalize import PAGE_BREAK, normalize_brd_text
+
+
+def _page(number, body):
+    return "\n".join(["ACME Corp - Order Portal BRD", "Confidential", *body, f"Page {number} of 4"])
+
+
+BODY = [
+    ["1. Scope", "Customers place orders online."],
+    ["2. Entities", "Order has an id and a total."],
+    ["3. Rules", "An order total is never negative."],
+    ["4. Non-functional", "Pages load within two seconds."],
+]
+
+
+def test_running_headers_footers_and_page_numbers_are_removed():
+    text = PAGE_BREAK.join(_page(i + 1, body) for i, body in enumerate(BODY))
+
+    result = normalize_brd_text(text)
+
+    assert "ACME Corp" not in result.text
+    assert "Confidential" not in result.text
+    assert "Page " not in result.text
+    assert all(line in result.text for body in BODY for line in body)
+    assert result.stats["repeated_lines_removed"] == 12
+    assert result.stats["saved_tokens"] > 0
+
+
+def test_bare_page_numbers_at_page_edges_are_removed():
+    pages = [f"{body[0]}\n{body[1]}\n- {i + 1} -" for i, body in enumerate(BODY)]
+
+    result = normalize_brd_text(PAGE_BREAK.join(pages))
+
+    assert "- 1 -" not in result.text and "- 4 -" not in result.text
+    assert result.stats["repeated_lines_removed"] + result.stats["page_numbers_removed"] == 4
+
+
+def test_edge_line_also_in_a_body_is_kept():
+    pages = [["Order portal", "Attributes: id, total"] + [f"Requirement {page}.{n} applies." for n in range(6)]
+             for page in range(3)]
+    pages[1][4] = "Attributes: id, total"
+
+    result = normalize_brd_text(PAGE_BREAK.join("\n".join(lines) for lines in pages))
+
+    # Recurs at the top of every page, but also inside one, so it is content
+    assert result.text.count("Attributes: id, total") == 4
+    assert "Order portal" not in result.text
+
+
+def test_short_documents_keep_their_edges():
+    text = PAGE_BREAK.join(_page(i + 1, body) for i, body in enumerate(BODY[:2]))
+
+    result = normalize_brd_text(text)
+
+    assert result.text.count("Confidential") == 2
+    assert result.stats["repeated_lines_removed"] == 0
+
+
+def test_ligatures_hyphenation_and_whitespace_are_cleaned():
+    text = "The ﬁnal order manage\u00ad\nment  flow\r\n\r\n\r\n\r\n  indented   line  \nsoft\u00adhyphen"
+
+    result = normalize_brd_text(text)
+
+    assert result.text == "The final order management flow\n\n  indented line\nsofthyphen"
+    assert result.stats["hyphenations_joined"] == 1
+
+
+def test_hard_hyphen_at_a_line_break_is_kept():
+    result = normalize_brd_text("A user-\nfriendly, self-\n  service portal")
+
+    assert result.text == "A user-friendly, self-service portal"
+    assert result.stats["hyphenations_joined"] == 2
+
+
+def test_capitalised_word_after_a_line_break_hyphen_is_not_joined():
+    assert normalize_brd_text("Business-\nRules apply").text == "Business-\nRules apply"
+
+
+def test_same_text_gives_the_same_digest():
+    first = normalize_brd_text("Order  total\n\n\n\nis positive")
+    second = normalize_brd_text("Order total\r\n\r\nis positive ")
+
+    assert first.text == second.text
+    assert first.stats["text_sha256"] == second.stats["text_sha256"]
+
+
+def test_disabled_normalization_only_drops_page_breaks(monkeypatch):
+    monkeypatch.setattr(text_normalize, "BRD_NORMALIZATION_ENABLED", False)
+    text = PAGE_BREAK.join(_page(i + 1, body) for i, body in enumerate(BODY))
+
+    result = normalize_brd_text(text)
+
+    assert result.text == text.replace(PAGE_BREAK, "\n")
+    assert result.stats["repeated_lines_removed"] == 0
@@ -0,0 +1,132 @@
+import hashlib
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, NamedTuple, Set
+
+from metrics import NORMALIZATION_SAVED_TOKENS
+from prompt_budget import estimate_tokens
+
+BRD_NORMALIZATION_ENABLED = os.getenv("BRD_NORMALIZATION_ENABLED", "1") == "1"
+PAGE_BREAK = "\f"
+# Headers/footers are looked for among the first and last few non-empty lines of each page
+EDGE_LINES = 3
+# A page-edge line is a header/footer when it recurs on at least this share of pages (and on two or more)
+REPEAT_FRACTION = 0.5
+MIN_PAGES = 3
+
+_DIGITS_RE = re.compile(r"\d+")
+# After NFKC folding every Unicode space is a plain space
+_SPACES_RE = re.compile(r"[ \t]+")
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?:[-–—]\s*)?(?:page\s+)?\d{1,4}(?:\s*(?:of|/)\s*\d{1,4})?(?:\s*[-–—])?$", re.IGNORECASE)
+# A soft hyphen only marks where a word was split: manage\u00ad\nment -> management. A hard hyphen
+# may belong to a compound (user-\nfriendly), so only the line break goes: user-friendly.
+# A capital after the break marks a new sentence or a proper name and is left alone.
+_SOFT_HYPHENATION_RE = re.compile(r"([A-Za-z]{2,})\u00ad\n[ \t]*([a-z]{2,})")
+_HARD_HYPHENATION_RE = re.compile(r"([A-Za-z]{2,})-\n[ \t]*([a-z]{2,})")
+SOFT_HYPHEN = "\u00ad"
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+class NormalizedText(NamedTuple):
+    text: str
+    stats: Dict
+
+
+def _line_key(line: str) -> str:
+    return _SPACES_RE.sub(" ", line.strip().lower())
+
+
+def _masked_key(line: str) -> str:
+    """Line key with numbers masked, for running headers/footers carrying a page number or date."""
+    return _DIGITS_RE.sub("#", _line_key(line))
+
+
+def _edge_indexes(lines: List[str], count: int = EDGE_LINES) -> Set[int]:
+    """Indexes of the first and last `count` non-empty lines of a page."""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return set(filled[:count] + filled[-count:])
+
+
+def _repeated_edge_lines(pages: List[List[str]]) -> List[Set[int]]:
+    """Per page, the indexes of its running header/footer lines.
+
+    A line among the first/last EDGE_LINES non-empty lines of a page is a header or
+    footer if the same text recurs at the edges of enough pages and never in a
+    page body (content such as attribute lists can also land at page edges). The
+    outermost line at the top and bottom may also differ in its numbers only.
+    """
+    edges = [_edge_indexes(lines) for lines in pages]
+    outermost = [_edge_indexes(lines, 1) for lines in pages]
+
+    edge_pages, masked_pages, body_keys = Counter(), Counter(), set()
+    for lines, edge, outer in zip(pages, edges, outermost):
+        edge_pages.update({_line_key(lines[i]) for i in edge})
+        masked_pages.update({_masked_key(lines[i]) for i in outer})
+        body_keys.update(_line_key(line) for i, line in enumerate(lines) if i not in edge and line.strip())
+
+    threshold = max(2, REPEAT_FRACTION * len(pages))
+    repeated = {key for key, count in edge_pages.items() if count >= threshold and key not in body_keys}
+    repeated_masked = {key for key, count in masked_pages.items() if count >= threshold}
+    return [
+        {i for i in edge if _line_key(lines[i]) in repeated}
+        | {i for i in outer if _masked_key(lines[i]) in repeated_masked}
+        for lines, edge, outer in zip(pages, edges, outermost)
+    ]
+
+
+def normalize_brd_text(text: str) -> NormalizedText:
+    """Strip extraction noise from BRD text before it goes into the parse prompt.
+
+    Pages are separated by form feeds (PDF extraction). On documents with
+    MIN_PAGES or more pages, lines near the top or bottom of a page that recur
+    across pages (running headers/footers) and bare page numbers there are
+    dropped. Everywhere: Unicode compatibility forms are folded (PDF ligatures),
+    words hyphenated across a line break are put back on one line, runs of spaces collapse to
+    one and blank lines to a single one.
+    """
+    original_tokens = estimate_tokens(text)
+    stats = {"repeated_lines_removed": 0, "page_numbers_removed": 0, "hyphenations_joined": 0}
+
+    if BRD_NORMALIZATION_ENABLED:
+        text = unicodedata.normalize("NFKC", text.replace("\r\n", "\n").replace("\r", "\n"))
+        pages = [page.split("\n") for page in text.split(PAGE_BREAK)]
+        if len(pages) >= MIN_PAGES:
+            for page_index, (lines, repeated) in enumerate(zip(pages, _repeated_edge_lines(pages))):
+                edges = _edge_indexes(lines)
+                kept = []
+                for i, line in enumerate(lines):
+                    if i in repeated:
+                        stats["repeated_lines_removed"] += 1
+                    elif i in edges and _PAGE_NUMBER_RE.match(line.strip()):
+                        stats["page_numbers_removed"] += 1
+                    else:
+                        kept.append(line)
+                pages[page_index] = kept
+        text = "\n".join("\n".join(lines) for lines in pages)
+
+        text, soft_joined = _SOFT_HYPHENATION_RE.subn(r"\1\2", text)
+        text, hard_joined = _HARD_HYPHENATION_RE.subn(r"\1-\2", text)
+        stats["hyphenations_joined"] = soft_joined + hard_joined
+        text = text.replace(SOFT_HYPHEN, "")
+        lines = []
+        for line in text.split("\n"):
+            indent = len(line) - len(line.lstrip(" \t"))
+            lines.append(line[:indent] + _SPACES_RE.sub(" ", line[indent:]).rstrip())
+        text = _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+    else:
+        text = text.replace(PAGE_BREAK, "\n").strip()
+
+    tokens = estimate_tokens(text)
+    NORMALIZATION_SAVED_TOKENS.inc(max(0, original_tokens - tokens))
+    stats.update(
+        original_tokens=original_tokens,
+        normalized_tokens=tokens,
+        saved_tokens=original_tokens - tokens,
+        saved_ratio=round((original_tokens - tokens) / original_tokens, 4) if original_tokens else 0.0,
+        # Stable across re-exports of the same BRD, so usable as a cache key for parse results
+        text_sha256=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+    )
+    return NormalizedText(text, stats)